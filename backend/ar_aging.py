@@ -0,0 +1,72 @@
+"""Single-pass aging-bucket assignment shared by all dashboards."""
+import os
+
+import numpy as np
+
+
+class AgingScheme:
+    """Buckets defined by inclusive upper bounds on 'Days overdue'.
+
+    ``upper_bounds=[30, 60, 90]`` gives the buckets <=30, 31-60, 61-90 and
+    >90. Invoices below ``min_days`` (or with a missing day count) fall in no
+    bucket.
+    """
+
+    def __init__(self, upper_bounds, labels, min_days=None):
+        if len(labels) != len(upper_bounds) + 1:
+            raise ValueError("An aging scheme needs one more label than upper bounds")
+        self.upper_bounds = np.asarray(upper_bounds, dtype='float64')
+        self.labels = list(labels)
+        self.min_days = min_days
+
+    def __len__(self):
+        return len(self.labels)
+
+    def assign(self, days):
+        """Bucket id per invoice (-1 when the invoice falls in no bucket)"""
+        days = np.asarray(days, dtype='float64')
+        bucket_ids = np.searchsorted(self.upper_bounds, days, side='left').astype('int8')
+        excluded = np.isnan(days)
+        if self.min_days is not None:
+            excluded |= days < self.min_days
+        bucket_ids[excluded] = -1
+        return bucket_ids
+
+    def totals(self, days, amounts=None, bucket_ids=None):
+        """Invoice counts and amount sums per bucket, as two arrays in label order"""
+        if bucket_ids is None:
+            bucket_ids = self.assign(days)
+        valid = bucket_ids >= 0
+        ids = bucket_ids[valid]
+        counts = np.bincount(ids, minlength=len(self))
+        if amounts is None:
+            return counts, np.zeros(len(self))
+        weights = np.nan_to_num(np.asarray(amounts, dtype='float64')[valid])
+        return counts, np.bincount(ids, weights=weights, minlength=len(self))
+
+
+# 0-30/31-60/61-90/90+ used by the admin and collector charts
+STANDARD_AGING = AgingScheme([30, 60, 90], ['0-30 Days', '31-60 Days', '61-90 Days', '90+ Days'], min_days=0)
+
+# Buckets written to 'Weighted Overdue Bucket' by generate_ar_data.py
+GENERATOR_AGING = AgingScheme([0, 30, 60, 90, 120], ['Current', '0-30', '31-60', '61-90', '91-120', '120+'])
+
+# Before due (<=0 days) vs overdue (>0 days)
+OVERDUE_SPLIT = AgingScheme([0], ['beforeDue', 'overdue'])
+
+# Manager risk bands: in range (<=30), moderate (31-90), high (>90)
+RISK_AGING = AgingScheme([30, 90], ['inRange', 'moderate', 'high'])
+
+AGING_SCHEMES = {
+    'standard': STANDARD_AGING,
+    'generator': GENERATOR_AGING,
+}
+
+
+def get_aging_scheme(name=None):
+    """Aging scheme for the dashboard charts, chosen by name or the AR_AGING_SCHEME env var"""
+    name = name or os.environ.get('AR_AGING_SCHEME', 'standard')
+    try:
+        return AGING_SCHEMES[name]
+    except KeyError:
+        raise ValueError(f"Unknown aging scheme '{name}'. Choose one of: {', '.join(AGING_SCHEMES)}")
@@ -0,0 +1,35 @@
+"""ASGI serving mode: connections on an event loop, request handlers on a bounded thread pool.
+
+Usage:
+    uvicorn ar_asgi:app --port 5001
+    python ar_asgi.py [--host 127.0.0.1] [--port 5001]
+
+The Flask app is wrapped with a2wsgi, which runs each request's handler (and
+so its pandas work) on a pool of AR_ASGI_WORKERS threads (default 8) while
+the event loop keeps accepting connections, so a burst of requests queues for
+the pool instead of spawning a thread per connection. Concurrent misses for
+the same (data version, role, name) are rendered once and shared, by the
+single flight in ar_backend; ar_loadtest.py drives a local server with such
+bursts.
+"""
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from ar_backend import app as flask_app
+
+# Threads running request handlers; override with AR_ASGI_WORKERS
+ASGI_WORKERS = int(os.environ.get('AR_ASGI_WORKERS', '8'))
+
+app = WSGIMiddleware(flask_app, workers=ASGI_WORKERS)
+
+if __name__ == '__main__':
+    import argparse
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -3,129 +3,466 @@ from flask_cors import CORS
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import random
+import os
+
+from ar_aging import OVERDUE_SPLIT, RISK_AGING, get_aging_scheme
+from ar_crosstab import MANAGER_COUNTRY_DIMENSION, MANAGER_GROUP_DIMENSION, crosstab
+from ar_cube import build_ledger_aggregates, top_customer_sums, top_customer_sums_by
+from ar_dataset import DatasetCache
+from ar_history import HistoryStore, month_over_month, period_change
+from ar_http_cache import PayloadCache, SingleFlight, make_etag
+from ar_json import ARJSONProvider, RawJSON, dumps, records_json
+from ar_metrics import PROMETHEUS_CONTENT_TYPE, Metrics
+from ar_records import RECORD_FORMATS, RecordIndex, iter_records
+from ar_ingest import load_ledger
+from ar_schema import apply_schema, frame_memory, to_records
+from ar_stream import build_streamed_aggregates, is_streamable
+from ar_updates import InvoiceUpdater
+from ar_timeseries import month_labels, monthly_rollup, parse_month
+from ar_worklist import (BILLER_WORKLIST_COLUMNS, COLLECTOR_WORKLIST_COLUMNS, parse_sort, top_worklist,
+                         top_worklists, worklist_page)
 
 app = Flask(__name__)
+app.json = ARJSONProvider(app)  # numpy-aware serializer; NaN becomes null
 CORS(app)  # Allow all origins for dev; restrict in prod
 
-@app.route('/api/ar-data', methods=['GET'])
-def get_ar_data():
-    role = request.args.get('role', 'admin').lower()
-    
-    # Read the Excel file
-    df = pd.read_excel('AR_Model_Dummy_Data.xlsx')
-    
-    # Replace NaN with None for valid JSON
-    df_cleaned = df.where(pd.notnull(df), None)
+# Workbook (or prebuilt .arrow file) backing the API
+AR_DATA_PATH = os.environ.get('AR_DATA_PATH', 'AR_Model_Dummy_Data.xlsx')
+
+# Phase timings and counters behind the Server-Timing header and /api/metrics; AR_METRICS=0 disables timing
+metrics = Metrics()
+
+def load_ar_frame(path):
+    """Load the AR ledger (memory-mapped Arrow, XLSX fallback) into a frame ready for the dashboard formatters"""
+    with metrics.time('ar_dataset_load_seconds', phase='read'):
+        df = load_ledger(path)
+    # Keep native numeric dtypes; NaN becomes None only when records are serialized
+    with metrics.time('ar_dataset_load_seconds', phase='schema'):
+        return apply_schema(df)
+
+def load_ar_source(path):
+    """Frame of an Arrow or XLSX ledger; CSV and Parquet ledgers are aggregated in chunks instead (None)"""
+    return None if is_streamable(path) else load_ar_frame(path)
+
+# Daily aggregates behind the manager's deltas and trends
+history_store = HistoryStore()
+
+# Invoice changes made through the API, applied in place and logged for replay
+invoice_updates = InvoiceUpdater()
+
+def prepare_snapshot(snapshot):
+    """Replay logged invoice changes, build the aggregates and record today's history before the snapshot is published"""
+    if snapshot.df is None:
+        # Aggregated within AR_STREAM_MEMORY without loading the ledger; logged changes are not replayed onto it
+        with metrics.time('ar_dataset_load_seconds', phase='aggregate'):
+            aggregates = snapshot.derived('aggregates', lambda df: build_streamed_aggregates(snapshot.source_path))
+    else:
+        with metrics.time('ar_dataset_load_seconds', phase='replay'):
+            invoice_updates.replay(snapshot)
+        with metrics.time('ar_dataset_load_seconds', phase='aggregate'):
+            aggregates = snapshot.derived('aggregates', build_ledger_aggregates)
+    try:
+        with metrics.time('ar_dataset_load_seconds', phase='history'):
+            history_store.record(aggregates.cube)
+    except OSError as e:
+        print(f"Error recording AR history: {e}")
+
+# Loaded once and shared by all requests; reloaded in the background when the workbook changes
+ar_data_cache = DatasetCache(AR_DATA_PATH, load_ar_source, prepare=prepare_snapshot)
+
+# Answer to requests that need the ledger rows of a snapshot built from streamed aggregates
+STREAMED_LEDGER_ERROR = "Not available for a CSV or Parquet ledger, which is served from streamed aggregates"
+
+# Rendered JSON bodies keyed by (data version, role, name)
+payload_cache = PayloadCache()
+
+# Concurrent misses for the same key render the payload once and share the body
+payload_flight = SingleFlight()
+
+DASHBOARD_ROLES = ('admin', 'manager', 'collector', 'biller', 'collectors', 'billers')
+
+def build_ar_payload(snapshot, role, name=None):
+    """Build the response payload for one role from a dataset snapshot"""
+    # Shared snapshot of the workbook; formatters must not modify it in place
+    df = snapshot.df
+    aggregates = snapshot.derived('aggregates', build_ledger_aggregates)
+    if df is None:
+        return build_streamed_payload(aggregates, role, name, history_store)
     
     if role == 'admin':
-        return jsonify(format_admin_dashboard_data(df_cleaned))
+        return format_admin_dashboard_data(df, aggregates)
     elif role == 'manager':
-        return jsonify(format_manager_dashboard_data(df_cleaned))
+        return format_manager_dashboard_data(df, aggregates, history_store)
     elif role == 'collector':
-        collector_name = request.args.get('name', None)
-        return jsonify(format_collector_dashboard_data(df_cleaned, collector_name))
+        return format_collector_dashboard_data(df, name, aggregates)
     elif role == 'biller':
-        biller_name = request.args.get('name', None)
-        return jsonify(format_biller_dashboard_data(df_cleaned, biller_name))
+        return format_biller_dashboard_data(df, name, aggregates)
+    # Team-lead views: every collector's or biller's dashboard, keyed by name
+    elif role == 'collectors':
+        return format_all_collector_dashboards(df, aggregates)
+    elif role == 'billers':
+        return format_all_biller_dashboards(df, aggregates)
     else:
         # Return raw data for other roles
-        return jsonify(df_cleaned.to_dict(orient='records'))
+        return to_records(df)
+
+def build_streamed_payload(aggregates, role, name=None, history=None):
+    """Build the payload for one role from chunked aggregates (see ar_stream), without the ledger frame"""
+    if role == 'admin':
+        return format_admin_dashboard_data(None, aggregates)
+    elif role == 'manager':
+        return format_manager_dashboard_data(None, aggregates, history)
+    elif role in ('collectors', 'billers'):
+        single = role[:-1]
+        return {str(value): build_streamed_payload(aggregates, single, value) for value in aggregates.cube.per(single)}
+    elif role not in ('collector', 'biller'):
+        raise ValueError(f"Unknown role '{role}'")
+    
+    # The whole ledger's view is kept under None
+    key = name or None
+    worklists = aggregates.worklists[role]
+    worklist_rows = worklists.get(key, worklists[None].iloc[:0])
+    top_customers = aggregates.top_customers[role].get(key, NO_CUSTOMERS)
+    cube = aggregates.cube.slice(**{role: key}) if key else aggregates.cube
+    if role == 'collector':
+        return collector_dashboard(cube, top_customers, worklist_rows)
+    disputes = aggregates.disputes.slice(biller=key) if key else aggregates.disputes
+    return biller_dashboard(cube, disputes, top_customers, worklist_rows)
+
+@app.route('/api/ar-data', methods=['GET'])
+def get_ar_data():
+    role = request.args.get('role', 'admin').lower()
+    # Only the per-user dashboards depend on the name
+    name = request.args.get('name', None) if role in ('collector', 'biller') else None
+    
+    # Raw records for other roles share one metrics label
+    timer = metrics.request(role if role in DASHBOARD_ROLES else 'records')
+    with timer.phase('snapshot'):
+        snapshot = ar_data_cache.get()
+    if role not in DASHBOARD_ROLES:
+        return timer.finish(app.make_response(stream_ar_records(snapshot, role)))
+    
+    version = view_version(snapshot, role)
+    etag = make_etag(version, role, name)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        result = 'not_modified'
+    else:
+        body, result = render_view(snapshot, version, role, name, timer)
+        response = app.response_class(body, mimetype=app.json.mimetype)
+    
+    response.set_etag(etag)
+    # Let clients keep the body but revalidate it on every poll
+    response.headers['Cache-Control'] = 'no-cache'
+    return timer.finish(response, result)
+
+def view_version(snapshot, role):
+    """Data version a role's dashboard is rendered from"""
+    if role != 'manager':
+        return snapshot.version
+    # The manager's deltas also depend on the recorded history, which is recorded as a snapshot is prepared
+    return snapshot.version + snapshot.derived('history_version', lambda df: history_store.version())
 
-def format_admin_dashboard_data(df):
+def render_view(snapshot, version, role, name, timer):
+    """JSON body of one dashboard from the payload cache, rendered once on a miss; returns (body, result)"""
+    cache_key = (version, role, name)
+    with timer.phase('cache'):
+        body = payload_cache.get(cache_key)
+    if body is not None:
+        return body, 'hit'
+    
+    def render():
+        # A flight that finished between the lookup and now has already cached the body
+        body = payload_cache.peek(cache_key)
+        if body is not None:
+            return body
+        # Never render a payload from a half-applied invoice change
+        with invoice_updates.lock:
+            with timer.phase('aggregate'):
+                snapshot.derived('aggregates', build_ledger_aggregates)
+            with timer.phase('format'):
+                payload = build_ar_payload(snapshot, role, name)
+            with timer.phase('serialize'):
+                body = dumps(payload)
+        payload_cache.put(cache_key, body)
+        return body
+    
+    # Requests that join a render report only its wait, in their total
+    body, shared = payload_flight.do(cache_key, render)
+    return body, 'coalesced' if shared else 'miss'
+
+# Most dashboards one batch request may ask for
+MAX_BATCH_VIEWS = 50
+
+# How a batch was produced, from its least cached view
+BATCH_RESULTS = ('hit', 'coalesced', 'miss')
+
+@app.route('/api/ar-data/batch', methods=['POST'])
+def get_ar_data_batch():
+    """Several dashboards from one snapshot in one response, e.g. {"views": [{"role": "admin"}, {"role": "collector", "name": "..."}]}"""
+    body = request.get_json(silent=True)
+    specs = body.get('views') if isinstance(body, dict) else None
+    if not isinstance(specs, list) or not specs:
+        return jsonify({"error": "Expected a JSON object with a non-empty 'views' list"}), 400
+    if len(specs) > MAX_BATCH_VIEWS:
+        return jsonify({"error": f"At most {MAX_BATCH_VIEWS} views per batch"}), 400
+    views = []
+    for spec in specs:
+        role = spec.get('role') if isinstance(spec, dict) else None
+        if not isinstance(role, str) or role.lower() not in DASHBOARD_ROLES:
+            return jsonify({"error": f"Each view needs a role out of {', '.join(DASHBOARD_ROLES)}"}), 400
+        role = role.lower()
+        name = spec.get('name') if role in ('collector', 'biller') else None
+        if name is not None and not isinstance(name, str):
+            return jsonify({"error": "View names must be strings"}), 400
+        views.append((role, name or None))
+    
+    timer = metrics.request('batch')
+    with timer.phase('snapshot'):
+        # Every view comes from the same snapshot
+        snapshot = ar_data_cache.get()
+    versions = [view_version(snapshot, role) for role, _ in views]
+    etag = make_etag(snapshot.version, *(part for version, view in zip(versions, views) for part in (version,) + view))
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        result = 'not_modified'
+    else:
+        # Repeated views are rendered once; the aggregates and partitions are shared by all of them
+        bodies = {}
+        results = set()
+        for version, (role, name) in zip(versions, views):
+            if (role, name) not in bodies:
+                bodies[role, name], view_result = render_view(snapshot, version, role, name, timer)
+                results.add(view_result)
+        result = max(results, key=BATCH_RESULTS.index)
+        with timer.phase('serialize'):
+            body = dumps({
+                'version': snapshot.version,
+                'views': [{'role': role, 'name': name, 'data': RawJSON(bodies[role, name])} for role, name in views],
+            })
+        response = app.response_class(body, mimetype=app.json.mimetype)
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return timer.finish(response, result)
+
+def stream_ar_records(snapshot, role):
+    """Stream raw records ordered by invoice number, with cursor paging and column projection"""
+    df = snapshot.df
+    if df is None:
+        return jsonify({"error": STREAMED_LEDGER_ERROR}), 501
+    fmt = request.args.get('format', 'json').lower()
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    try:
+        cursor = int(request.args['cursor']) if 'cursor' in request.args else None
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+    except ValueError:
+        return jsonify({"error": "cursor and limit must be integers"}), 400
+    if fmt not in RECORD_FORMATS:
+        return jsonify({"error": f"Unknown format '{fmt}'"}), 400
+    if limit is not None and limit <= 0:
+        return jsonify({"error": "limit must be positive"}), 400
+    unknown_fields = [field for field in fields if field not in df.columns]
+    if unknown_fields:
+        return jsonify({"error": f"Unknown fields: {', '.join(unknown_fields)}"}), 400
+    
+    etag = make_etag(snapshot.version, role, fmt, ','.join(fields), cursor, limit)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        positions, next_cursor = snapshot.derived('record_index', RecordIndex).page(cursor, limit)
+        response = app.response_class(iter_records(df, positions, fields, fmt), mimetype=RECORD_FORMATS[fmt])
+        if next_cursor is not None:
+            response.headers['X-Next-Cursor'] = str(next_cursor)
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Largest worklist page a client may request
+MAX_WORKLIST_PAGE = 500
+
+@app.route('/api/worklist', methods=['GET'])
+def get_worklist():
+    """Page through a collector's or biller's worklist, most overdue first"""
+    role = request.args.get('role', 'collector').lower()
+    if role not in ('collector', 'biller'):
+        return jsonify({"error": "Worklists are available for the collector and biller roles"}), 400
+    name = request.args.get('name', None)
+    try:
+        limit = int(request.args.get('limit', 50))
+        sort = parse_sort(request.args.get('sort', None))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not 0 < limit <= MAX_WORKLIST_PAGE:
+        return jsonify({"error": f"limit must be between 1 and {MAX_WORKLIST_PAGE}"}), 400
+    
+    snapshot = ar_data_cache.get()
+    df = snapshot.df
+    if df is None:
+        return jsonify({"error": STREAMED_LEDGER_ERROR}), 501
+    if name:
+        aggregates = snapshot.derived('aggregates', build_ledger_aggregates)
+        df = aggregates.partitions[role].take(df, name)
+    columns = COLLECTOR_WORKLIST_COLUMNS
+    if role == 'biller':
+        # Billers work their disputed invoices
+        df = df[df['Invoice Status'] == 'Disputed']
+        columns = BILLER_WORKLIST_COLUMNS
+    
+    try:
+        rows, next_cursor = worklist_page(df, limit, request.args.get('cursor', None), sort)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({'items': records_json(rows[columns]), 'nextCursor': next_cursor})
+
+def invoice_response(row, status=200):
+    """JSON body of one ledger row"""
+    return jsonify(to_records(row.to_frame().T)[0]), status
+
+@app.route('/api/invoices', methods=['POST'])
+def create_invoice():
+    """Add an invoice to the live ledger"""
+    fields = request.get_json(silent=True)
+    if not isinstance(fields, dict):
+        return jsonify({"error": "Expected a JSON object of invoice fields"}), 400
+    snapshot = ar_data_cache.get()
+    if snapshot.df is None:
+        return jsonify({"error": STREAMED_LEDGER_ERROR}), 501
+    try:
+        row = invoice_updates.create(snapshot, fields)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return invoice_response(row, 201)
+
+@app.route('/api/invoices/<int:invoice_number>', methods=['PATCH'])
+def update_invoice(invoice_number):
+    """Change editable fields of an invoice, e.g. 'Invoice Status' or 'Outcome Status'"""
+    fields = request.get_json(silent=True)
+    if not isinstance(fields, dict) or not fields:
+        return jsonify({"error": "Expected a JSON object of fields to change"}), 400
+    snapshot = ar_data_cache.get()
+    if snapshot.df is None:
+        return jsonify({"error": STREAMED_LEDGER_ERROR}), 501
+    try:
+        row = invoice_updates.update(snapshot, invoice_number, fields)
+    except KeyError:
+        return jsonify({"error": f"Invoice {invoice_number} not found"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return invoice_response(row)
+
+@app.route('/api/invoices/<int:invoice_number>/payments', methods=['POST'])
+def record_payment(invoice_number):
+    """Record a payment against an invoice, reducing its open amount"""
+    body = request.get_json(silent=True)
+    amount = body.get('amount') if isinstance(body, dict) else None
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)):
+        return jsonify({"error": "Expected a JSON object with a numeric 'amount'"}), 400
+    snapshot = ar_data_cache.get()
+    if snapshot.df is None:
+        return jsonify({"error": STREAMED_LEDGER_ERROR}), 501
+    try:
+        row = invoice_updates.record_payment(snapshot, invoice_number, amount)
+    except KeyError:
+        return jsonify({"error": f"Invoice {invoice_number} not found"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return invoice_response(row)
+
+@app.route('/api/monthly', methods=['GET'])
+def get_monthly():
+    """Monthly invoiced/outstanding/overdue series for a month range, optionally for one collector or biller"""
+    role = request.args.get('role', 'admin').lower()
+    name = request.args.get('name', None)
+    try:
+        start = parse_month(request.args['from']) if 'from' in request.args else None
+        end = parse_month(request.args['to']) if 'to' in request.args else None
+        cube = ar_data_cache.get().derived('aggregates', build_ledger_aggregates).cube
+        if name and role in ('collector', 'biller'):
+            cube = cube.slice(**{role: name})
+        monthly = monthly_rollup(cube, start, end)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        'labels': month_labels(monthly.index),
+        'months': [str(period) for period in monthly.index],
+        **{column: monthly[column].to_numpy() for column in monthly.columns},
+    })
+
+@app.route('/api/cache-stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(payload_cache.stats())
+
+@metrics.collector
+def cache_and_dataset_metrics():
+    """Payload cache and dataset counters, read from their own stats at scrape time"""
+    stats = payload_cache.stats()
+    samples = [
+        ('ar_payload_cache_hits_total', 'counter', {}, stats['hits']),
+        ('ar_payload_cache_misses_total', 'counter', {}, stats['misses']),
+        ('ar_payload_cache_evictions_total', 'counter', {}, stats['evictions']),
+        ('ar_payload_cache_hit_ratio', 'gauge', {}, stats['hitRate']),
+        ('ar_payload_cache_bytes', 'gauge', {}, stats['bytes']),
+        ('ar_payload_cache_entries', 'gauge', {}, stats['entries']),
+        ('ar_payload_renders_total', 'counter', {}, payload_flight.calls),
+        ('ar_payload_coalesced_total', 'counter', {}, payload_flight.shared),
+        ('ar_dataset_reloads_total', 'counter', {}, ar_data_cache.reload_count),
+        ('ar_dataset_reload_errors_total', 'counter', {}, ar_data_cache.reload_errors),
+    ]
+    snapshot = ar_data_cache.snapshot
+    if snapshot is not None and snapshot.df is not None:
+        samples.append(('ar_dataset_rows', 'gauge', {}, len(snapshot.df)))
+        samples.append(('ar_dataset_revision', 'gauge', {}, snapshot.revision))
+        samples.append(('ar_dataset_memory_bytes', 'gauge', {}, snapshot.derived('memory_bytes', frame_memory)))
+    return samples
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Request phase latencies, cache hit rates and reload counts in Prometheus text format"""
+    return app.response_class(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+def format_admin_dashboard_data(df, aggregates=None):
     """Format data for the Admin Dashboard visualization"""
+    aggregates = aggregates or build_ledger_aggregates(df)
+    cube = aggregates.cube
+    overdue_cube = cube.where_bucket(OVERDUE_SPLIT, 'overdue')
+    
     # Extract key metrics
-    total_invoice_amount = df['Invoice Amount'].sum()
-    accounts_receivable = df['Invoice Amount'].sum()
-    overdue_receivables = df[df['Days overdue'] > 0]['Invoice Amount'].sum()
+    total_invoice_amount = cube.total()
+    accounts_receivable = total_invoice_amount
+    overdue_receivables = overdue_cube.total()
     overdue_percentage = round((overdue_receivables / accounts_receivable) * 100) if accounts_receivable > 0 else 0
     
-    # Monthly performance data
-    # Group by Invoice month
-    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    
-    # Try to extract monthly data by parsing invoice dates
-    try:
-        # Convert 'Invoice date' to datetime if it's not already
-        if not pd.api.types.is_datetime64_dtype(df['Invoice date']):
-            df['Invoice date'] = pd.to_datetime(df['Invoice date'], format='%d-%b', errors='coerce')
-        
-        # Extract month name
-        df['Month'] = df['Invoice date'].dt.strftime('%b')
-        
-        # Group by month and calculate metrics
-        monthly_data = df.groupby('Month').agg({
-            'Invoice Amount': 'sum',
-            'Days overdue': lambda x: (x > 0).sum(),
-        }).reindex(months, fill_value=0)
-        
-        invoice_amounts = monthly_data['Invoice Amount'].tolist()
-        
-        # Calculate outstanding and overdue for each month
-        outstanding_amounts = []
-        overdue_amounts = []
-        for month in months:
-            month_df = df[df['Month'] == month]
-            outstanding = month_df['Invoice Amount'].sum() * 0.3  # Assume 30% outstanding
-            overdue = month_df[month_df['Days overdue'] > 0]['Invoice Amount'].sum()
-            outstanding_amounts.append(outstanding)
-            overdue_amounts.append(overdue)
-    except Exception:
-        # Fallback: Generate random but realistic monthly data
-        invoice_amounts = [random.uniform(800000, 1200000) for _ in range(12)]
-        outstanding_amounts = [amount * random.uniform(0.1, 0.3) for amount in invoice_amounts]
-        overdue_amounts = [amount * random.uniform(0.05, 0.15) for amount in invoice_amounts]
+    # Monthly performance for the last 12 invoice months (year-aware)
+    monthly = monthly_rollup(cube)
     
     monthly_performance = {
-        'labels': months,
+        'labels': month_labels(monthly.index),
         'datasets': [
             {
                 'label': 'Total Invoice Amount',
-                'data': invoice_amounts,
+                'data': monthly['invoiced'].to_numpy(),
                 'backgroundColor': 'rgba(16, 185, 129, 0.8)'
             },
             {
                 'label': 'Total Outstanding Amount',
-                'data': outstanding_amounts,
+                'data': monthly['outstanding'].to_numpy(),
                 'backgroundColor': 'rgba(250, 204, 21, 0.8)'
             },
             {
                 'label': 'Total Overdue Amount',
-                'data': overdue_amounts,
+                'data': monthly['overdue'].to_numpy(),
                 'backgroundColor': 'rgba(244, 63, 94, 0.5)'
             }
         ]
     }
     
-    # Invoice status data
-    invoice_status_counts = df['Invoice Status'].value_counts()
-    
-    # Map status to our visualization categories
-    status_mapping = {
-        'Current': 'Paid Invoice',
-        'Disputed': 'Open Invoice',
-    }
-    
-    # Initialize status counts
-    status_counts = {
-        'Paid Invoice': 0,
-        'Open Invoice': 0,
-        'Overdue Invoice': 0
-    }
-    
-    # Count by mapped status
-    for status, count in invoice_status_counts.items():
-        if status == 'Current':
-            status_counts['Paid Invoice'] += count
-        elif status == 'Disputed':
-            status_counts['Open Invoice'] += count
-        elif status.startswith('Overdue'):
-            status_counts['Overdue Invoice'] += count
-    
-    # Convert to values based on invoice amounts, not just counts
-    paid_invoice_amount = df[df['Invoice Status'] == 'Current']['Invoice Amount'].sum()
-    open_invoice_amount = df[df['Invoice Status'] == 'Disputed']['Invoice Amount'].sum()
-    overdue_invoice_amount = df[df['Invoice Status'].str.startswith('Overdue', na=False)]['Invoice Amount'].sum()
+    # Invoice status data, by invoice amount
+    status_amounts = cube.by('status')
+    paid_invoice_amount = status_amounts.get('Current', 0)
+    open_invoice_amount = status_amounts.get('Disputed', 0)
+    overdue_invoice_amount = status_amounts[status_amounts.index.str.startswith('Overdue')].sum()
     
     invoice_status = {
         'labels': ['Paid Invoice', 'Open Invoice', 'Overdue Invoice'],
@@ -142,27 +479,27 @@ def format_admin_dashboard_data(df):
     }
     
     # Top 5 customers by sales
-    customer_sales = df.groupby('Customer Name')['Invoice Amount'].sum().nlargest(5)
+    customer_sales = aggregates.customers['amount'].nlargest(5)
     
     top_customers_by_sales = {
         'labels': customer_sales.index.tolist(),
         'datasets': [
             {
                 'label': 'Sales',
-                'data': customer_sales.values.tolist(),
+                'data': customer_sales.to_numpy(),
                 'backgroundColor': 'rgba(59, 130, 246, 0.8)'
             }
         ]
     }
     
-    # Top 5 customers by receivables
-    customer_receivables = df.groupby('Customer Name')['Invoice Amount'].sum().nlargest(5)
+    # Top 5 customers by receivables; the open invoice amount is the receivable, so these match the sales ranking
+    customer_receivables = customer_sales
     
     top_customers_by_receivables = {
         'labels': customer_receivables.index.tolist(),
         'datasets': [
             {
-                'data': customer_receivables.values.tolist(),
+                'data': customer_receivables.to_numpy(),
                 'backgroundColor': [
                     'rgba(16, 185, 129, 0.8)',
                     'rgba(59, 130, 246, 0.8)',
@@ -175,30 +512,27 @@ def format_admin_dashboard_data(df):
     }
     
     # Aging buckets by overdue amount
+    aging_scheme = get_aging_scheme()
+    _, bucket_amounts = cube.bucket_totals(aging_scheme)
     aging_buckets = {
-        'labels': ['0-30 Days', '31-60 Days', '61-90 Days', '90+ Days'],
+        'labels': aging_scheme.labels,
         'datasets': [
             {
                 'label': 'Overdue Amount',
-                'data': [
-                    df[(df['Days overdue'] >= 0) & (df['Days overdue'] <= 30)]['Invoice Amount'].sum(),
-                    df[(df['Days overdue'] > 30) & (df['Days overdue'] <= 60)]['Invoice Amount'].sum(),
-                    df[(df['Days overdue'] > 60) & (df['Days overdue'] <= 90)]['Invoice Amount'].sum(),
-                    df[df['Days overdue'] > 90]['Invoice Amount'].sum()
-                ],
+                'data': bucket_amounts,
                 'backgroundColor': 'rgba(250, 204, 21, 0.8)'
             }
         ]
     }
     
     # Overdue balance by collector
-    collector_balance = df.groupby('Collector Name')['Invoice Amount'].sum()
+    collector_balance = cube.by('collector')
     
     overdue_balance_by_collector = {
         'labels': collector_balance.index.tolist(),
         'datasets': [
             {
-                'data': collector_balance.values.tolist(),
+                'data': collector_balance.to_numpy(),
                 'backgroundColor': [
                     'rgba(16, 185, 129, 0.8)',
                     'rgba(59, 130, 246, 0.8)',
@@ -226,18 +560,20 @@ def format_admin_dashboard_data(df):
     
     return formatted_data
 
-def format_manager_dashboard_data(df):
+def format_manager_dashboard_data(df, aggregates=None, history=None):
     """Format data for the Manager Dashboard visualization"""
+    aggregates = aggregates or build_ledger_aggregates(df)
+    cube = aggregates.cube
+    
     # Extract key metrics
-    total_balance = df['Invoice Amount'].sum()
-    total_accounts = df['Customer ID'].nunique()
+    total_balance = cube.total()
+    total_accounts = aggregates.total_accounts
     
     # Balance distribution
     # For manager view, we categorize balances as before due, overdue, and non-active
-    before_due_amount = df[df['Days overdue'] <= 0]['Invoice Amount'].sum()
-    overdue_amount = df[df['Days overdue'] > 0]['Invoice Amount'].sum()
+    _, (before_due_amount, overdue_amount) = cube.bucket_totals(OVERDUE_SPLIT)
     # Non-active invoices (those with Current status)
-    non_active_amount = df[df['Invoice Status'] == 'Current']['Invoice Amount'].sum()
+    non_active_amount = cube.slice(status='Current').total()
     
     balance_distribution = {
         'labels': ['Before Due', 'Overdue', 'Non-Active'],
@@ -254,35 +590,30 @@ def format_manager_dashboard_data(df):
     }
     
     # DSO (Days Sales Outstanding) average - use actual data
-    dso_average = int(df['Days overdue'].mean()) if not np.isnan(df['Days overdue'].mean()) else 444
+    days_overdue_mean = cube.days_mean()
+    dso_average = int(days_overdue_mean) if not np.isnan(days_overdue_mean) else 444
     
     # Risk status percentages based on overdue days
-    high_risk = df[df['Days overdue'] > 90]['Invoice Amount'].sum() / total_balance if total_balance > 0 else 0
-    moderate_risk = df[(df['Days overdue'] > 30) & (df['Days overdue'] <= 90)]['Invoice Amount'].sum() / total_balance if total_balance > 0 else 0
-    in_range = df[df['Days overdue'] <= 30]['Invoice Amount'].sum() / total_balance if total_balance > 0 else 0
+    _, risk_amounts = cube.bucket_totals(RISK_AGING)
+    risk_shares = dict(zip(RISK_AGING.labels, (risk_amounts / total_balance).tolist() if total_balance > 0 else [0] * len(RISK_AGING)))
     
     risk_status = {
-        'high': high_risk,
-        'moderate': moderate_risk,
-        'inRange': in_range
+        'high': risk_shares['high'],
+        'moderate': risk_shares['moderate'],
+        'inRange': risk_shares['inRange']
     }
     
-    # Changes from previous month - simulate for the dashboard
-    # In a real app, we would compare with historical data
-    overdue_change = -24000000  # Shown in screenshot with negative value
-    overdue_percentage_change = -0.17  # 17% decrease shown in screenshot
-    before_due_change = 9000000  # Shown in screenshot with positive value
-    before_due_percentage_change = 0.23  # 23% increase shown in screenshot
+    # Changes from a month earlier, from the recorded daily history
+    history = history or history_store
+    overdue_history = history.series(scheme=OVERDUE_SPLIT)
+    overdue_change, overdue_percentage_change = period_change(overdue_history, 'overdue')
+    before_due_change, before_due_percentage_change = period_change(overdue_history, 'beforeDue')
     
-    # Monthly trend data (current vs previous month)
-    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    
-    # Generate data that mimics the line chart in the screenshot
-    current_month_data = [40000000, 35000000, 45000000, 50000000, 42000000, 48000000, 120000000, 140000000, 130000000, 125000000]
-    previous_month_data = [35000000, 40000000, 39000000, 46000000, 41000000, 39000000, 110000000, 140000000, 135000000, 120000000]
+    # Daily overdue balance this month vs the previous month
+    days, current_month_data, previous_month_data = month_over_month(overdue_history, 'overdue')
     
     monthly_trend = {
-        'labels': months,
+        'labels': days,
         'datasets': [
             {
                 'label': 'Current',
@@ -305,7 +636,9 @@ def format_manager_dashboard_data(df):
     }
     
     # Top overdue companies - Get actual top overdue companies based on invoice amount
-    top_overdue_df = df[df['Days overdue'] > 0].groupby('Customer Name')['Invoice Amount'].sum().nlargest(5)
+    customers = aggregates.customers
+    # Masked rather than filtered, so that the customer names are not copied
+    top_overdue_df = customers['overdue_amount'].where(customers['overdue_count'] > 0).nlargest(5)
     top_overdue_companies = [
         {'name': name, 'amount': amount} for name, amount in top_overdue_df.items()
     ]
@@ -325,46 +658,10 @@ def format_manager_dashboard_data(df):
                     top_overdue_companies.append(company)
     
     # Overdue by country - Group by Customer type instead of country (as we don't have country data)
-    customer_types = df['Customer type'].unique().tolist()
-    overdue_by_type = {customer_type: df[(df['Customer type'] == customer_type) & (df['Days overdue'] > 0)]['Invoice Amount'].sum() for customer_type in customer_types}
-    before_due_by_type = {customer_type: df[(df['Customer type'] == customer_type) & (df['Days overdue'] <= 0)]['Invoice Amount'].sum() for customer_type in customer_types}
-    
-    overdue_by_country = {
-        'labels': customer_types,
-        'datasets': [
-            {
-                'label': 'Overdue',
-                'data': [overdue_by_type.get(customer_type, 0) for customer_type in customer_types],
-                'backgroundColor': 'rgba(244, 63, 94, 0.8)'
-            },
-            {
-                'label': 'Before Due',
-                'data': [before_due_by_type.get(customer_type, 0) for customer_type in customer_types],
-                'backgroundColor': 'rgba(16, 185, 129, 0.8)'
-            }
-        ]
-    }
+    overdue_by_country = overdue_crosstab_chart(df, aggregates, MANAGER_COUNTRY_DIMENSION)
     
     # Overdue by customer group - Use customer terms as a proxy for customer group
-    customer_terms = df['Customer terms'].unique().tolist()
-    overdue_by_terms = {term: df[(df['Customer terms'] == term) & (df['Days overdue'] > 0)]['Invoice Amount'].sum() for term in customer_terms}
-    before_due_by_terms = {term: df[(df['Customer terms'] == term) & (df['Days overdue'] <= 0)]['Invoice Amount'].sum() for term in customer_terms}
-    
-    overdue_by_customer_group = {
-        'labels': customer_terms,
-        'datasets': [
-            {
-                'label': 'Overdue',
-                'data': [overdue_by_terms.get(term, 0) for term in customer_terms],
-                'backgroundColor': 'rgba(244, 63, 94, 0.8)'
-            },
-            {
-                'label': 'Before Due',
-                'data': [before_due_by_terms.get(term, 0) for term in customer_terms],
-                'backgroundColor': 'rgba(16, 185, 129, 0.8)'
-            }
-        ]
-    }
+    overdue_by_customer_group = overdue_crosstab_chart(df, aggregates, MANAGER_GROUP_DIMENSION)
     
     # Format data for the manager dashboard
     formatted_data = {
@@ -385,34 +682,83 @@ def format_manager_dashboard_data(df):
     
     return formatted_data
 
-def format_collector_dashboard_data(df, collector_name=None):
+def overdue_crosstab_chart(df, aggregates, dimension):
+    """Overdue vs before-due amounts per value of a dimension, as a grouped bar chart"""
+    table = aggregates.crosstabs.get(dimension)
+    if table is None:
+        table = crosstab(df, dimension)
+    
+    return {
+        'labels': table.index.tolist(),
+        'datasets': [
+            {
+                'label': 'Overdue',
+                'data': table['overdue'].to_numpy(),
+                'backgroundColor': 'rgba(244, 63, 94, 0.8)'
+            },
+            {
+                'label': 'Before Due',
+                'data': table['beforeDue'].to_numpy(),
+                'backgroundColor': 'rgba(16, 185, 129, 0.8)'
+            }
+        ]
+    }
+
+# Top customers of a collector or biller with no overdue or disputed invoices
+NO_CUSTOMERS = pd.Series(dtype='float64')
+
+def format_collector_dashboard_data(df, collector_name=None, aggregates=None):
     """Format data for the Collector Dashboard visualization"""
-    # Filter data for this collector if collector_name is provided
+    aggregates = aggregates or build_ledger_aggregates(df)
+    cube = aggregates.cube
+    # Ledger rows of this collector if collector_name is provided
+    rows = np.arange(len(df))
     if collector_name:
-        df = df[df['Collector Name'] == collector_name]
+        rows = aggregates.partitions['collector'].rows(collector_name)
+        cube = cube.slice(collector=collector_name)
+    
+    # Top customers by overdue amount
+    overdue_rows = rows[(df['Days overdue'].iloc[rows] > 0).to_numpy(dtype=bool, na_value=False)]
+    top_customers = top_customer_sums(aggregates, overdue_rows, df['Invoice Amount'].to_numpy(dtype='float64'), 5)
     
+    return collector_dashboard(cube, top_customers, top_worklist(df, 10, rows=rows))
+
+def format_all_collector_dashboards(df, aggregates=None):
+    """Collector Dashboard data for every collector, keyed by name, from one grouped pass per measure"""
+    aggregates = aggregates or build_ledger_aggregates(df)
+    partition = aggregates.partitions['collector']
+    names, group_codes = partition.groups(len(df))
+    cubes = aggregates.cube.per('collector')
+    
+    overdue_rows = np.flatnonzero((df['Days overdue'] > 0).to_numpy(dtype=bool, na_value=False))
+    top_customers = top_customer_sums_by(aggregates, group_codes, overdue_rows,
+                                         df['Invoice Amount'].to_numpy(dtype='float64'), 5)
+    worklists = top_worklists(df, {name: partition.rows(name) for name in names}, 10)
+    
+    return {str(name): collector_dashboard(cubes[name], top_customers.get(code, NO_CUSTOMERS), worklists[name])
+            for code, name in enumerate(names)}
+
+def collector_dashboard(cube, top_customers, worklist_rows):
+    """Collector Dashboard data from the collector's cube, top overdue customers and worklist rows"""
     # Total assigned invoices and amount
-    total_assigned = len(df)
-    total_assigned_amount = df['Invoice Amount'].sum()
+    total_assigned = int(cube.total('count'))
+    total_assigned_amount = cube.total()
     
     # Overdue metrics
-    overdue_invoices = df[df['Days overdue'] > 0]
-    total_overdue = len(overdue_invoices)
-    total_overdue_amount = overdue_invoices['Invoice Amount'].sum()
+    overdue_cube = cube.where_bucket(OVERDUE_SPLIT, 'overdue')
+    total_overdue = int(overdue_cube.total('count'))
+    total_overdue_amount = overdue_cube.total()
     overdue_percentage = round((total_overdue_amount / total_assigned_amount) * 100) if total_assigned_amount > 0 else 0
     
     # Aging buckets for collector
+    aging_scheme = get_aging_scheme()
+    _, bucket_amounts = cube.bucket_totals(aging_scheme)
     aging_buckets = {
-        'labels': ['0-30 Days', '31-60 Days', '61-90 Days', '90+ Days'],
+        'labels': aging_scheme.labels,
         'datasets': [
             {
                 'label': 'Invoices',
-                'data': [
-                    df[(df['Days overdue'] >= 0) & (df['Days overdue'] <= 30)]['Invoice Amount'].sum(),
-                    df[(df['Days overdue'] > 30) & (df['Days overdue'] <= 60)]['Invoice Amount'].sum(),
-                    df[(df['Days overdue'] > 60) & (df['Days overdue'] <= 90)]['Invoice Amount'].sum(),
-                    df[df['Days overdue'] > 90]['Invoice Amount'].sum()
-                ],
+                'data': bucket_amounts,
                 'backgroundColor': [
                     'rgba(16, 185, 129, 0.8)',
                     'rgba(250, 204, 21, 0.8)',
@@ -424,9 +770,9 @@ def format_collector_dashboard_data(df, collector_name=None):
     }
     
     # Status distribution
-    status_counts = df['Invoice Status'].value_counts().to_dict()
-    status_labels = list(status_counts.keys())
-    status_data = list(status_counts.values())
+    status_counts = cube.by('status', measure='count', sort=False).sort_values(ascending=False, kind='stable')
+    status_labels = status_counts.index.tolist()
+    status_data = status_counts.to_numpy()
     
     status_distribution = {
         'labels': status_labels,
@@ -444,22 +790,19 @@ def format_collector_dashboard_data(df, collector_name=None):
         ]
     }
     
-    # Top customers by overdue amount
-    top_customers = df[df['Days overdue'] > 0].groupby('Customer Name')['Invoice Amount'].sum().nlargest(5)
-    
     top_customers_by_overdue = {
         'labels': top_customers.index.tolist(),
         'datasets': [
             {
                 'label': 'Overdue Amount',
-                'data': top_customers.values.tolist(),
+                'data': top_customers.to_numpy(),
                 'backgroundColor': 'rgba(244, 63, 94, 0.8)'
             }
         ]
     }
     
     # Worklist - actual assigned invoices with essential data
-    worklist = df.sort_values('Days overdue', ascending=False)[['Customer Name', 'Invoice number', 'Invoice Amount', 'Invoice due date', 'Days overdue', 'Invoice Status']].head(10).to_dict(orient='records')
+    worklist = records_json(worklist_rows[COLLECTOR_WORKLIST_COLUMNS])
     
     # Format data for the collector dashboard
     formatted_data = {
@@ -476,26 +819,62 @@ def format_collector_dashboard_data(df, collector_name=None):
     
     return formatted_data
 
-def format_biller_dashboard_data(df, biller_name=None):
+def format_biller_dashboard_data(df, biller_name=None, aggregates=None):
     """Format data for the Biller Dashboard visualization"""
-    # Filter data for this biller if biller_name is provided
+    aggregates = aggregates or build_ledger_aggregates(df)
+    cube = aggregates.cube
+    disputes = aggregates.disputes
+    # Ledger rows of this biller if biller_name is provided
+    rows = np.arange(len(df))
     if biller_name:
-        df = df[df['Biller Name'] == biller_name]
+        rows = aggregates.partitions['biller'].rows(biller_name)
+        cube = cube.slice(biller=biller_name)
+        disputes = disputes.slice(biller=biller_name)
+    
+    # Top customers by disputed amount
+    disputed_rows = rows[(df['Invoice Status'].iloc[rows] == 'Disputed').to_numpy(dtype=bool, na_value=False)]
+    top_customers = top_customer_sums(aggregates, disputed_rows, df['Invoice Amount'].to_numpy(dtype='float64'), 5)
     
+    return biller_dashboard(cube, disputes, top_customers, top_worklist(df, 10, rows=disputed_rows))
+
+def format_all_biller_dashboards(df, aggregates=None):
+    """Biller Dashboard data for every biller, keyed by name, from one grouped pass per measure"""
+    aggregates = aggregates or build_ledger_aggregates(df)
+    partition = aggregates.partitions['biller']
+    names, group_codes = partition.groups(len(df))
+    cubes = aggregates.cube.per('biller')
+    disputes = aggregates.disputes.per('biller')
+    
+    disputed = (df['Invoice Status'] == 'Disputed').to_numpy(dtype=bool, na_value=False)
+    top_customers = top_customer_sums_by(aggregates, group_codes, np.flatnonzero(disputed),
+                                         df['Invoice Amount'].to_numpy(dtype='float64'), 5)
+    disputed_by_biller = {}
+    for name in names:
+        rows = partition.rows(name)
+        disputed_by_biller[name] = rows[disputed[rows]]
+    worklists = top_worklists(df, disputed_by_biller, 10)
+    
+    # A biller without disputes has no cells in the disputes cube
+    return {str(name): biller_dashboard(cubes[name],
+                                        disputes[name] if name in disputes else aggregates.disputes.slice(biller=name),
+                                        top_customers.get(code, NO_CUSTOMERS), worklists[name])
+            for code, name in enumerate(names)}
+
+def biller_dashboard(cube, disputes, top_customers, worklist_rows):
+    """Biller Dashboard data from the biller's cube and disputes cube, top disputed customers and worklist rows"""
     # Total assigned invoices and amount
-    total_assigned = len(df)
-    total_assigned_amount = df['Invoice Amount'].sum()
+    total_assigned = int(cube.total('count'))
+    total_assigned_amount = cube.total()
     
     # Dispute metrics
-    disputed_invoices = df[df['Invoice Status'] == 'Disputed']
-    total_disputed = len(disputed_invoices)
-    total_disputed_amount = disputed_invoices['Invoice Amount'].sum()
+    total_disputed = int(disputes.total('count'))
+    total_disputed_amount = disputes.total()
     disputed_percentage = round((total_disputed / total_assigned) * 100) if total_assigned > 0 else 0
     
-    # Root causes for disputes - handle empty/null values
-    root_causes = disputed_invoices['Root cause dropdown'].fillna('Unspecified').value_counts().to_dict()
-    root_cause_labels = list(root_causes.keys())
-    root_cause_data = list(root_causes.values())
+    # Root causes for disputes - missing values counted as 'Unspecified'
+    root_causes = disputes.by('root_cause', measure='count', sort=False).sort_values(ascending=False, kind='stable')
+    root_cause_labels = root_causes.index.tolist()
+    root_cause_data = root_causes.to_numpy()
     
     root_cause_distribution = {
         'labels': root_cause_labels,
@@ -515,9 +894,9 @@ def format_biller_dashboard_data(df, biller_name=None):
     }
     
     # Dispute code distribution - handle empty/null values
-    dispute_codes = disputed_invoices['Dispute code L1'].fillna('Unspecified').value_counts().to_dict()
-    dispute_code_labels = list(dispute_codes.keys())
-    dispute_code_data = list(dispute_codes.values())
+    dispute_codes = disputes.by('dispute_code', measure='count', sort=False).sort_values(ascending=False, kind='stable')
+    dispute_code_labels = dispute_codes.index.tolist()
+    dispute_code_data = dispute_codes.to_numpy()
     
     dispute_code_distribution = {
         'labels': dispute_code_labels,
@@ -536,24 +915,21 @@ def format_biller_dashboard_data(df, biller_name=None):
         ]
     }
     
-    # Top customers by disputed amount
-    top_customers = disputed_invoices.groupby('Customer Name')['Invoice Amount'].sum().nlargest(5)
-    
     top_customers_by_disputed = {
         'labels': top_customers.index.tolist(),
         'datasets': [
             {
                 'label': 'Disputed Amount',
-                'data': top_customers.values.tolist(),
+                'data': top_customers.to_numpy(),
                 'backgroundColor': 'rgba(239, 68, 68, 0.8)'
             }
         ]
     }
     
     # Outcome status distribution - handle empty/null values
-    outcome_status = disputed_invoices['Outcome Status'].fillna('Pending').value_counts().to_dict()
-    outcome_labels = list(outcome_status.keys())
-    outcome_data = list(outcome_status.values())
+    outcome_status = disputes.by('outcome', measure='count', sort=False).sort_values(ascending=False, kind='stable')
+    outcome_labels = outcome_status.index.tolist()
+    outcome_data = outcome_status.to_numpy()
     
     outcome_distribution = {
         'labels': outcome_labels,
@@ -573,10 +949,7 @@ def format_biller_dashboard_data(df, biller_name=None):
     }
     
     # Worklist - actual assigned invoices with essential data for biller
-    worklist = disputed_invoices.sort_values('Days overdue', ascending=False)[
-        ['Customer Name', 'Invoice number', 'Invoice Amount', 'Invoice due date', 
-         'Days overdue', 'Invoice Status', 'Dispute code L1', 'Root cause dropdown', 'Outcome Status']
-    ].head(10).to_dict(orient='records')
+    worklist = records_json(worklist_rows[BILLER_WORKLIST_COLUMNS])
     
     # Format data for the biller dashboard
     formatted_data = {
@@ -0,0 +1,223 @@
+"""Benchmark the ledger load, aggregates, dashboard formatters and serialization.
+
+Usage:
+    python ar_bench.py [--sizes 1k,100k,1M,10M] [--repeat N] [--save results.json]
+                       [--baseline old.json] [--threshold 0.2] [--memory-threshold 0.2]
+
+Each size gets a seeded synthetic ledger from generate_ar_data.py, cached as
+an Arrow file under AR_BENCH_DIR (default .bench/) so later runs skip
+generation. Every case is timed over up to ``--repeat`` runs (min and
+median reported) and run once more under tracemalloc for its peak Python and
+NumPy allocation. With ``--baseline`` the run exits non-zero when a case's
+median time or peak memory grows by more than the threshold.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+# Ledgers and results live here; override with AR_BENCH_DIR
+BENCH_DIR = os.environ.get('AR_BENCH_DIR', '.bench')
+BENCH_SEED = 7
+# Fixed so that 'Days overdue' and the buckets do not drift from day to day
+BENCH_AS_OF = date(2025, 6, 30)
+GENERATE_CHUNK_ROWS = 500_000
+
+DEFAULT_SIZES = '1k,100k'
+# Runs of a case stop early once this many seconds have been spent on it
+TIME_BUDGET = 5.0
+# Cases faster than these are too noisy to flag
+MIN_SECONDS = 0.001
+MIN_BYTES = 1024 * 1024
+
+
+def parse_size(text):
+    """Row count from text such as '100k' or '1M'"""
+    text = text.strip()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1:].lower(), 1)
+    return int(float(text[:-1] if multiplier > 1 else text) * multiplier)
+
+
+def ledger_path(rows):
+    """Arrow file holding the seeded benchmark ledger of ``rows`` invoices, generated on first use"""
+    from generate_ar_data import generate
+    from ar_ingest import ledger_schema, pa
+
+    path = os.path.join(BENCH_DIR, f"ledger-{rows}-{BENCH_SEED}.arrow")
+    # Regenerate when the ledger schema has changed since the file was written
+    if not os.path.exists(path) or not pa.ipc.open_file(pa.memory_map(path, 'r')).schema.equals(ledger_schema()):
+        os.makedirs(BENCH_DIR, exist_ok=True)
+        generate(path, rows, seed=BENCH_SEED, chunk_rows=GENERATE_CHUNK_ROWS, workers=os.cpu_count() or 1,
+                 as_of=BENCH_AS_OF)
+    return path
+
+
+class BenchContext:
+    """Inputs shared by the cases of one ledger size"""
+
+    def __init__(self, path):
+        from ar_backend import (format_admin_dashboard_data, format_biller_dashboard_data,
+                                format_collector_dashboard_data, format_manager_dashboard_data, load_ar_frame)
+        from ar_cube import build_ledger_aggregates
+        from ar_history import HistoryStore
+
+        self.path = path
+        self.df = load_ar_frame(path)
+        self.aggregates = build_ledger_aggregates(self.df)
+        # An empty history: the manager's deltas are computed but trivially zero
+        self.history = HistoryStore(os.path.join(BENCH_DIR, 'history'))
+        self.collector = self.df['Collector Name'].iloc[0]
+        self.biller = self.df['Biller Name'].iloc[0]
+        # Built once so that 'serialize' times only the JSON encoding
+        self.payloads = [
+            format_admin_dashboard_data(self.df, self.aggregates),
+            format_manager_dashboard_data(self.df, self.aggregates, self.history),
+            format_collector_dashboard_data(self.df, self.collector, self.aggregates),
+            format_biller_dashboard_data(self.df, self.biller, self.aggregates),
+        ]
+
+
+def _functions_module():
+    """functions/main.py, or None when its Firebase dependencies are not installed"""
+    functions_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions')
+    sys.path.insert(0, functions_dir)
+    try:
+        import main
+        return main
+    except ImportError as e:
+        print(f"Skipping functions/main.py cases: {e}")
+        return None
+    finally:
+        sys.path.remove(functions_dir)
+
+
+def build_cases():
+    """Case name -> callable taking a BenchContext"""
+    from ar_backend import (format_admin_dashboard_data, format_biller_dashboard_data,
+                            format_collector_dashboard_data, format_manager_dashboard_data, load_ar_frame)
+    from ar_cube import build_ledger_aggregates
+    from ar_json import dumps
+
+    cases = {
+        'load': lambda ctx: load_ar_frame(ctx.path),
+        'aggregates': lambda ctx: build_ledger_aggregates(ctx.df),
+        'admin': lambda ctx: format_admin_dashboard_data(ctx.df, ctx.aggregates),
+        'manager': lambda ctx: format_manager_dashboard_data(ctx.df, ctx.aggregates, ctx.history),
+        'collector': lambda ctx: format_collector_dashboard_data(ctx.df, ctx.collector, ctx.aggregates),
+        'biller': lambda ctx: format_biller_dashboard_data(ctx.df, ctx.biller, ctx.aggregates),
+        'serialize': lambda ctx: [dumps(payload) for payload in ctx.payloads],
+    }
+
+    functions = _functions_module()
+    if functions is not None:
+        # Only the admin dashboard is implemented there (the other roles return placeholders). It reads
+        # 'Due Date' and 'Balance', which the ledger calls 'Due month' and 'Invoice Amount', and adds columns
+        # in place, so it gets its own copy of the frame rather than the shared one.
+        cases['functions.admin'] = lambda ctx: functions.format_admin_dashboard_data(
+            ctx.df.assign(**{'Due Date': ctx.df['Due month'], 'Balance': ctx.df['Invoice Amount']}))
+    return cases
+
+
+def measure(func, ctx, repeat):
+    """Timings in seconds (up to ``repeat`` runs within TIME_BUDGET) and peak traced bytes of one more run"""
+    times = []
+    while len(times) < repeat and sum(times) < TIME_BUDGET:
+        gc.collect()
+        start = time.perf_counter()
+        func(ctx)
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(ctx)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return times, peak
+
+
+def run(sizes, repeat, cases=None):
+    """Benchmark every case on every ledger size; returns the results document"""
+    all_cases = build_cases()
+    selected = {name: all_cases[name] for name in (cases or all_cases)}
+    results = []
+    for rows in sizes:
+        ctx = BenchContext(ledger_path(rows))
+        for name, func in selected.items():
+            times, peak = measure(func, ctx, repeat)
+            result = {
+                'case': name, 'rows': rows, 'runs': len(times),
+                'min_s': min(times), 'median_s': statistics.median(times), 'peak_bytes': peak,
+            }
+            results.append(result)
+            print(f"{rows:>10,} {name:<20} median {result['median_s'] * 1000:10.2f} ms"
+                  f"   min {result['min_s'] * 1000:10.2f} ms   peak {peak / 1e6:9.1f} MB")
+        del ctx
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'seed': BENCH_SEED,
+        'results': results,
+    }
+
+
+def regressions(current, baseline, threshold, memory_threshold):
+    """Messages for cases whose median time or peak memory grew beyond the thresholds"""
+    previous = {(r['case'], r['rows']): r for r in baseline['results']}
+    messages = []
+    for result in current['results']:
+        before = previous.get((result['case'], result['rows']))
+        if before is None:
+            continue
+        label = f"{result['case']} @ {result['rows']:,} rows"
+        if (result['median_s'] > MIN_SECONDS
+                and result['median_s'] > before['median_s'] * (1 + threshold)):
+            messages.append(f"{label}: median {before['median_s'] * 1000:.2f} ms -> {result['median_s'] * 1000:.2f} ms")
+        if (result['peak_bytes'] > MIN_BYTES
+                and result['peak_bytes'] > before['peak_bytes'] * (1 + memory_threshold)):
+            messages.append(f"{label}: peak {before['peak_bytes'] / 1e6:.1f} MB -> {result['peak_bytes'] / 1e6:.1f} MB")
+    return messages
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='comma-separated row counts, e.g. 1k,100k,1M,10M')
+    parser.add_argument('--cases', default=None, help='comma-separated case names (default: all)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', default=None, help='write the results as JSON to this path')
+    parser.add_argument('--baseline', default=None, help='results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed fractional slowdown')
+    parser.add_argument('--memory-threshold', type=float, default=0.2, help='allowed fractional memory growth')
+    args = parser.parse_args()
+
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    cases = [case.strip() for case in args.cases.split(',')] if args.cases else None
+    document = run(sizes, args.repeat, cases)
+
+    if args.save:
+        with open(args.save, 'w') as fh:
+            json.dump(document, fh, indent=2)
+        print(f"Saved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            failures = regressions(document, json.load(fh), args.threshold, args.memory_threshold)
+        for message in failures:
+            print(f"REGRESSION {message}")
+        if failures:
+            sys.exit(1)
+        print("No regressions against the baseline")
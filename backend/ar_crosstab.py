@@ -0,0 +1,50 @@
+"""Overdue / before-due cross-tabs of 'Invoice Amount' over any ledger dimension."""
+import os
+
+import numpy as np
+import pandas as pd
+
+from ar_aging import OVERDUE_SPLIT
+
+# Dimension name -> ledger column available for cross-tabs
+CROSSTAB_DIMENSIONS = {
+    'customer_type': 'Customer type',
+    'terms': 'Customer terms',
+    'director': 'Client Director',
+    'collector': 'Collector Name',
+    'biller': 'Biller Name',
+    'customer': 'Customer Name',
+    'status': 'Invoice Status',
+}
+
+# Dimensions behind the manager's 'overdueByCountry' and 'overdueByCustomerGroup' charts
+MANAGER_COUNTRY_DIMENSION = os.environ.get('AR_MANAGER_COUNTRY_DIMENSION', 'customer_type')
+MANAGER_GROUP_DIMENSION = os.environ.get('AR_MANAGER_GROUP_DIMENSION', 'terms')
+
+
+def crosstab(df, dimension, scheme=OVERDUE_SPLIT, value_column='Invoice Amount', positions=None):
+    """Sum of ``value_column`` per (dimension value, aging bucket) in one pass.
+
+    Returns a frame indexed by the dimension's values in order of first
+    appearance, with one column per bucket label of ``scheme``. Cost is one
+    factorize and one bincount over the ledger, independent of cardinality.
+    With ``positions`` (each row's ledger position), a ``first`` column holds
+    the ledger position of each value's first row, for merging partial tables.
+    """
+    try:
+        column = CROSSTAB_DIMENSIONS[dimension]
+    except KeyError:
+        raise ValueError(f"Unknown cross-tab dimension '{dimension}'. Choose from: {', '.join(CROSSTAB_DIMENSIONS)}")
+
+    codes, uniques = pd.factorize(df[column])
+    bucket_ids = scheme.assign(df['Days overdue'])
+    valid = (codes >= 0) & (bucket_ids >= 0)
+    cells = codes[valid] * len(scheme) + bucket_ids[valid]
+    weights = np.nan_to_num(df[value_column].to_numpy(dtype='float64')[valid])
+    sums = np.bincount(cells, weights=weights, minlength=len(uniques) * len(scheme))
+    table = pd.DataFrame(sums.reshape(len(uniques), len(scheme)), index=pd.Index(uniques, name=dimension),
+                         columns=scheme.labels)
+    if positions is not None:
+        # Codes number the values in order of first appearance, so a value first appears where the running maximum grows
+        table['first'] = positions[np.flatnonzero(np.diff(np.maximum.accumulate(codes), prepend=-1) > 0)]
+    return table
@@ -0,0 +1,322 @@
+"""Aggregate cube of the AR ledger, built once per dataset snapshot.
+
+The dashboards are mostly sums and counts of 'Invoice Amount' over a few
+low-cardinality dimensions, so one groupby over the ledger produces every
+cell they need and each payload becomes a slice of that (small) table.
+"""
+import numpy as np
+import pandas as pd
+
+from ar_aging import AgingScheme
+from ar_crosstab import MANAGER_COUNTRY_DIMENSION, MANAGER_GROUP_DIMENSION, crosstab
+from ar_partition import build_partition_indexes
+from ar_schema import add_categories
+from ar_timeseries import invoice_period
+
+# Cube dimension name -> ledger column
+CUBE_DIMENSIONS = {
+    'collector': 'Collector Name',
+    'biller': 'Biller Name',
+    'customer_type': 'Customer type',
+    'terms': 'Customer terms',
+    'status': 'Invoice Status',
+}
+
+# Dimensions of the disputes cube, built over disputed invoices only
+DISPUTE_DIMENSIONS = {
+    'biller': ('Biller Name', None),
+    'root_cause': ('Root cause dropdown', 'Unspecified'),
+    'dispute_code': ('Dispute code L1', 'Unspecified'),
+    'outcome': ('Outcome Status', 'Pending'),
+}
+
+# Finest aging split any dashboard needs; coarser schemes are rolled up from it.
+# Days overdue are whole days, so a bound of -1 separates negative days from 0.
+CUBE_AGING = AgingScheme([-1, 0, 30, 60, 90, 120], ['<0', '0', '1-30', '31-60', '61-90', '91-120', '120+'])
+
+
+def coarse_bucket_ids(fine_ids, scheme):
+    """Map CUBE_AGING bucket ids to the bucket ids of a coarser ``scheme``"""
+    representatives = np.append(CUBE_AGING.upper_bounds, CUBE_AGING.upper_bounds[-1] + 1)
+    mapping = scheme.assign(representatives)
+    return np.where(fine_ids >= 0, mapping[fine_ids], -1)
+
+class ARCube:
+    """Sums and counts of 'Invoice Amount' keyed by a set of dimensions.
+
+    ``cells`` has one row per observed combination of the dimensions, in order
+    of first appearance in the ledger, with the measures ``amount``,
+    ``count``, ``days`` (sum of 'Days overdue') and ``days_count``. Cubes built
+    from a ledger also hold ``first``, the ledger position of each cell's
+    first row, which keeps that order as ``add`` moves rows between cells.
+    """
+
+    def __init__(self, cells):
+        self._cells = cells
+        # Cells first seen by ``add``, appended in one batch by ``flush``
+        self._pending = {}
+        # Set by ``add`` when a cell empties or its first row moves; ``flush`` tidies the cells
+        self._stale = False
+
+    @property
+    def cells(self):
+        return self._cells
+
+    def flush(self):
+        """Apply the cells added and tidy those emptied by ``add``; called under the lock its caller holds for ``add``"""
+        cells = self._cells
+        if self._pending:
+            keys = list(self._pending)
+            rows = pd.DataFrame(list(self._pending.values()), columns=cells.columns,
+                                index=pd.MultiIndex.from_tuples(keys, names=cells.index.names))
+            cells = pd.concat([cells, rows.astype(cells.dtypes.to_dict())])
+        if self._stale:
+            # A rebuild has no cell without rows, and orders the cells by their first row
+            cells = cells[cells['count'] != 0]
+            cells = cells.sort_values('first', kind='stable') if 'first' in cells.columns else cells
+        # Readers take ``cells`` without a lock, so the tidied frame is published in one assignment
+        self._cells, self._pending, self._stale = cells, {}, False
+
+    def first_row(self, key):
+        """Ledger position of the first row of the cell ``key``, or None if the cell has no rows"""
+        cell = self._pending.get(key)
+        if cell is None:
+            try:
+                position = self._cells.index.get_loc(key)
+            except KeyError:
+                return None
+            cell = self._cells.iloc[position]
+        return int(cell['first']) if cell['count'] else None
+
+    def add(self, key, deltas, first=None):
+        """Add measure deltas to the cell with index ``key`` in place.
+
+        ``first`` is the cell's first ledger row after the change, when known.
+        New cells, and the removal of a cell whose count drops to 0, wait for
+        ``flush``.
+        """
+        try:
+            position = self._cells.index.get_loc(key)
+        except KeyError:
+            pending = self._pending.setdefault(key, dict.fromkeys(self._cells.columns, 0))
+            for measure, delta in deltas.items():
+                pending[measure] += delta
+            if first is not None and 'first' in pending:
+                pending['first'] = first
+            if not pending['count']:
+                del self._pending[key]
+            # New cells go in at their first row, not at the end
+            self._stale = True
+            return
+        for measure, delta in deltas.items():
+            self._cells.iat[position, self._cells.columns.get_loc(measure)] += delta
+        if first is not None and 'first' in self._cells.columns:
+            column = self._cells.columns.get_loc('first')
+            self._stale |= self._cells.iat[position, column] != first
+            self._cells.iat[position, column] = first
+        self._stale |= not self._cells.iat[position, self._cells.columns.get_loc('count')]
+
+    def __len__(self):
+        return len(self.cells)
+
+    def slice(self, **filters):
+        """Sub-cube where each given dimension equals the given value"""
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dim, value in filters.items():
+            mask &= self.cells.index.get_level_values(dim) == value
+        return ARCube(self.cells[mask])
+
+    def per(self, dim):
+        """Sub-cube per value of one dimension, split with a single groupby (missing values dropped)"""
+        return {value: ARCube(cells) for value, cells in self.cells.groupby(level=dim, observed=True, sort=False)}
+
+    def total(self, measure='amount'):
+        return self.cells[measure].sum()
+
+    def by(self, dim, measure='amount', sort=True):
+        """Measure summed per value of one dimension (missing values dropped)"""
+        return self.cells[measure].groupby(level=dim, observed=True, sort=sort).sum()
+
+    def _coarse_bucket_ids(self, scheme):
+        return coarse_bucket_ids(self.cells.index.get_level_values('bucket').to_numpy(), scheme)
+
+    def bucket_totals(self, scheme):
+        """Invoice counts and amount sums per bucket of ``scheme``, in label order"""
+        coarse_ids = self._coarse_bucket_ids(scheme)
+        valid = coarse_ids >= 0
+        counts = np.bincount(coarse_ids[valid], weights=self.cells['count'].to_numpy()[valid], minlength=len(scheme))
+        amounts = np.bincount(coarse_ids[valid], weights=self.cells['amount'].to_numpy()[valid], minlength=len(scheme))
+        return counts.astype('int64'), amounts
+
+    def in_bucket(self, scheme, label):
+        """Mask of the cells falling in one bucket of ``scheme``"""
+        return self._coarse_bucket_ids(scheme) == scheme.labels.index(label)
+
+    def where_bucket(self, scheme, label):
+        """Sub-cube of the cells falling in one bucket of ``scheme``"""
+        return ARCube(self.cells[self.in_bucket(scheme, label)])
+
+    def days_mean(self):
+        days_count = self.cells['days_count'].sum()
+        return self.cells['days'].sum() / days_count if days_count else np.nan
+
+
+class LedgerAggregates:
+    """Everything the role dashboards aggregate, derived once from a snapshot's frame.
+
+    ``partitions`` and ``customer_codes`` hold row positions into that same
+    frame, so the aggregates must only be used together with the frame they
+    were built from.
+    """
+
+    def __init__(self, cube, disputes, customers, customer_codes, total_accounts, partitions, crosstabs):
+        self.cube = cube
+        self.disputes = disputes
+        self.customers = customers
+        # Row position of each invoice's customer in ``customers``
+        self.customer_codes = customer_codes
+        self.total_accounts = total_accounts
+        self.partitions = partitions
+        self.crosstabs = crosstabs
+
+
+def _group(df, keys, amount_column='Invoice Amount', positions=None):
+    measures = {
+        'amount': (amount_column, 'sum'),
+        'count': (amount_column, 'size'),
+        'days': ('Days overdue', 'sum'),
+        'days_count': ('Days overdue', 'count'),
+    }
+    grouped = df.groupby(keys, dropna=False, observed=True, sort=False)
+    cells = grouped.agg(**measures)
+    if positions is not None:
+        # Ledger position of each cell's first row, for keeping cells in ledger order as they are merged or updated.
+        # Groups are numbered in order of first appearance, so a group's first row is where the running maximum grows.
+        codes = grouped.ngroup().to_numpy()
+        cells['first'] = positions[np.flatnonzero(np.diff(np.maximum.accumulate(codes), prepend=-1) > 0)]
+    return cells
+
+
+def ar_cube_cells(df, positions=None):
+    """Cells of the main cube; with ``positions`` (each row's ledger position) also a ``first`` column"""
+    keys = [df[column].rename(dim) for dim, column in CUBE_DIMENSIONS.items()]
+    keys.append(pd.Series(CUBE_AGING.assign(df['Days overdue']), index=df.index, name='bucket'))
+    keys.append(invoice_period(df).rename('month'))
+    return _group(df, keys, positions=positions)
+
+
+def combine_cells(parts):
+    """Sum partial cells keyed by the same levels, keeping the smallest ``first`` ledger row of each"""
+    cells = pd.concat(parts)
+    measures = {column: 'min' if column == 'first' else 'sum' for column in cells.columns}
+    return cells.groupby(level=list(range(cells.index.nlevels)), dropna=False, observed=True,
+                         sort=False).agg(measures)
+
+
+def merge_cells(parts, keep_first=False):
+    """Sum partial cells keyed by the same levels, ordered by their first ledger row as one groupby orders them"""
+    cells = combine_cells(parts).sort_values('first', kind='stable')
+    return cells if keep_first else cells.drop(columns='first')
+
+
+def build_ar_cube(df):
+    """Build the main cube with a single groupby over the ledger"""
+    return ARCube(ar_cube_cells(df, np.arange(len(df))))
+
+
+def _fill(values, fill):
+    """``values`` with missing entries replaced by ``fill``, which becomes a category if needed"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = add_categories(values, [fill])
+    return values.fillna(fill)
+
+
+def dispute_cube_cells(df, positions=None):
+    """Cells of the disputes cube, as ``ar_cube_cells``"""
+    mask = df['Invoice Status'] == 'Disputed'
+    disputed = df[mask]
+    keys = [_fill(disputed[column], fill) if fill else disputed[column]
+            for column, fill in DISPUTE_DIMENSIONS.values()]
+    keys = [key.rename(dim) for key, dim in zip(keys, DISPUTE_DIMENSIONS)]
+    keys.append(pd.Series(CUBE_AGING.assign(disputed['Days overdue']), index=disputed.index, name='bucket'))
+    if positions is not None:
+        positions = positions[mask.to_numpy(dtype=bool, na_value=False)]
+    return _group(disputed, keys, positions=positions)
+
+
+def build_dispute_cube(df):
+    """Build the disputes cube (root cause, dispute code, outcome) over disputed invoices"""
+    return ARCube(dispute_cube_cells(df, np.arange(len(df))))
+
+
+def build_customer_totals(df):
+    """Total and overdue 'Invoice Amount' per customer, plus each row's position in that table (-1 if none)"""
+    codes, names = pd.factorize(df['Customer Name'], sort=True)
+    amounts = np.nan_to_num(df['Invoice Amount'].to_numpy(dtype='float64'))
+    overdue = (df['Days overdue'] > 0).to_numpy(dtype=bool, na_value=False)
+    present = codes >= 0
+    codes_present = codes[present]
+    customers = pd.DataFrame({
+        'amount': np.bincount(codes_present, weights=amounts[present], minlength=len(names)),
+        'overdue_amount': np.bincount(codes_present, weights=np.where(overdue, amounts, 0)[present],
+                                      minlength=len(names)),
+        'overdue_count': np.bincount(codes_present, weights=overdue[present], minlength=len(names)).astype('int64'),
+    }, index=pd.Index(names, name='Customer Name'))
+    return customers, codes
+
+
+def top_customer_sums(aggregates, rows, amounts, k=5):
+    """The ``k`` largest per-customer sums of ``amounts`` over ledger ``rows``.
+
+    Same result as ``df.iloc[rows].groupby('Customer Name')[...].sum().nlargest(k)``,
+    but the customers come from the snapshot's codes instead of hashing their names.
+    """
+    codes = aggregates.customer_codes[rows]
+    present = codes >= 0
+    codes = codes[present]
+    values = np.nan_to_num(amounts[rows][present])
+    size = len(aggregates.customers)
+    groups = np.flatnonzero(np.bincount(codes, minlength=size))
+    sums = np.bincount(codes, weights=values, minlength=size)[groups]
+    if len(sums) > k:
+        # Only sums tied with or above the k-th largest can make it; nlargest breaks ties by position
+        candidates = np.flatnonzero(sums >= np.partition(sums, len(sums) - k)[len(sums) - k])
+        top = candidates[np.argsort(-sums[candidates], kind='stable')[:k]]
+    else:
+        top = np.argsort(-sums, kind='stable')
+    # Names are looked up for the winners only
+    return pd.Series(sums[top], index=aggregates.customers.index[groups[top]])
+
+
+def top_customer_sums_by(aggregates, group_codes, rows, amounts, k=5):
+    """``top_customer_sums`` for every group at once: group code -> its ``k`` largest per-customer sums.
+
+    ``group_codes`` gives each ledger row's group (-1 for none). ``rows`` are
+    split by group with one linear-time stable sort, instead of a mask per group.
+    """
+    rows = rows[group_codes[rows] >= 0]
+    groups = group_codes[rows]
+    order = np.argsort(groups, kind='stable')
+    bounds = np.flatnonzero(np.diff(groups[order])) + 1
+    return {int(groups[members[0]]): top_customer_sums(aggregates, rows[members], amounts, k)
+            for members in (np.split(order, bounds) if len(order) else [])}
+
+
+def build_ledger_aggregates(df):
+    """Build all snapshot-level aggregates used by the dashboard formatters"""
+    from ar_parallel import build_ledger_aggregates_parallel, use_parallel
+
+    # Large ledgers are sharded over a process pool when AR_AGGREGATE_WORKERS is above 1
+    if use_parallel(df):
+        return build_ledger_aggregates_parallel(df)
+    customers, customer_codes = build_customer_totals(df)
+    return LedgerAggregates(
+        cube=build_ar_cube(df),
+        disputes=build_dispute_cube(df),
+        customers=customers,
+        customer_codes=customer_codes,
+        total_accounts=df['Customer ID'].nunique(),
+        partitions=build_partition_indexes(df),
+        crosstabs={dimension: crosstab(df, dimension)
+                   for dimension in (MANAGER_COUNTRY_DIMENSION, MANAGER_GROUP_DIMENSION)},
+    )
@@ -0,0 +1,191 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+
+# How often (in seconds) the cache stats the workbook to look for changes.
+# Override with AR_DATA_STAT_INTERVAL; 0 checks on every request.
+DEFAULT_STAT_INTERVAL = float(os.environ.get('AR_DATA_STAT_INTERVAL', '5'))
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Return the SHA-1 hex digest of a file's contents"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DatasetSnapshot:
+    """One loaded version of the AR ledger shared by all requests.
+
+    Formatters treat it as read-only; only ar_updates changes it, bumping
+    ``revision`` so that ``version`` (and every cache keyed by it) moves on.
+    New rows are buffered by ``append`` and merged into ``df`` in one copy
+    the next time the frame is read, so a run of inserts costs one copy of
+    the ledger rather than one each. ``df`` is None for a CSV or Parquet
+    ledger, which is only aggregated in chunks (see ar_stream).
+    """
+
+    def __init__(self, df, version, source_path, loaded_at=None):
+        self._df = df
+        self.base_version = version
+        self.revision = 0
+        self.source_path = source_path
+        self.loaded_at = loaded_at or datetime.now()
+        self._derived = {}
+        # Reentrant: reading ``df`` inside ``derived`` may merge appended rows, which drops derived structures
+        self._derived_lock = threading.RLock()
+        # Rows appended since the frame was last read, by key, and the function that merges them into it
+        self._appended = {}
+        self._merge = None
+
+    @property
+    def df(self):
+        if self._appended:
+            with self._derived_lock:
+                if self._appended:
+                    rows, self._appended = list(self._appended.values()), {}
+                    self._df = self._merge(self._df, rows)
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        self._df = df
+
+    def append(self, key, row, merge):
+        """Buffer a new row under ``key``; ``merge(df, rows)`` returns the frame with the buffered rows added"""
+        # Under the lock that ``df`` swaps the buffer under, so no row is lost to a concurrent merge
+        with self._derived_lock:
+            self._appended[key] = row
+            self._merge = merge
+
+    @property
+    def lock(self):
+        """Lock that buffered rows are merged under; ar_updates holds it while changing what a merge rewrites"""
+        return self._derived_lock
+
+    def is_appended(self, key):
+        """True if a row buffered under ``key`` has not been merged into the frame yet"""
+        return key in self._appended
+
+    @property
+    def size(self):
+        """Number of ledger rows, counting appended rows not merged yet"""
+        return len(self._df) + len(self._appended)
+
+    def derived(self, key, build):
+        """Return ``build(df)`` computed at most once for this snapshot"""
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = build(self.df)
+            return self._derived[key]
+
+    def invalidate(self, *keys):
+        """Drop derived structures so they are rebuilt from the current frame"""
+        with self._derived_lock:
+            for key in keys:
+                self._derived.pop(key, None)
+
+    @property
+    def version(self):
+        """Workbook content version, suffixed with the number of changes applied since loading"""
+        return f"{self.base_version}.{self.revision}" if self.revision else self.base_version
+
+    def __repr__(self):
+        rows = None if self._df is None else self.size
+        return f"DatasetSnapshot(version={self.version!r}, rows={rows})"
+
+
+class DatasetCache:
+    """Keeps the current ledger snapshot in memory and reloads it when the file changes.
+
+    The first call to ``get()`` loads synchronously. After that readers always
+    get the snapshot that is currently published; at most once per
+    ``stat_interval`` seconds a background thread stats the file and, if its
+    mtime or size moved and its content hash differs, loads a new snapshot and
+    swaps it in with a single reference assignment. ``prepare(snapshot)``, if
+    given, runs before a snapshot is published so that structures derived from
+    it are built off the request path.
+    """
+
+    def __init__(self, path, loader, stat_interval=None, prepare=None):
+        self.path = path
+        self.loader = loader
+        self.prepare = prepare
+        self.stat_interval = DEFAULT_STAT_INTERVAL if stat_interval is None else stat_interval
+        self._snapshot = None
+        self._stat_key = None
+        self._last_check = 0.0
+        self._load_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self.reload_count = 0
+        self.reload_errors = 0
+        self.last_error = None
+
+    @property
+    def snapshot(self):
+        """The published snapshot without checking for changes, or None before the first load"""
+        return self._snapshot
+
+    def get(self):
+        """Return the current snapshot, scheduling a background freshness check if due"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._load_lock:
+                if self._snapshot is None:
+                    self._reload(force=True)
+            return self._snapshot
+
+        now = time.monotonic()
+        if now - self._last_check >= self.stat_interval:
+            self._last_check = now
+            if self._reload_lock.acquire(blocking=False):
+                thread = threading.Thread(target=self._background_check, daemon=True)
+                thread.start()
+        return snapshot
+
+    def reload(self):
+        """Synchronously reload the file if it changed; returns the current snapshot"""
+        with self._reload_lock:
+            self._reload(force=False)
+        return self._snapshot
+
+    def _background_check(self):
+        try:
+            self._reload(force=False)
+        except Exception as e:
+            # Keep serving the previous snapshot; surface the error for diagnostics
+            self.last_error = e
+            self.reload_errors += 1
+            print(f"Error reloading {self.path}: {e}")
+        finally:
+            self._reload_lock.release()
+
+    def _reload(self, force):
+        stat = os.stat(self.path)
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        if not force and stat_key == self._stat_key:
+            return
+
+        version = file_digest(self.path)[:12]
+        current = self._snapshot
+        if current is not None and current.base_version == version:
+            # Touched but unchanged content: nothing to reload
+            self._stat_key = stat_key
+            return
+
+        df = self.loader(self.path)
+        snapshot = DatasetSnapshot(df, version, self.path)
+        if self.prepare is not None:
+            self.prepare(snapshot)
+        self._snapshot = snapshot
+        self._stat_key = stat_key
+        self.reload_count += 1
+        self.last_error = None
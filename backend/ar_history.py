@@ -0,0 +1,154 @@
+"""Append-only daily history of AR aggregates for period-over-period deltas.
+
+Each day gets one small Arrow IPC file, ``<history dir>/<YYYY-MM-DD>.arrow``,
+holding 'Invoice Amount' sums and counts per aging bucket for every value of
+a few dimensions. Past days are never rewritten; recording again on the same
+day replaces only that day's file. Trends and deltas are read from this
+pre-aggregated history, never from old ledgers.
+
+Usage: python ar_history.py [workbook]   (records today's row set)
+"""
+import os
+import threading
+from datetime import date
+
+import pandas as pd
+
+from ar_aging import OVERDUE_SPLIT
+from ar_cube import coarse_bucket_ids
+from ar_ingest import pa, write_columnar
+
+# Where daily files are written; override with AR_HISTORY_DIR
+DEFAULT_HISTORY_DIR = os.environ.get('AR_HISTORY_DIR', 'ar_history')
+
+# Cube dimensions recorded per day; 'bucket' holds the ledger-wide bucket totals (value 'all')
+HISTORY_DIMENSIONS = ('collector', 'biller', 'customer_type', 'bucket')
+
+HISTORY_COLUMNS = ['date', 'dimension', 'value', 'bucket', 'amount', 'count']
+
+
+def history_rows(cube, day):
+    """One row per (dimension, value, CUBE_AGING bucket) of the cube for ``day``"""
+    cells = cube.cells[['amount', 'count']]
+    frames = []
+    for dimension in HISTORY_DIMENSIONS:
+        levels = ['bucket'] if dimension == 'bucket' else [dimension, 'bucket']
+        grouped = cells.groupby(level=levels, observed=True, sort=True).sum().reset_index()
+        if dimension == 'bucket':
+            grouped['value'] = 'all'
+        else:
+            grouped = grouped.rename(columns={dimension: 'value'})
+        grouped['dimension'] = dimension
+        frames.append(grouped)
+    rows = pd.concat(frames, ignore_index=True)
+    rows['date'] = pd.Timestamp(day)
+    rows['value'] = rows['value'].astype(str)
+    rows['bucket'] = rows['bucket'].astype('int8')
+    rows['count'] = rows['count'].astype('int64')
+    return rows[HISTORY_COLUMNS]
+
+
+class HistoryStore:
+    """Daily aggregate files in one directory, read back as a single small frame"""
+
+    def __init__(self, directory=None):
+        self.directory = directory or DEFAULT_HISTORY_DIR
+        self._frame = None
+        self._frame_version = None
+        self._lock = threading.Lock()
+
+    def path(self, day):
+        return os.path.join(self.directory, f"{day.isoformat()}.arrow")
+
+    def record(self, cube, day=None):
+        """Write the aggregates of ``cube`` as the history of ``day`` (default today)"""
+        if pa is None:
+            return None
+        day = day or date.today()
+        os.makedirs(self.directory, exist_ok=True)
+        table = pa.Table.from_pandas(history_rows(cube, day), preserve_index=False)
+        path = self.path(day)
+        write_columnar(table, path)
+        return path
+
+    def files(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name for name in names if name.endswith('.arrow'))
+
+    def version(self):
+        """Token that changes whenever a day is added or re-recorded"""
+        files = self.files()
+        if not files:
+            return ''
+        latest = os.stat(os.path.join(self.directory, files[-1])).st_mtime_ns
+        return f"{len(files)}-{files[-1][:-len('.arrow')]}-{latest}"
+
+    def load(self):
+        """All recorded days as one frame, re-read only when the history changes"""
+        version = self.version()
+        with self._lock:
+            if self._frame is None or version != self._frame_version:
+                frames = [pa.ipc.open_file(pa.memory_map(os.path.join(self.directory, name), 'r')).read_pandas()
+                          for name in self.files()] if pa is not None else []
+                self._frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=HISTORY_COLUMNS)
+                self._frame_version = version
+            return self._frame
+
+    def series(self, dimension='bucket', value=None, scheme=OVERDUE_SPLIT):
+        """Daily 'Invoice Amount' per bucket of ``scheme``, indexed by date"""
+        history = self.load()
+        mask = history['dimension'] == dimension
+        if value is not None:
+            mask &= history['value'] == value
+        rows = history[mask]
+        ids = coarse_bucket_ids(rows['bucket'].to_numpy(dtype='int64'), scheme)
+        valid = ids >= 0
+        amounts = rows['amount'][valid].groupby([pd.to_datetime(rows['date'][valid]), ids[valid]]).sum()
+        table = amounts.unstack(fill_value=0.0).reindex(columns=range(len(scheme)), fill_value=0.0)
+        table.columns = scheme.labels
+        return table.sort_index()
+
+
+def period_change(series, label, months=1):
+    """Change of one bucket between the latest day and the last day at least ``months`` earlier.
+
+    Returns ``(change, fractional change)``; both are 0 without an earlier day.
+    """
+    if series.empty:
+        return 0.0, 0.0
+    current_day = series.index[-1]
+    earlier = series.loc[:current_day - pd.DateOffset(months=months), label]
+    if earlier.empty:
+        return 0.0, 0.0
+    current, previous = series[label].iloc[-1], earlier.iloc[-1]
+    change = float(current - previous)
+    return change, round(change / previous, 2) if previous else 0.0
+
+
+def month_over_month(series, label):
+    """Daily values of one bucket for the latest month and the month before, by day of month"""
+    if series.empty:
+        return [], [], []
+    values = series[label]
+    months = values.index.to_period('M')
+    current_month = months[-1]
+    days = range(1, current_month.days_in_month + 1)
+
+    def daily(month):
+        month_values = values[months == month]
+        month_values = month_values.groupby(month_values.index.day).last().reindex(days)
+        return [None if pd.isnull(v) else float(v) for v in month_values]
+
+    return [str(day) for day in days], daily(current_month), daily(current_month - 1)
+
+
+if __name__ == '__main__':
+    import sys
+    from ar_backend import load_ar_frame
+    from ar_cube import build_ar_cube
+
+    workbook = sys.argv[1] if len(sys.argv) > 1 else 'AR_Model_Dummy_Data.xlsx'
+    print(f"Recorded {HistoryStore().record(build_ar_cube(load_ar_frame(workbook)))}")
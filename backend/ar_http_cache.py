@@ -0,0 +1,126 @@
+"""ETags, a byte-bounded LRU cache of rendered API responses and single-flight rendering."""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# Total size of cached response bodies; override with AR_PAYLOAD_CACHE_BYTES
+DEFAULT_MAX_BYTES = int(os.environ.get('AR_PAYLOAD_CACHE_BYTES', str(64 * 1024 * 1024)))
+
+
+def make_etag(version, *parts):
+    """Opaque entity tag for a response derived from the dataset version and request parts"""
+    key = ':'.join([str(version)] + ['' if part is None else str(part) for part in parts])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+
+
+class PayloadCache:
+    """LRU cache of rendered response bodies, evicting least recently used entries by total size"""
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def peek(self, key):
+        """Cached body without counting a lookup or refreshing its position"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, body):
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous)
+            self._entries[key] = body
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'maxBytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hitRate': self.hits / lookups if lookups else 0,
+            }
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers with that key wait for it and share its result"""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, func):
+        """Return ``(func(), shared)``, where ``shared`` is True if another caller's result was reused"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = func()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    def stats(self):
+        with self._lock:
+            return {'calls': self.calls, 'shared': self.shared, 'inFlight': len(self._flights)}
@@ -0,0 +1,198 @@
+"""Convert the AR workbooks into typed Arrow IPC files the backend can memory-map.
+
+Usage: python ar_ingest.py [workbook.xlsx ...]
+Without arguments both bundled workbooks are converted.
+"""
+import os
+import sys
+
+import pandas as pd
+
+from ar_schema import CATEGORY_COLUMNS, DATE_FORMATS, DROPPED_COLUMNS, LEDGER_COLUMN_NAMES, LEDGER_SCHEMA
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pragma: no cover - XLSX remains the fallback
+    pa = None
+
+ARROW_SUFFIX = '.arrow'
+DEFAULT_WORKBOOKS = ['AR_Model_Dummy_Data.xlsx', 'AR Model .xlsx']
+
+# Arrow type for each schema kind; 'category' columns are dictionary encoded (see arrow_type)
+ARROW_TYPES = {'int8': 'int8', 'int16': 'int16', 'int32': 'int32', 'int64': 'int64', 'float': 'float64',
+               'string': 'string', 'date': 'date32'}
+
+# Header spellings used by the 'AR Model .xlsx' specification workbook
+COLUMN_ALIASES = {
+    'Weighted Overdue': 'Weighted Overdue Amount',
+    'Overdue Bucket': 'Weighted Overdue Bucket',
+    'Weighted Average Overdue days (Collecor )': 'Weighted Average Overdue days (Collector)',
+    'Weighted Average Overdue days (Biller )': 'Weighted Average Overdue days (Biller)',
+    'Dispute code dropdown': 'Dispute code L1',
+    'Outcome status': 'Outcome Status',
+    'Invoice day of month.1': 'Invoice day of month Dup',
+    'Due day': 'Due day of week',
+}
+
+# Column layout of the workbooks, which repeat 'Invoice day of month'
+_DAY_OF_MONTH = LEDGER_COLUMN_NAMES.index('Invoice day of month') + 1
+WORKBOOK_COLUMN_NAMES = LEDGER_COLUMN_NAMES[:_DAY_OF_MONTH] + list(DROPPED_COLUMNS) + LEDGER_COLUMN_NAMES[_DAY_OF_MONTH:]
+
+# Display text format of the yearless date columns
+DATE_TEXT_FORMATS = {
+    'Invoice date': '%d-%b',
+    'Invoice due date': '%d-%b',
+}
+
+
+def arrow_type(kind):
+    """Arrow type of a schema kind"""
+    if kind == 'category':
+        return pa.dictionary(pa.int32(), pa.string())
+    return getattr(pa, ARROW_TYPES[kind])()
+
+
+def ledger_schema():
+    """Explicit Arrow schema of the ledger"""
+    return pa.schema([pa.field(name, arrow_type(kind)) for name, kind in LEDGER_SCHEMA])
+
+
+def dictionary_array(values):
+    """Dictionary-encoded Arrow strings with a sorted dictionary.
+
+    Sorted dictionaries load as categoricals whose categories are already in
+    order, so reading them needs neither hashing nor recoding.
+    """
+    values = pa.array(values, type=pa.string(), from_pandas=True)
+    uniques = pc.unique(values).drop_null()
+    uniques = uniques.take(pc.sort_indices(uniques))
+    return pa.DictionaryArray.from_arrays(pc.index_in(values, value_set=uniques), uniques)
+
+
+def columnar_path(workbook_path):
+    """Path of the Arrow artifact built from a workbook"""
+    return os.path.splitext(workbook_path)[0] + ARROW_SUFFIX
+
+
+def read_workbook(path):
+    """Read a ledger workbook and normalise it to the generator's column names"""
+    df = pd.read_excel(path)
+    if 'Customer Name' not in df.columns:
+        # Specification layout: annotation rows above the real header
+        raw = pd.read_excel(path, header=None, nrows=10)
+        header_row = next(
+            i for i, row in raw.iterrows()
+            if 'Customer Name' in [str(v).strip() for v in row.values]
+        )
+        df = pd.read_excel(path, header=header_row)
+
+    df.columns = [str(name).strip() for name in df.columns]
+    df = df.rename(columns=COLUMN_ALIASES)
+    if len(df.columns) == len(WORKBOOK_COLUMN_NAMES):
+        # Unlabelled columns (e.g. dispute code L2/L3) take their name from position
+        df.columns = [
+            canonical if str(name).startswith('Unnamed:') else name
+            for name, canonical in zip(df.columns, WORKBOOK_COLUMN_NAMES)
+        ]
+    df = df.drop(columns=[name for name in DROPPED_COLUMNS if name in df.columns])
+
+    # Drop note rows that are not invoices
+    if 'Invoice number' in df.columns:
+        df = df[pd.to_numeric(df['Invoice number'], errors='coerce').notnull()]
+    return df.reset_index(drop=True)
+
+
+def to_arrow_table(df):
+    """Cast a workbook frame to the ledger schema"""
+    arrays = []
+    for name, kind in LEDGER_SCHEMA:
+        if name in df.columns:
+            values = df[name]
+        else:
+            values = pd.Series([None] * len(df), dtype=object)
+
+        if kind in ('string', 'category'):
+            if name in DATE_TEXT_FORMATS and pd.api.types.is_datetime64_any_dtype(values):
+                values = values.dt.strftime(DATE_TEXT_FORMATS[name])
+            values = values.astype(object).where(values.notnull(), None)
+            values = [None if v is None else str(v) for v in values]
+            if kind == 'category':
+                arrays.append(dictionary_array(values))
+                continue
+        elif kind == 'date':
+            if not pd.api.types.is_datetime64_any_dtype(values):
+                values = pd.to_datetime(values, format=DATE_FORMATS[name], errors='coerce')
+            arrays.append(pa.array(values, from_pandas=True).cast(pa.date32()))
+            continue
+        else:
+            values = pd.to_numeric(values, errors='coerce')
+        arrays.append(pa.array(values, type=arrow_type(kind), from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=ledger_schema())
+
+
+def write_columnar(table, path):
+    """Write an uncompressed Arrow IPC file, replacing any previous one atomically"""
+    tmp_path = path + '.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_columnar(path):
+    """Memory-map an Arrow IPC ledger file into a DataFrame with categorical category columns.
+
+    Dictionary columns convert directly; category columns stored as plain
+    strings (e.g. by other writers) are dictionary encoded by Arrow here.
+    """
+    source = pa.memory_map(path, 'r')
+    table = pa.ipc.open_file(source).read_all()
+    categories = [name for name in CATEGORY_COLUMNS if name in table.column_names]
+    return table.to_pandas(date_as_object=False, categories=categories)
+
+
+def ingest_workbook(workbook_path, output_path=None):
+    """Convert a workbook to its Arrow artifact and return the artifact path"""
+    output_path = output_path or columnar_path(workbook_path)
+    write_columnar(to_arrow_table(read_workbook(workbook_path)), output_path)
+    return output_path
+
+
+def is_fresh(artifact_path, workbook_path):
+    """True if the artifact exists, is at least as new as the workbook and has the current schema"""
+    try:
+        if os.stat(artifact_path).st_mtime_ns < os.stat(workbook_path).st_mtime_ns:
+            return False
+    except FileNotFoundError:
+        return False
+    return pa.ipc.open_file(pa.memory_map(artifact_path, 'r')).schema.equals(ledger_schema())
+
+
+def load_ledger(path):
+    """Load the ledger, preferring the memory-mapped Arrow artifact over parsing XLSX.
+
+    A stale or missing artifact is rebuilt from the workbook first. Without
+    pyarrow, or if the conversion fails, the workbook is read directly.
+    """
+    if path.endswith(ARROW_SUFFIX):
+        return read_columnar(path)
+    if pa is None:
+        return read_workbook(path)
+
+    artifact = columnar_path(path)
+    if not is_fresh(artifact, path):
+        try:
+            ingest_workbook(path, artifact)
+        except Exception as e:
+            print(f"Error converting {path} to Arrow: {e}. Reading the workbook directly.")
+            return read_workbook(path)
+    return read_columnar(artifact)
+
+
+if __name__ == '__main__':
+    if pa is None:
+        sys.exit("pyarrow is required to build columnar ledger files")
+    for workbook in sys.argv[1:] or DEFAULT_WORKBOOKS:
+        artifact = ingest_workbook(workbook)
+        print(f"Converted '{workbook}' to '{artifact}'")
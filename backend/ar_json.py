@@ -0,0 +1,125 @@
+"""JSON serialization for API payloads holding numpy arrays, NaN and dates.
+
+Two backends are available: 'orjson' (default when installed) and the
+standard library 'json'. Choose one with the AR_JSON_BACKEND env var.
+Both emit NaN as null, numpy scalars and arrays as plain JSON numbers and
+dates in ISO format.
+"""
+import json
+import math
+import os
+import uuid
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the stdlib backend is always available
+    orjson = None
+
+
+class RawJSON:
+    """Already-serialized JSON embedded verbatim in a payload"""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data.encode('utf-8') if isinstance(data, str) else data
+
+
+def records_json(df):
+    """Rows of a frame as a JSON array of objects, encoded column-wise by pandas (NaN -> null)"""
+    return RawJSON(df.to_json(orient='records', date_format='iso'))
+
+
+def _default(obj):
+    if isinstance(obj, (pd.Timestamp, datetime, date)):
+        return None if pd.isnull(obj) else obj.isoformat()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _sanitize(obj):
+    """Replace NaN/inf with None so the stdlib encoder produces valid JSON"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _sanitize(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_sanitize(value) for value in obj]
+    if isinstance(obj, np.ndarray):
+        return _sanitize(obj.tolist())
+    if isinstance(obj, np.floating):
+        return _sanitize(float(obj))
+    return obj
+
+
+def _with_raw_fragments(encode, obj):
+    """Run ``encode`` with RawJSON values spliced in after encoding"""
+    fragments = []
+    token = uuid.uuid4().hex
+
+    def default(value):
+        if isinstance(value, RawJSON):
+            fragments.append(value.data)
+            return f"@@raw:{token}:{len(fragments) - 1}@@"
+        return _default(value)
+
+    body = encode(obj, default)
+    for i, fragment in enumerate(fragments):
+        body = body.replace(f'"@@raw:{token}:{i}@@"'.encode('utf-8'), fragment, 1)
+    return body
+
+
+def _orjson_dumps(obj):
+    options = orjson.OPT_SERIALIZE_NUMPY
+    if hasattr(orjson, 'Fragment'):
+        def default(value):
+            if isinstance(value, RawJSON):
+                return orjson.Fragment(value.data)
+            return _default(value)
+        return orjson.dumps(obj, default=default, option=options)
+    return _with_raw_fragments(lambda o, default: orjson.dumps(o, default=default, option=options), obj)
+
+
+def _stdlib_dumps(obj):
+    def encode(o, default):
+        text = json.dumps(_sanitize(o), default=default, allow_nan=False, separators=(',', ':'))
+        return text.encode('utf-8')
+    return _with_raw_fragments(encode, obj)
+
+
+SERIALIZERS = {'json': _stdlib_dumps}
+if orjson is not None:
+    SERIALIZERS['orjson'] = _orjson_dumps
+
+
+def get_serializer(name=None):
+    """Serializer by name, or the AR_JSON_BACKEND choice (orjson when installed)"""
+    name = name or os.environ.get('AR_JSON_BACKEND') or ('orjson' if orjson is not None else 'json')
+    try:
+        return SERIALIZERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown JSON backend '{name}'. Available: {', '.join(SERIALIZERS)}")
+
+
+dumps = get_serializer()
+
+
+class ARJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes responses with the configured serializer"""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
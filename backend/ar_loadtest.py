@@ -0,0 +1,128 @@
+"""Load-test a running API server with concurrent bursts of requests.
+
+Usage:
+    python ar_loadtest.py [URL ...] [--concurrency 32] [--requests 20] [--revalidate]
+
+Each of ``--concurrency`` threads keeps one connection open and sends
+``--requests`` GETs, cycling through the URLs (default: the admin dashboard
+of a server on 127.0.0.1:5001). All threads start together, so the first wave
+is a burst of identical requests; against a freshly started server, or right
+after the workbook changes, that burst is a burst of cache misses. The
+report gives throughput, latency quantiles, status codes, and how the server
+produced the responses, taken from the ar_requests_total and render counters
+of its /api/metrics before and after the run. ``--revalidate`` sends each
+response's ETag back, as a polling dashboard does.
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from ar_metrics import Summary
+
+DEFAULT_URL = 'http://127.0.0.1:5001/api/ar-data?role=admin'
+
+# Server counters reported as deltas over the run
+REPORTED_COUNTERS = ('ar_requests_total', 'ar_payload_renders_total', 'ar_payload_coalesced_total')
+
+
+def _connection(url):
+    parts = urlsplit(url)
+    cls = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    return cls(parts.netloc, timeout=60)
+
+
+def _target(url):
+    parts = urlsplit(url)
+    return parts.path + ('?' + parts.query if parts.query else '')
+
+
+def read_counters(url):
+    """Samples of REPORTED_COUNTERS from the server's /api/metrics, keyed by their line name"""
+    conn = _connection(url)
+    try:
+        conn.request('GET', '/api/metrics')
+        response = conn.getresponse()
+        text = response.read().decode('utf-8')
+    finally:
+        conn.close()
+    if response.status != 200:
+        return {}
+    counters = {}
+    for line in text.splitlines():
+        if line.startswith(REPORTED_COUNTERS):
+            name, value = line.rsplit(' ', 1)
+            counters[name] = float(value)
+    return counters
+
+
+def worker(urls, requests, offset, start, latencies, statuses, lock, revalidate):
+    etags = {}
+    connections = {}
+    start.wait()
+    for i in range(requests):
+        url = urls[(offset + i) % len(urls)]
+        netloc = urlsplit(url).netloc
+        headers = {'If-None-Match': etags[url]} if revalidate and url in etags else {}
+        began = time.perf_counter()
+        try:
+            conn = connections.get(netloc) or connections.setdefault(netloc, _connection(url))
+            conn.request('GET', _target(url), headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+            if response.getheader('ETag'):
+                etags[url] = response.getheader('ETag')
+        except (OSError, http.client.HTTPException) as e:
+            connections.pop(netloc, None)
+            status = type(e).__name__
+        elapsed = time.perf_counter() - began
+        with lock:
+            latencies.observe(elapsed)
+            statuses[status] += 1
+    for conn in connections.values():
+        conn.close()
+
+
+def run(urls, concurrency, requests, revalidate=False):
+    """Send the requests; returns (wall seconds, latency Summary, status Counter)"""
+    latencies = Summary(window=concurrency * requests)
+    statuses = Counter()
+    lock = threading.Lock()
+    start = threading.Event()
+    threads = [threading.Thread(target=worker, args=(urls, requests, i, start, latencies, statuses, lock, revalidate))
+               for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    began = time.perf_counter()
+    start.set()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - began, latencies, statuses
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('urls', nargs='*', default=[DEFAULT_URL])
+    parser.add_argument('--concurrency', type=int, default=32, help='concurrent connections')
+    parser.add_argument('--requests', type=int, default=20, help='requests per connection')
+    parser.add_argument('--revalidate', action='store_true', help='send If-None-Match with the last ETag')
+    args = parser.parse_args()
+
+    before = read_counters(args.urls[0])
+    wall, latencies, statuses = run(args.urls, args.concurrency, args.requests, args.revalidate)
+    after = read_counters(args.urls[0])
+
+    total = latencies.count
+    print(f"{total} requests over {args.concurrency} connections in {wall:.2f} s: {total / wall:.1f} req/s")
+    quantiles = ', '.join(f"p{round(q * 100)} {value * 1000:.1f} ms" for q, value in latencies.quantiles())
+    print(f"  latency mean {statistics.fmean(latencies.recent) * 1000:.1f} ms, {quantiles}, "
+          f"max {max(latencies.recent) * 1000:.1f} ms")
+    print(f"  status {', '.join(f'{status}: {count}' for status, count in sorted(statuses.items(), key=str))}")
+    for name in sorted(after):
+        delta = after[name] - before.get(name, 0)
+        if delta:
+            print(f"  server {name} +{delta:g}")
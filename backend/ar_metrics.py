@@ -0,0 +1,237 @@
+"""Request phase timings, latency summaries and counters in Prometheus text format.
+
+A handler starts a timer with ``metrics.request(role)`` and wraps each phase
+in ``timer.phase(name)``; ``timer.finish(response)`` writes the phases to a
+``Server-Timing`` header and feeds per-role latency summaries (p50/p95/p99
+over the most recent observations). Set AR_METRICS=0 to turn timing off:
+``request()`` and ``time()`` then hand out shared no-op objects.
+"""
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+METRICS_ENABLED = os.environ.get('AR_METRICS', '1') != '0'
+
+# Observations kept per series for the quantiles; override with AR_METRICS_WINDOW
+SUMMARY_WINDOW = int(os.environ.get('AR_METRICS_WINDOW', '1024'))
+SUMMARY_QUANTILES = (0.5, 0.95, 0.99)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Help text per metric name; also fixes the order metrics are rendered in
+METRIC_HELP = {
+    'ar_request_duration_seconds': 'Time to first byte of /api/ar-data responses',
+    'ar_request_phase_seconds': 'Time spent in each phase of /api/ar-data',
+    'ar_requests_total': '/api/ar-data responses by how they were produced',
+    'ar_dataset_load_seconds': 'Time spent in each phase of loading the ledger',
+    'ar_dataset_reloads_total': 'Ledger snapshots loaded and published',
+    'ar_dataset_reload_errors_total': 'Background reloads that failed',
+    'ar_dataset_rows': 'Invoices in the published snapshot',
+    'ar_dataset_revision': 'Invoice changes applied to the published snapshot',
+    'ar_dataset_memory_bytes': "Memory held by the published snapshot's ledger columns",
+    'ar_payload_cache_hits_total': 'Rendered payloads served from the cache',
+    'ar_payload_cache_misses_total': 'Payloads that had to be rendered',
+    'ar_payload_cache_evictions_total': 'Payloads evicted from the cache',
+    'ar_payload_cache_hit_ratio': 'Share of payload cache lookups that hit',
+    'ar_payload_cache_bytes': 'Total size of cached payloads',
+    'ar_payload_cache_entries': 'Payloads in the cache',
+    'ar_payload_renders_total': 'Payload renders started after a cache miss',
+    'ar_payload_coalesced_total': 'Cache misses that shared a render already in flight',
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _value_text(value):
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    return repr(value)
+
+
+class Summary:
+    """Count, sum and quantiles over the latest ``window`` observations of one series"""
+
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def quantiles(self, quantiles=SUMMARY_QUANTILES):
+        values = sorted(self.recent)
+        if not values:
+            return [(q, float('nan')) for q in quantiles]
+        # Nearest-rank quantiles
+        return [(q, values[max(0, math.ceil(q * len(values)) - 1)]) for q in quantiles]
+
+
+class _Phase:
+    """Times one ``with`` block into a list of (name, seconds)"""
+    __slots__ = ('phases', 'name', 'start')
+
+    def __init__(self, phases, name):
+        self.phases = phases
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.phases.append((self.name, time.perf_counter() - self.start))
+        return False
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class RequestTimer:
+    """Phases of one request, reported on its response and to the metrics"""
+
+    def __init__(self, metrics, role):
+        self.metrics = metrics
+        self.role = role
+        self.start = time.perf_counter()
+        self.phases = []
+
+    def phase(self, name):
+        return _Phase(self.phases, name)
+
+    def finish(self, response, result=None):
+        """Add the Server-Timing header and record the timings; returns ``response``"""
+        total = time.perf_counter() - self.start
+        timings = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.phases]
+        timings.append(f"total;dur={total * 1000:.2f}")
+        response.headers['Server-Timing'] = ', '.join(timings)
+        self.metrics.record_request(self.role, self.phases, total, result)
+        return response
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def phase(self, name):
+        return _NULL_PHASE
+
+    def finish(self, response, result=None):
+        return response
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Observe:
+    """Times one ``with`` block into a summary"""
+    __slots__ = ('metrics', 'name', 'labels', 'start')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Metrics:
+    """Process-wide summaries and counters, plus collectors that report existing stats at scrape time"""
+
+    def __init__(self, enabled=None, window=None):
+        self.enabled = METRICS_ENABLED if enabled is None else enabled
+        self.window = window or SUMMARY_WINDOW
+        self._summaries = {}
+        self._counters = defaultdict(int)
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def request(self, role):
+        """Timer for one request; a shared no-op when metrics are disabled"""
+        return RequestTimer(self, role) if self.enabled else _NULL_TIMER
+
+    def time(self, name, **labels):
+        """Context manager observing the duration of its block into summary ``name``"""
+        return _Observe(self, name, labels) if self.enabled else _NULL_PHASE
+
+    def _summary(self, name, labels):
+        key = (name, labels)
+        summary = self._summaries.get(key)
+        if summary is None:
+            summary = self._summaries[key] = Summary(self.window)
+        return summary
+
+    def observe(self, name, seconds, **labels):
+        with self._lock:
+            self._summary(name, tuple(sorted(labels.items()))).observe(seconds)
+
+    def record_request(self, role, phases, total, result=None):
+        with self._lock:
+            for phase, seconds in phases:
+                self._summary('ar_request_phase_seconds', (('phase', phase), ('role', role))).observe(seconds)
+            self._summary('ar_request_duration_seconds', (('role', role),)).observe(total)
+            if result is not None:
+                self._counters[('ar_requests_total', (('result', result), ('role', role)))] += 1
+
+    def collector(self, collect):
+        """Register ``collect()``, returning (name, type, labels dict, value) samples, to run at every scrape"""
+        self._collectors.append(collect)
+        return collect
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        # name -> (type, [(name suffix, labels, value)])
+        families = {}
+        with self._lock:
+            for (name, labels), summary in sorted(self._summaries.items()):
+                samples = families.setdefault(name, ('summary', []))[1]
+                for q, value in summary.quantiles():
+                    samples.append(('', labels + (('quantile', q),), value))
+                samples.append(('_sum', labels, summary.total))
+                samples.append(('_count', labels, summary.count))
+            for (name, labels), value in sorted(self._counters.items()):
+                families.setdefault(name, ('counter', []))[1].append(('', labels, value))
+        for collect in self._collectors:
+            for name, kind, labels, value in collect():
+                families.setdefault(name, (kind, []))[1].append(('', tuple(sorted(labels.items())), value))
+
+        order = {name: i for i, name in enumerate(METRIC_HELP)}
+        lines = []
+        for name in sorted(families, key=lambda name: (order.get(name, len(order)), name)):
+            kind, samples = families[name]
+            if name in METRIC_HELP:
+                lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_label_text(labels)} {_value_text(value)}")
+        return '\n'.join(lines) + '\n'
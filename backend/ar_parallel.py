@@ -0,0 +1,250 @@
+"""Sharded map-reduce build of the ledger aggregates over a process pool.
+
+Usage: python ar_parallel.py [--rows 1000000] [--workers 1,2,4] [--repeat 3]
+
+Above ``PARALLEL_MIN_ROWS`` rows, and with AR_AGGREGATE_WORKERS set above
+1, ``build_ledger_aggregates`` runs here instead of in one process:
+
+* map: the columns the aggregates read are written once to an Arrow IPC file
+  (in /dev/shm where available) that every worker memory-maps. The ledger is
+  sharded by 'Customer ID', so each customer's invoices (and its share of
+  the distinct account count) fall in exactly one shard. A worker groups its
+  shard's rows into partial cube cells, dispute cells, cross-tabs and
+  per-customer totals, recording each cell's first ledger row.
+* reduce: the parent sums the partials cell by cell, orders the cells by
+  their first row (the single-process order) and merges the shards' sorted
+  customer names. Meanwhile it builds the row indexes, which are positions
+  into the whole ledger.
+
+Counts are identical to the single-process build; float sums are added
+in a different order, so they can differ from it in the last bits. The
+benchmark checks both and prints the build time per worker count.
+"""
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from ar_crosstab import CROSSTAB_DIMENSIONS, MANAGER_COUNTRY_DIMENSION, MANAGER_GROUP_DIMENSION, crosstab
+from ar_cube import (CUBE_DIMENSIONS, DISPUTE_DIMENSIONS, ARCube, LedgerAggregates, ar_cube_cells,
+                     dispute_cube_cells, merge_cells)
+from ar_partition import build_partition_indexes
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - the aggregates are then built in one process
+    pa = None
+
+# Worker processes for the aggregates; 1 (the default) builds them in the calling process
+AGGREGATE_WORKERS = int(os.environ.get('AR_AGGREGATE_WORKERS', '1'))
+
+# Below this many rows starting the shards costs more than it saves
+PARALLEL_MIN_ROWS = 500_000
+
+# Cross-tab dimensions kept in the aggregates
+AGGREGATE_CROSSTABS = (MANAGER_COUNTRY_DIMENSION, MANAGER_GROUP_DIMENSION)
+
+# Directory of the shared column files; tmpfs keeps them in memory
+SHARED_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+_pool = None
+
+
+def use_parallel(df, workers=None):
+    """True if the aggregates of ``df`` should be built over the process pool"""
+    workers = AGGREGATE_WORKERS if workers is None else workers
+    return pa is not None and workers > 1 and len(df) >= PARALLEL_MIN_ROWS
+
+
+def get_pool(workers):
+    """Process pool of ``workers`` processes, reused while the worker count stays the same"""
+    global _pool
+    if _pool is None or _pool._max_workers != workers:
+        if _pool is not None:
+            _pool.shutdown()
+        # A fork server is forked from before any request thread exists; spawn elsewhere
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        if 'forkserver' in methods:
+            context.set_forkserver_preload([__name__])
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    return _pool
+
+
+def aggregate_columns():
+    """Ledger columns read by the aggregates"""
+    columns = ['Customer Name', 'Customer ID', 'Invoice Amount', 'Days overdue', 'Invoice month', 'Invoice Status']
+    columns += CUBE_DIMENSIONS.values()
+    columns += [column for column, _ in DISPUTE_DIMENSIONS.values()]
+    columns += [CROSSTAB_DIMENSIONS[dimension] for dimension in AGGREGATE_CROSSTABS]
+    return list(dict.fromkeys(columns))
+
+
+def shard_rows(df, shards):
+    """Ascending ledger positions of each shard, sharded by a hash of 'Customer ID'"""
+    # Small integer keys sort in linear time
+    shard_ids = (pd.util.hash_pandas_object(df['Customer ID'], index=False).to_numpy() % shards).astype('uint16')
+    order = np.argsort(shard_ids, kind='stable')
+    bounds = np.searchsorted(shard_ids[order], np.arange(1, shards))
+    return np.split(order, bounds)
+
+
+def map_shard(path, rows, crosstab_dimensions):
+    """Partial aggregates of the ledger rows ``rows`` of the column file at ``path``"""
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    df = table.take(pa.array(rows)).to_pandas(date_as_object=False)
+
+    crosstabs = {dimension: crosstab(df, dimension, positions=rows) for dimension in crosstab_dimensions}
+
+    codes, names = pd.factorize(df['Customer Name'], sort=True)
+    amounts = np.nan_to_num(df['Invoice Amount'].to_numpy(dtype='float64'))
+    overdue = (df['Days overdue'] > 0).to_numpy(dtype=bool, na_value=False)
+    present = codes >= 0
+    customers = {
+        # Arrow strings cross the process boundary as buffers rather than as one object per name
+        'names': pa.array(names),
+        'codes': codes,
+        'amount': np.bincount(codes[present], weights=amounts[present], minlength=len(names)),
+        'overdue_amount': np.bincount(codes[present], weights=np.where(overdue, amounts, 0)[present],
+                                      minlength=len(names)),
+        'overdue_count': np.bincount(codes[present], weights=overdue[present], minlength=len(names)).astype('int64'),
+    }
+    return {
+        'cube': ar_cube_cells(df, rows),
+        'disputes': dispute_cube_cells(df, rows),
+        'crosstabs': crosstabs,
+        'customers': customers,
+        'accounts': df['Customer ID'].nunique(),
+    }
+
+
+def merge_customers(parts, shards, size):
+    """Customer totals of the shards plus each ledger row's position in them, as ``build_customer_totals``"""
+    # Every shard's names are sorted, so a stable sort of their concatenation merges sorted runs
+    arrow_names = pa.concat_arrays([part['names'] for part in parts])
+    names = arrow_names.to_numpy(zero_copy_only=False)
+    order = np.argsort(names, kind='stable')
+    sorted_names = names[order]
+    new = np.ones(len(names), dtype=bool)
+    new[1:] = sorted_names[1:] != sorted_names[:-1]
+    starts = np.flatnonzero(new)
+    # Position of each shard name in the merged table
+    merged_codes = np.empty(len(names), dtype='int64')
+    merged_codes[order] = np.cumsum(new) - 1
+
+    customers = pd.DataFrame({
+        measure: np.add.reduceat(np.concatenate([part[measure] for part in parts])[order], starts)
+        if len(names) else np.zeros(0, dtype=parts[0][measure].dtype)
+        for measure in ('amount', 'overdue_amount', 'overdue_count')
+    }, index=pd.Index(pd.array(arrow_names.take(order[starts]), dtype='str'), name='Customer Name'))
+
+    codes = np.full(size, -1, dtype='int64')
+    offset = 0
+    for part, rows in zip(parts, shards):
+        local = part['codes']
+        codes[rows] = np.where(local >= 0, merged_codes[offset + np.maximum(local, 0)], -1)
+        offset += len(part['names'])
+    return customers, codes
+
+
+def build_ledger_aggregates_parallel(df, workers=None):
+    """``build_ledger_aggregates`` as a map over Customer ID shards in ``workers`` processes and a merge"""
+    workers = workers or AGGREGATE_WORKERS
+    shards = [rows for rows in shard_rows(df, workers) if len(rows)]
+    crosstab_dimensions = list(AGGREGATE_CROSSTABS)
+    table = pa.Table.from_pandas(df[aggregate_columns()], preserve_index=False)
+    fd, path = tempfile.mkstemp(prefix='ar-ledger-', suffix='.arrow', dir=SHARED_DIR)
+    try:
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        pool = get_pool(workers)
+        futures = [pool.submit(map_shard, path, rows, crosstab_dimensions) for rows in shards]
+        # Row indexes span the whole ledger; built while the shards are aggregated
+        partitions = build_partition_indexes(df)
+        parts = [future.result() for future in futures]
+    finally:
+        os.close(fd)
+        os.unlink(path)
+
+    customers, customer_codes = merge_customers([part['customers'] for part in parts], shards, len(df))
+    return LedgerAggregates(
+        cube=ARCube(merge_cells([part['cube'] for part in parts], keep_first=True)),
+        disputes=ARCube(merge_cells([part['disputes'] for part in parts], keep_first=True)),
+        customers=customers,
+        customer_codes=customer_codes,
+        # Shards never share a customer ID
+        total_accounts=sum(part['accounts'] for part in parts),
+        partitions=partitions,
+        crosstabs={dimension: merge_cells([part['crosstabs'][dimension] for part in parts])
+                   for dimension in crosstab_dimensions},
+    )
+
+
+def _differences(expected, actual):
+    """Names of the aggregates of ``actual`` that differ from ``expected`` beyond float rounding"""
+    def same_frame(a, b):
+        try:
+            pd.testing.assert_frame_equal(a, b, check_exact=False, rtol=1e-9, check_index_type=False)
+        except AssertionError:
+            return False
+        return True
+
+    differences = [name for name, a, b in (('cube', expected.cube.cells, actual.cube.cells),
+                                           ('disputes', expected.disputes.cells, actual.disputes.cells),
+                                           ('customers', expected.customers, actual.customers))
+                   if not same_frame(a, b)]
+    differences += [f'crosstab {dimension}' for dimension, frame in expected.crosstabs.items()
+                    if not same_frame(frame, actual.crosstabs[dimension])]
+    if not np.array_equal(expected.customer_codes, actual.customer_codes):
+        differences.append('customer_codes')
+    if expected.total_accounts != actual.total_accounts:
+        differences.append('total_accounts')
+    return differences
+
+
+def _benchmark(rows, worker_counts, repeat):
+    import time
+
+    from ar_backend import load_ar_frame
+    from ar_bench import ledger_path
+
+    df = load_ar_frame(ledger_path(rows))
+    print(f"ledger {len(df)} rows, {os.cpu_count()} CPUs")
+
+    def timed(build):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = build()
+            times.append(time.perf_counter() - start)
+        return min(times), result
+
+    from ar_cube import build_ledger_aggregates
+
+    global AGGREGATE_WORKERS
+    AGGREGATE_WORKERS = 1
+    single_time, expected = timed(lambda: build_ledger_aggregates(df))
+    print(f"  single process   {single_time * 1000:9.1f} ms")
+    for workers in worker_counts:
+        # The first build starts the pool; it is not timed
+        build_ledger_aggregates_parallel(df, workers)
+        seconds, actual = timed(lambda: build_ledger_aggregates_parallel(df, workers))
+        differences = _differences(expected, actual)
+        print(f"  {workers:2d} workers       {seconds * 1000:9.1f} ms   speedup {single_time / seconds:5.2f}x   "
+              f"{'matches' if not differences else 'DIFFERS: ' + ', '.join(differences)}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from ar_bench import parse_size
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='1M', help='ledger size, e.g. 100k or 10M')
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated worker counts')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    _benchmark(parse_size(args.rows), [int(count) for count in args.workers.split(',')], args.repeat)
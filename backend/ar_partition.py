@@ -0,0 +1,88 @@
+"""Per-snapshot row index of each collector's and biller's invoices.
+
+Run ``python ar_partition.py`` to compare a full-ledger filter against the
+index lookup as the ledger grows while one collector's book stays fixed.
+"""
+import numpy as np
+import pandas as pd
+
+# Partition name -> ledger column
+PARTITION_COLUMNS = {
+    'collector': 'Collector Name',
+    'biller': 'Biller Name',
+}
+
+
+class PartitionIndex:
+    """Row positions of every value of one column, grouped with one stable sort"""
+
+    def __init__(self, column, order, offsets):
+        self.column = column
+        self._order = order
+        self._offsets = offsets
+
+    @classmethod
+    def build(cls, df, column):
+        codes, uniques = pd.factorize(df[column])
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        # Missing values (code -1) sort first and are not indexed
+        starts = np.searchsorted(sorted_codes, np.arange(len(uniques)), side='left')
+        ends = np.searchsorted(sorted_codes, np.arange(len(uniques)), side='right')
+        offsets = {value: (start, end) for value, start, end in zip(uniques, starts, ends)}
+        return cls(column, order, offsets)
+
+    def __contains__(self, value):
+        return value in self._offsets
+
+    def sizes(self):
+        """Number of rows per value"""
+        return {value: end - start for value, (start, end) in self._offsets.items()}
+
+    def groups(self, size):
+        """Indexed values, and the position of each row's value in that list (-1 if none) for ``size`` rows"""
+        values = list(self._offsets)
+        codes = np.full(size, -1, dtype='int32')
+        for code, (start, end) in enumerate(self._offsets.values()):
+            codes[self._order[start:end]] = code
+        return values, codes
+
+    def rows(self, value):
+        """Ascending row positions holding ``value`` (empty if it does not occur)"""
+        start, end = self._offsets.get(value, (0, 0))
+        return self._order[start:end]
+
+    def take(self, df, value):
+        """Rows of ``df`` holding ``value``, in ledger order"""
+        return df.iloc[self.rows(value)]
+
+
+def build_partition_indexes(df):
+    """Partition indexes for every column in PARTITION_COLUMNS"""
+    return {name: PartitionIndex.build(df, column) for name, column in PARTITION_COLUMNS.items()}
+
+
+def _benchmark(book_size=500, ledger_sizes=(10_000, 100_000, 1_000_000), repeat=20):
+    import time
+
+    rng = np.random.default_rng(0)
+    for n in ledger_sizes:
+        names = rng.choice(['A', 'B', 'C', 'D'], size=n).astype(object)
+        names[rng.choice(n, size=book_size, replace=False)] = 'Target'
+        df = pd.DataFrame({'Collector Name': names, 'Invoice Amount': rng.uniform(500, 50000, n)})
+        index = PartitionIndex.build(df, 'Collector Name')
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            df[df['Collector Name'] == 'Target']['Invoice Amount'].sum()
+        scan_ms = (time.perf_counter() - start) / repeat * 1000
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            index.take(df, 'Target')['Invoice Amount'].sum()
+        index_ms = (time.perf_counter() - start) / repeat * 1000
+        print(f"ledger {n:>9} rows, book {book_size}: scan {scan_ms:8.3f} ms   index {index_ms:8.3f} ms")
+
+
+if __name__ == '__main__':
+    _benchmark()
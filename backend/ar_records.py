@@ -0,0 +1,50 @@
+"""Streaming, cursor-paginated export of raw ledger records."""
+import os
+
+import numpy as np
+
+# Stable sort key used for cursor pagination
+RECORD_KEY = 'Invoice number'
+
+# Rows encoded per chunk; memory use is bounded by this, not by the result size
+DEFAULT_CHUNK_ROWS = int(os.environ.get('AR_RECORDS_CHUNK_ROWS', '1000'))
+
+RECORD_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class RecordIndex:
+    """Row positions of the ledger ordered by RECORD_KEY, built once per snapshot"""
+
+    def __init__(self, df):
+        keys = df[RECORD_KEY].to_numpy()
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+
+    def page(self, cursor=None, limit=None):
+        """Row positions after ``cursor`` (exclusive) and the cursor of the next page, if any"""
+        start = 0 if cursor is None else np.searchsorted(self.sorted_keys, cursor, side='right')
+        end = len(self.order) if limit is None else min(start + limit, len(self.order))
+        next_cursor = self.sorted_keys[end - 1].item() if end < len(self.order) and end > start else None
+        return self.order[start:end], next_cursor
+
+
+def iter_records(df, positions, fields=None, fmt='json', chunk_rows=None):
+    """Yield the selected rows as encoded bytes, one chunk of rows at a time"""
+    chunk_rows = chunk_rows or DEFAULT_CHUNK_ROWS
+    columns = fields or list(df.columns)
+
+    if fmt == 'json':
+        yield b'['
+    for i, start in enumerate(range(0, len(positions), chunk_rows)):
+        chunk = df.iloc[positions[start:start + chunk_rows]][columns]
+        if fmt == 'ndjson':
+            yield (chunk.to_json(orient='records', lines=True, date_format='iso').rstrip('\n') + '\n').encode('utf-8')
+        else:
+            # Drop the chunk's own brackets and join chunks with commas
+            body = chunk.to_json(orient='records', date_format='iso')[1:-1]
+            yield ((',' if i else '') + body).encode('utf-8')
+    if fmt == 'json':
+        yield b']'
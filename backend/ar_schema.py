@@ -0,0 +1,173 @@
+"""Column schema of the AR ledger and helpers that keep it in native dtypes.
+
+Run ``python ar_schema.py [workbook] [--repeat N]`` to compare memory use and
+dashboard formatting time of the old object-dtype frame against the compact one.
+"""
+import numpy as np
+import pandas as pd
+
+# Column name and kind for every column written by generate_ar_data.py, in workbook order.
+# Kinds: 'int8'/'int16'/'int32'/'int64', 'float', 'string', 'category', 'date'.
+# 'category' columns hold a handful of distinct values and are dictionary encoded in memory.
+# 'Invoice month' and 'Due month' hold the full invoice and due dates (MM/DD/YYYY);
+# 'Invoice date' and 'Invoice due date' are display text without a year.
+LEDGER_SCHEMA = [
+    ('Customer Name', 'string'),
+    ('Customer ID', 'int32'),
+    ('Invoice number', 'int64'),
+    ('Collector Name', 'category'),
+    ('Biller Name', 'category'),
+    ('Client Director', 'category'),
+    ('Invoice date', 'category'),
+    ('Invoice due date', 'category'),
+    ('Invoice Amount', 'float'),
+    ('Customer terms', 'category'),
+    ('Customer type', 'category'),
+    ('Calculated terms', 'int16'),
+    ('Weighted calculated terms', 'float'),
+    ('Days overdue', 'int32'),
+    ('Weighted Overdue Amount', 'float'),
+    ('Weighted Overdue Bucket', 'category'),
+    ('Weighted Average Overdue days (Customer)', 'int32'),
+    ('Weighted Average Overdue days (Collector)', 'int32'),
+    ('Weighted Average Overdue days (Biller)', 'int32'),
+    ('Invoice Status', 'category'),
+    ('Dispute code L1', 'category'),
+    ('Dispute code L2', 'category'),
+    ('Dispute code L3', 'category'),
+    ('Assigned Responsible', 'category'),
+    ('Root cause dropdown', 'category'),
+    ('Outcome Status', 'category'),
+    ('Comments', 'string'),
+    ('Invoice day of month', 'int8'),
+    ('Due day of month', 'int8'),
+    ('Invoice day of week', 'category'),
+    ('Due day of week', 'category'),
+    ('Invoice month', 'date'),
+    ('Due month', 'date'),
+]
+LEDGER_COLUMN_NAMES = [name for name, _ in LEDGER_SCHEMA]
+CATEGORY_COLUMNS = [name for name, kind in LEDGER_SCHEMA if kind == 'category']
+INT_KINDS = ('int8', 'int16', 'int32', 'int64')
+
+# Workbook columns that repeat another column and are not kept
+DROPPED_COLUMNS = ('Invoice day of month Dup',)
+
+# Text format of 'date' columns as written by the generator
+DATE_FORMATS = {
+    'Invoice month': '%m/%d/%Y',
+    'Due month': '%m/%d/%Y',
+}
+
+
+def as_category(values):
+    """Categorical with sorted categories, so grouping and sorting follow the plain values' order"""
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        return values.astype('category')
+    categories = values.cat.categories
+    if categories.is_monotonic_increasing:
+        return values
+    return values.cat.reorder_categories(categories.sort_values())
+
+
+def add_categories(values, new):
+    """Categorical ``values`` whose categories also include ``new``, kept sorted"""
+    categories = values.cat.categories
+    merged = categories.union(pd.Index(new).dropna())
+    if len(merged) == len(categories):
+        return values
+    return values.cat.set_categories(merged)
+
+
+def apply_schema(df):
+    """Cast a loaded ledger to its compact schema dtypes.
+
+    Low-cardinality text becomes categorical, integers take their schema
+    width (float64 when they contain nulls; values that do not fit are
+    treated as invalid), floats stay float64 so that amounts sum exactly,
+    and date columns become datetime64. Missing values stay NaN/NaT;
+    conversion to None happens only in ``to_records``.
+    """
+    df = df.drop(columns=[name for name in DROPPED_COLUMNS if name in df.columns])
+    for name, kind in LEDGER_SCHEMA:
+        if name not in df.columns or kind == 'string':
+            continue
+        if kind == 'category':
+            df[name] = as_category(df[name])
+            continue
+        if kind == 'date':
+            if not pd.api.types.is_datetime64_any_dtype(df[name]):
+                df[name] = pd.to_datetime(df[name], format=DATE_FORMATS[name], errors='coerce')
+            continue
+        if df[name].dtype == (kind if kind in INT_KINDS else 'float64'):
+            # Already stored at the schema width, e.g. read from the Arrow artifact
+            continue
+        values = pd.to_numeric(df[name], errors='coerce')
+        if kind in INT_KINDS:
+            limits = np.iinfo(kind)
+            out_of_range = values.notnull() & ~values.between(limits.min, limits.max)
+            if out_of_range.any():
+                values = values.mask(out_of_range)
+            if not values.isnull().any():
+                values = values.astype(kind)
+        elif kind == 'float':
+            values = values.astype('float64')
+        df[name] = values
+    return df
+
+
+def frame_memory(df):
+    """Bytes held by a frame's columns, counting string contents"""
+    return int(df.memory_usage(deep=True, index=False).sum())
+
+
+def to_records(df):
+    """Convert a frame to JSON-ready records, mapping NaN to None and numpy scalars to Python"""
+    return df.astype(object).where(df.notnull(), None).to_dict(orient='records')
+
+
+def _format_all(df):
+    from ar_backend import (format_admin_dashboard_data, format_biller_dashboard_data,
+                            format_collector_dashboard_data, format_manager_dashboard_data)
+    format_admin_dashboard_data(df)
+    format_manager_dashboard_data(df)
+    for name in df['Collector Name'].dropna().unique():
+        format_collector_dashboard_data(df, name)
+    for name in df['Biller Name'].dropna().unique():
+        format_biller_dashboard_data(df, name)
+
+
+def compare_loaders(path, repeat=1):
+    """Print memory and formatting time of the object-dtype frame vs the compact frame"""
+    import time
+    from ar_ingest import load_ledger
+
+    raw = load_ledger(path)
+    if repeat > 1:
+        raw = pd.concat([raw] * repeat, ignore_index=True)
+
+    # The formatters need numeric amounts and datetime64 dates, so only text becomes object (with None for NaN)
+    text = raw.select_dtypes(exclude=['number', 'datetime']).columns
+    objects = raw.copy()
+    objects[text] = raw[text].astype(object).where(raw[text].notnull(), None)
+    frames = {
+        'object (df.where)': objects,
+        'compact (apply_schema)': apply_schema(raw),
+    }
+    print(f"{len(raw)} rows")
+    for label, df in frames.items():
+        memory_mb = frame_memory(df) / 1e6
+        start = time.perf_counter()
+        _format_all(df)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"{label:<24} memory {memory_mb:8.2f} MB   all dashboards {elapsed_ms:9.1f} ms")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', nargs='?', default='AR_Model_Dummy_Data.xlsx')
+    parser.add_argument('--repeat', type=int, default=1, help='tile the ledger N times')
+    args = parser.parse_args()
+    compare_loaders(args.path, args.repeat)
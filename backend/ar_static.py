@@ -0,0 +1,142 @@
+"""Prebuild every dashboard payload as static JSON files for the hosting site.
+
+Usage:
+    python ar_static.py [--data AR_Model_Dummy_Data.xlsx] [--out ../frontend/public/ar-data] [--memory-budget 256M]
+
+The ledger is loaded and aggregated once, then the admin and manager views
+and the view of every collector and biller are rendered with the same
+formatters as /api/ar-data and written as::
+
+    <out>/admin.json
+    <out>/manager.json
+    <out>/collector/<name>.json
+    <out>/biller/<name>.json
+    <out>/manifest.json
+
+File names are the percent-encoded name (``encodeURIComponent``), so a
+client requests ``encodeURIComponent(encodeURIComponent(name))``. Each file
+also gets a gzip sibling (``.json.gz``) and, when the brotli package is
+installed, a ``.json.br`` one, for servers that send precompressed files;
+Firebase hosting compresses the plain file itself. A .csv or .parquet ledger
+is aggregated in chunks within ``--memory-budget`` (see ar_stream) instead of
+being loaded whole. The frontend reads these
+files first and falls back to the API when one is missing. Run it before
+``next build`` so the files are exported with the site.
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+from datetime import datetime
+from urllib.parse import quote
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - gzip is always written
+    brotli = None
+
+DEFAULT_OUT_DIR = os.path.join('..', 'frontend', 'public', 'ar-data')
+
+# Characters encodeURIComponent leaves as they are
+URI_COMPONENT_SAFE = "-_.!~*'()"
+
+
+def payload_filename(name):
+    """File name of a collector's or biller's payload"""
+    return quote(str(name), safe=URI_COMPONENT_SAFE) + '.json'
+
+
+def write_payload(path, body):
+    """Write a JSON body with its precompressed siblings; returns the bytes written per encoding"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    encoded = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded['br'] = brotli.compress(body)
+    suffixes = {'identity': '', 'gzip': '.gz', 'br': '.br'}
+    for encoding, data in encoded.items():
+        with open(path + suffixes[encoding], 'wb') as fh:
+            fh.write(data)
+    return {encoding: len(data) for encoding, data in encoded.items()}
+
+
+def build_static_payloads(data_path, out_dir, memory_budget=None):
+    """Render every role's payload from one load of the ledger into ``out_dir``; returns the manifest"""
+    from ar_backend import build_ar_payload, build_streamed_payload, history_store, load_ar_frame, prepare_snapshot
+    from ar_cube import build_ledger_aggregates
+    from ar_dataset import DatasetSnapshot, file_digest
+    from ar_json import dumps
+    from ar_stream import DEFAULT_MEMORY_BUDGET, build_streamed_aggregates, is_streamable
+
+    version = file_digest(data_path)[:12]
+    if is_streamable(data_path):
+        # CSV and Parquet ledgers are aggregated in chunks and never loaded whole; logged changes are not replayed
+        aggregates = build_streamed_aggregates(data_path, memory_budget or DEFAULT_MEMORY_BUDGET)
+        try:
+            history_store.record(aggregates.cube)
+        except OSError as e:
+            print(f"Error recording AR history: {e}")
+
+        def payload(role, name=None):
+            return build_streamed_payload(aggregates, role, name, history_store)
+
+        def names(role):
+            return aggregates.cube.per(role)
+    else:
+        snapshot = DatasetSnapshot(load_ar_frame(data_path), version, data_path)
+        # Prepared as the API prepares it: logged invoice changes replayed and today's history recorded
+        prepare_snapshot(snapshot)
+        aggregates = snapshot.derived('aggregates', build_ledger_aggregates)
+
+        def payload(role, name=None):
+            return build_ar_payload(snapshot, role, name)
+
+        def names(role):
+            return aggregates.partitions[role].sizes()
+
+    # Written to a fresh directory and swapped in, so that no stale collector or biller file survives
+    tmp_dir = out_dir.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    manifest = {
+        'version': version,
+        'managerVersion': version + history_store.version(),
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'source': os.path.basename(data_path),
+        'payloads': {},
+    }
+    totals = {}
+
+    def render(relative_path, role, name=None):
+        sizes = write_payload(os.path.join(tmp_dir, relative_path), dumps(payload(role, name)))
+        for encoding, size in sizes.items():
+            totals[encoding] = totals.get(encoding, 0) + size
+        return relative_path.replace(os.sep, '/')
+
+    for role in ('admin', 'manager'):
+        manifest['payloads'][role] = render(f'{role}.json', role)
+    for role in ('collector', 'biller'):
+        manifest['payloads'][role] = {str(name): render(os.path.join(role, payload_filename(name)), role, name)
+                                      for name in sorted(names(role), key=str)}
+
+    manifest['bytes'] = totals
+    write_payload(os.path.join(tmp_dir, 'manifest.json'), json.dumps(manifest, indent=2).encode('utf-8'))
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return manifest
+
+
+if __name__ == '__main__':
+    from ar_backend import AR_DATA_PATH
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default=AR_DATA_PATH, help='workbook, .arrow, .csv or .parquet ledger to render')
+    parser.add_argument('--out', default=DEFAULT_OUT_DIR, help='directory to write the payloads to')
+    parser.add_argument('--memory-budget', help="memory budget for aggregating a .csv or .parquet ledger in chunks, "
+                                                "e.g. '256M' (default AR_STREAM_MEMORY)")
+    args = parser.parse_args()
+
+    manifest = build_static_payloads(args.data, args.out, args.memory_budget)
+    payloads = manifest['payloads']
+    count = 2 + len(payloads['collector']) + len(payloads['biller'])
+    sizes = ', '.join(f"{encoding} {size / 1024:.1f} KiB" for encoding, size in manifest['bytes'].items())
+    print(f"Wrote {count} payloads for version {manifest['version']} to {args.out} ({sizes})")
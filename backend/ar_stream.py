@@ -0,0 +1,366 @@
+"""Out-of-core aggregation of a CSV or Parquet ledger within a memory budget.
+
+Usage: python ar_stream.py LEDGER.{csv,parquet} [--memory-budget 256M]
+
+The ledger is read in chunks of rows (only the columns the dashboards use)
+and never held whole; a chunk's row count comes from the budget and the
+decoded size of a sample of leading rows. Each chunk is folded into
+mergeable partials:
+
+* cube, disputes and cross-tab cells, summed cell by cell and kept in
+  ledger order by each cell's first row, as ``ar_parallel`` merges shards;
+* the ten worklist candidates of every collector and biller (and of the
+  whole ledger), re-ranked as each chunk adds its own;
+* per-customer sums, which grow with the number of customers rather than
+  being bounded, so they are spilled to disk in partitions by a hash of the
+  customer name (and the customer IDs by a hash of the ID). Each partition
+  is then reduced on its own; a customer's rows all land in one partition,
+  so the top customers of every partition contain the overall top ones.
+
+The result renders every role's dashboard with the usual formatters (see
+``build_streamed_payload`` in ar_backend). Amount sums are added in a
+different order than in memory and can differ from it in the last bits.
+The budget bounds the working set, not the interpreter and its libraries,
+and Parquet files are decoded a row group at a time whatever the chunk
+size. AR_STREAM_MEMORY sets the default budget and AR_STREAM_DIR the spill
+directory.
+"""
+import math
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from ar_crosstab import crosstab
+from ar_cube import ARCube, LedgerAggregates, ar_cube_cells, combine_cells, dispute_cube_cells, merge_cells
+from ar_parallel import AGGREGATE_CROSSTABS, aggregate_columns
+from ar_partition import PartitionIndex, PARTITION_COLUMNS
+from ar_records import RECORD_KEY
+from ar_schema import LEDGER_SCHEMA, apply_schema, frame_memory
+from ar_worklist import BILLER_WORKLIST_COLUMNS, DEFAULT_SORT, WORKLIST_SORT_KEYS, top_worklist, top_worklists
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - streaming needs pyarrow
+    pa = None
+
+STREAM_SUFFIXES = ('.csv', '.parquet')
+
+# Default budget; override with AR_STREAM_MEMORY (e.g. '512M', '2G')
+DEFAULT_MEMORY_BUDGET = os.environ.get('AR_STREAM_MEMORY', '256M')
+
+# Spill files go here (not /dev/shm, which is memory); override with AR_STREAM_DIR
+SPILL_DIR = os.environ.get('AR_STREAM_DIR') or None
+
+# Parts of the budget a chunk's decoded frame may take; its groupbys, the reader and the spill buffers take the rest
+CHUNK_SHARE = 16
+# Parts of the budget a spill partition may take when it is read back and reduced
+PARTITION_SHARE = 8
+MAX_PARTITIONS = 1024
+# Leading rows read to measure a decoded row, and CSV bytes read to estimate the row count
+SAMPLE_ROWS = 4096
+# Chunks whose cube and cross-tab cells are summed together
+FOLD_CHUNKS = 8
+SAMPLE_BYTES = 1 << 20
+
+# Dashboard top customers and worklist lengths
+TOP_CUSTOMERS = 5
+WORKLIST_LENGTH = 10
+
+
+def is_streamable(path):
+    """True if the ledger at ``path`` can be aggregated in chunks"""
+    return os.path.splitext(path)[1].lower() in STREAM_SUFFIXES
+
+
+def parse_budget(text):
+    """Bytes from text such as '64M' or '2G' (powers of 1024)"""
+    text = str(text).strip()
+    multiplier = {'k': 1 << 10, 'm': 1 << 20, 'g': 1 << 30}.get(text[-1:].lower(), 1)
+    return int(float(text[:-1] if multiplier > 1 else text) * multiplier)
+
+
+def stream_columns():
+    """Ledger columns read from the source: those of the aggregates and of the worklists"""
+    columns = aggregate_columns() + BILLER_WORKLIST_COLUMNS
+    columns += [WORKLIST_SORT_KEYS[name][0] for name in DEFAULT_SORT] + [RECORD_KEY]
+    return list(dict.fromkeys(columns))
+
+
+def _csv_dtypes(columns):
+    """Text columns of the CSV, read as text in every chunk; apply_schema converts them and the numbers"""
+    kinds = dict(LEDGER_SCHEMA)
+    return {name: 'str' for name in columns if kinds.get(name) in ('string', 'category', 'date')}
+
+
+def source_layout(path, budget):
+    """(columns present in the source, rows per chunk for ``iter_chunks``, spill partitions) for a memory budget"""
+    wanted = stream_columns()
+    if path.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        metadata = pq.ParquetFile(path).metadata
+        names = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+        columns = [name for name in wanted if name in names]
+        rows = metadata.num_rows
+    else:
+        names = pd.read_csv(path, nrows=0).columns
+        columns = [name for name in wanted if name in names]
+        with open(path, 'rb') as source:
+            head = source.read(SAMPLE_BYTES)
+        rows = os.path.getsize(path) * max(head.count(b'\n') - 1, 1) / len(head) if head else 0
+    sample = next(iter_chunks(path, columns, SAMPLE_ROWS), None)
+    if sample is None or not len(sample):
+        return columns, SAMPLE_ROWS, 1
+
+    # Sized by the decoded frame, which is what the chunk's working set grows with
+    chunk = max(1, budget // CHUNK_SHARE * len(sample) // max(frame_memory(sample), 1))
+    # Spilled customer rows: the name plus a handful of 8-byte sums
+    spill_bytes = rows * (sample['Customer Name'].str.len().mean() + 64)
+    partitions = min(MAX_PARTITIONS, max(1, math.ceil(spill_bytes * PARTITION_SHARE / budget)))
+    return columns, chunk, partitions
+
+
+def iter_chunks(path, columns, chunk):
+    """Frames of ``chunk`` consecutive ledger rows with the schema dtypes"""
+    if path.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        # Column chunks are read through a small buffer rather than loaded whole ahead of decoding
+        source = pq.ParquetFile(path, buffer_size=1 << 20, pre_buffer=False)
+        for batch in source.iter_batches(batch_size=chunk, columns=columns):
+            yield apply_schema(batch.to_pandas(date_as_object=False))
+        return
+    # The pandas reader holds one chunk at a time (Arrow's CSV reader needs many times its block size).
+    # Only empty fields are missing: values such as 'NA' or 'None' stay text, as in the workbook
+    with pd.read_csv(path, usecols=columns, dtype=_csv_dtypes(columns), keep_default_na=False, na_values=[''],
+                     chunksize=chunk) as reader:
+        for df in reader:
+            yield apply_schema(df)
+
+
+class HashSpill:
+    """Frames appended chunk by chunk, split into files by a hash of one column and read back a partition at a time"""
+
+    def __init__(self, directory, name, key, partitions):
+        self.key = key
+        self.partitions = partitions
+        self._paths = [os.path.join(directory, f'{name}-{i}.arrow') for i in range(partitions)]
+        self._schema = None
+        self._sinks = {}
+        self._writers = {}
+
+    def append(self, frame):
+        # Hashing the values directly skips factorizing them first, which costs more than it saves on unique names
+        partition_ids = (pd.util.hash_array(frame[self.key].to_numpy(), categorize=False)
+                         % self.partitions).astype('uint16')
+        # One linear-time sort groups the rows of each partition, which are then written as slices
+        order = np.argsort(partition_ids, kind='stable')
+        table = pa.Table.from_pandas(frame, preserve_index=False).take(pa.array(order))
+        if self._schema is None:
+            # Every chunk is written with the first chunk's schema. Its text columns may be all missing (or it may
+            # have no rows), which Arrow types as null; they are text, as in the chunks that follow.
+            self._schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                      for field in table.schema])
+        table = table.cast(self._schema)
+        sorted_ids = partition_ids[order]
+        bounds = np.searchsorted(sorted_ids, np.arange(self.partitions + 1))
+        for partition in np.unique(sorted_ids):
+            part = table.slice(bounds[partition], bounds[partition + 1] - bounds[partition])
+            writer = self._writers.get(partition)
+            if writer is None:
+                self._sinks[partition] = pa.OSFile(self._paths[partition], 'wb')
+                writer = self._writers[partition] = pa.ipc.new_stream(self._sinks[partition], self._schema)
+            writer.write_table(part)
+
+    def close(self):
+        for partition, writer in self._writers.items():
+            writer.close()
+            self._sinks[partition].close()
+
+    def read(self, partition):
+        """Everything appended to one partition, or None"""
+        if partition not in self._writers:
+            return None
+        with pa.OSFile(self._paths[partition], 'rb') as source:
+            return pa.ipc.open_stream(source).read_all().to_pandas()
+
+
+def _concat(first, second):
+    """Rows of two frames with the same columns; a column missing throughout one side takes the other's dtype"""
+    first = first.astype({name: second[name].dtype for name in first.columns[first.isna().all().to_numpy()]})
+    second = second.astype({name: first[name].dtype for name in second.columns[second.isna().all().to_numpy()]})
+    return pd.concat([first, second], ignore_index=True)
+
+
+def _customer_partials(df):
+    """Per-customer sums of one chunk, and the overdue and disputed sums per (collector or biller, customer)"""
+    amounts = df['Invoice Amount'].fillna(0)
+    overdue = (df['Days overdue'] > 0).to_numpy(dtype=bool, na_value=False)
+    disputed = (df['Invoice Status'] == 'Disputed').to_numpy(dtype=bool, na_value=False)
+    measures = pd.DataFrame({
+        'Customer Name': df['Customer Name'],
+        'amount': amounts,
+        'overdue_amount': amounts.where(overdue, 0),
+        'overdue_count': overdue.astype('int64'),
+        'disputed_amount': amounts.where(disputed, 0),
+        'disputed_count': disputed.astype('int64'),
+    })
+    customers = measures.groupby('Customer Name', sort=False).sum().reset_index()
+
+    grouped = {}
+    for role, mask in (('collector', overdue), ('biller', disputed)):
+        column = PARTITION_COLUMNS[role]
+        rows = pd.DataFrame({'group': df[column].astype(object)[mask], 'Customer Name': df['Customer Name'][mask],
+                             'amount': amounts[mask]})
+        grouped[role] = rows.groupby(['group', 'Customer Name'], sort=False).sum().reset_index()
+    return customers, grouped
+
+
+def _top(frame, value, k, by=None):
+    """The ``k`` rows of largest ``value`` (per ``by`` group), ties broken by customer name as in memory"""
+    if by:
+        tops = [_top(group, value, k) for _, group in frame.groupby(by, sort=True)]
+        return pd.concat(tops) if tops else frame.iloc[:0]
+    # Only rows reaching the k-th largest value can rank; sorting by name is then cheap
+    values = frame[value].to_numpy(dtype='float64')
+    if len(values) > k:
+        frame = frame[values >= np.partition(values, len(values) - k)[len(values) - k]]
+    return frame.sort_values([value, 'Customer Name'], ascending=[False, True], kind='stable').head(k)
+
+
+def _as_series(frame, value):
+    return pd.Series(frame[value].to_numpy(dtype='float64'), index=pd.Index(frame['Customer Name'], dtype='str'))
+
+
+class StreamedAggregates(LedgerAggregates):
+    """Ledger aggregates built in chunks, without the ledger frame.
+
+    ``customers`` holds only the customers that rank in a dashboard, sorted
+    by name, so its top-k rankings equal those of the full table; the top
+    customers and worklists of the collector and biller views are kept per
+    name, with None for the view over the whole ledger.
+    """
+
+    def __init__(self, cube, disputes, customers, total_accounts, crosstabs, top_customers, worklists, rows):
+        super().__init__(cube, disputes, customers, None, total_accounts, None, crosstabs)
+        self.top_customers = top_customers
+        self.worklists = worklists
+        self.rows = rows
+
+
+def build_streamed_aggregates(path, memory_budget=DEFAULT_MEMORY_BUDGET):
+    """Aggregate the CSV or Parquet ledger at ``path`` in chunks within ``memory_budget`` (bytes or text like '256M')"""
+    budget = parse_budget(memory_budget)
+    columns, chunk, partitions = source_layout(path, budget)
+    spill_dir = tempfile.mkdtemp(prefix='ar-stream-', dir=SPILL_DIR)
+    try:
+        spills = {name: HashSpill(spill_dir, name, 'Customer Name', partitions)
+                  for name in ('customers', 'collector', 'biller')}
+        spills['accounts'] = HashSpill(spill_dir, 'accounts', 'Customer ID', partitions)
+
+        cells = {'cube': [], 'disputes': [], **{dimension: [] for dimension in AGGREGATE_CROSSTABS}}
+        worklists = {'collector': {}, 'biller': {}}
+        offset = 0
+        for df in iter_chunks(path, columns, chunk):
+            positions = np.arange(offset, offset + len(df))
+            offset += len(df)
+            cells['cube'].append(ar_cube_cells(df, positions))
+            cells['disputes'].append(dispute_cube_cells(df, positions))
+            for dimension in AGGREGATE_CROSSTABS:
+                cells[dimension].append(crosstab(df, dimension, positions=positions))
+            # Regrouping every chunk would re-add the whole cube each time; a few chunks' cells are folded at once
+            if len(cells['cube']) >= FOLD_CHUNKS:
+                cells = {name: [combine_cells(parts)] for name, parts in cells.items()}
+
+            # Collectors rank all their invoices, billers their disputed ones
+            disputed = (df['Invoice Status'] == 'Disputed').to_numpy(dtype=bool, na_value=False)
+            for role, mask in (('collector', None), ('biller', disputed)):
+                index = PartitionIndex.build(df, PARTITION_COLUMNS[role])
+                groups = {name: index.rows(name) if mask is None else index.rows(name)[mask[index.rows(name)]]
+                          for name in index.sizes()}
+                groups[None] = np.arange(len(df)) if mask is None else np.flatnonzero(mask)
+                for name, candidates in top_worklists(df, groups, WORKLIST_LENGTH).items():
+                    kept = worklists[role].get(name)
+                    merged = candidates if kept is None else _concat(kept, candidates)
+                    worklists[role][name] = top_worklist(merged.reset_index(drop=True), WORKLIST_LENGTH)
+
+            customers, grouped = _customer_partials(df)
+            spills['customers'].append(customers)
+            for role, frame in grouped.items():
+                spills[role].append(frame)
+            # As int64 whatever the chunk's dtype, so that an ID always hashes to the same partition
+            ids = pd.unique(df['Customer ID'].dropna()).astype('int64')
+            spills['accounts'].append(pd.DataFrame({'Customer ID': ids}))
+        for spill in spills.values():
+            spill.close()
+
+        # Per partition: whole sums for the customers hashed there, and the ones that could rank overall
+        total_accounts = 0
+        candidates = {'customers': [], 'collector': [], 'biller': []}
+        for partition in range(partitions):
+            ids = spills['accounts'].read(partition)
+            if ids is not None:
+                total_accounts += ids['Customer ID'].nunique()
+            frame = spills['customers'].read(partition)
+            if frame is not None:
+                sums = frame.groupby('Customer Name', sort=False).sum().reset_index()
+                candidates['customers'] += [
+                    _top(sums, 'amount', TOP_CUSTOMERS),
+                    _top(sums[sums['overdue_count'] > 0], 'overdue_amount', TOP_CUSTOMERS),
+                    _top(sums[sums['disputed_count'] > 0], 'disputed_amount', TOP_CUSTOMERS),
+                ]
+            for role in ('collector', 'biller'):
+                frame = spills[role].read(partition)
+                if frame is not None:
+                    sums = frame.groupby(['group', 'Customer Name'], sort=False).sum().reset_index()
+                    candidates[role].append(_top(sums, 'amount', TOP_CUSTOMERS, by='group'))
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    if not offset:
+        raise ValueError(f"No invoices in '{path}'")
+    customers = pd.concat(candidates['customers']).drop_duplicates('Customer Name')
+    overdue = _top(customers[customers['overdue_count'] > 0], 'overdue_amount', TOP_CUSTOMERS)
+    disputed = _top(customers[customers['disputed_count'] > 0], 'disputed_amount', TOP_CUSTOMERS)
+    ranked = pd.concat([_top(customers, 'amount', TOP_CUSTOMERS), overdue, disputed]).drop_duplicates('Customer Name')
+    top_customers = {'collector': {None: _as_series(overdue, 'overdue_amount')},
+                     'biller': {None: _as_series(disputed, 'disputed_amount')}}
+    for role in ('collector', 'biller'):
+        if candidates[role]:
+            ranked_groups = _top(pd.concat(candidates[role]), 'amount', TOP_CUSTOMERS, by='group')
+            for name, frame in ranked_groups.groupby('group', sort=False):
+                top_customers[role][name] = _as_series(frame, 'amount')
+
+    return StreamedAggregates(
+        cube=ARCube(merge_cells(cells['cube'])),
+        disputes=ARCube(merge_cells(cells['disputes'])),
+        customers=ranked.sort_values('Customer Name').set_index('Customer Name')[['amount', 'overdue_amount',
+                                                                               'overdue_count']],
+        total_accounts=total_accounts,
+        crosstabs={dimension: merge_cells(cells[dimension]) for dimension in AGGREGATE_CROSSTABS},
+        top_customers=top_customers,
+        worklists=worklists,
+        rows=offset,
+    )
+
+
+if __name__ == '__main__':
+    import argparse
+    import resource
+    import time
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--memory-budget', default=DEFAULT_MEMORY_BUDGET, help="e.g. '64M' or '2G'")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    aggregates = build_streamed_aggregates(args.path, args.memory_budget)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{aggregates.rows} rows in {elapsed:.2f} s, peak RSS {peak_mb:.0f} MB "
+          f"(budget {parse_budget(args.memory_budget) / (1 << 20):.0f} MB): {len(aggregates.cube)} cube cells, "
+          f"{aggregates.total_accounts} accounts")
@@ -0,0 +1,76 @@
+"""Year-aware monthly rollups of the AR ledger.
+
+Invoices are bucketed by the calendar month of 'Invoice month' (the full
+invoice date), so the same month in different years stays separate. All
+series for a date range come from one groupby over the cube's month cells.
+"""
+import pandas as pd
+
+from ar_aging import OVERDUE_SPLIT
+
+# Months shown by default, ending at the latest invoice month in the ledger
+DEFAULT_WINDOW_MONTHS = 12
+
+# Longest range a request may ask for (30 years), so one request cannot build and serialise an unbounded series
+MAX_RANGE_MONTHS = 360
+
+# Statuses that count as settled; everything else is still outstanding
+SETTLED_STATUSES = ('Current',)
+
+
+def invoice_period(df):
+    """Calendar month (a monthly Period) of each invoice"""
+    return df['Invoice month'].dt.to_period('M')
+
+
+def parse_month(text):
+    """Monthly Period from 'YYYY-MM' text"""
+    try:
+        return pd.Period(text, freq='M')
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid month '{text}', expected YYYY-MM")
+
+
+def month_range(cube, start=None, end=None, window=DEFAULT_WINDOW_MONTHS):
+    """Monthly periods from ``start`` to ``end`` inclusive.
+
+    A missing ``end`` is the latest invoice month in the cube and a missing
+    ``start`` is ``window`` months before it. Ranges longer than
+    ``MAX_RANGE_MONTHS`` are rejected.
+    """
+    if end is None:
+        months = cube.cells.index.get_level_values('month')
+        end = months.max() if len(months) else None
+        if end is None or pd.isnull(end):
+            end = pd.Timestamp.today().to_period('M')
+    if start is None:
+        start = end - (window - 1)
+    if start > end:
+        raise ValueError("The start month must not be after the end month")
+    if (end - start).n >= MAX_RANGE_MONTHS:
+        raise ValueError(f"The range must not span more than {MAX_RANGE_MONTHS} months")
+    return pd.period_range(start, end, freq='M')
+
+
+def monthly_rollup(cube, start=None, end=None, window=DEFAULT_WINDOW_MONTHS):
+    """Invoiced, outstanding and overdue 'Invoice Amount' per month of the range.
+
+    Returns a frame indexed by monthly Period with one row per month in the
+    range (zeros where nothing was invoiced).
+    """
+    periods = month_range(cube, start, end, window)
+    cells = cube.cells
+    amount = cells['amount']
+    outstanding = ~cells.index.get_level_values('status').isin(SETTLED_STATUSES)
+    overdue = cube.in_bucket(OVERDUE_SPLIT, 'overdue')
+    series = pd.DataFrame({
+        'invoiced': amount,
+        'outstanding': amount.where(outstanding, 0),
+        'overdue': amount.where(overdue, 0),
+    }).groupby(level='month').sum()
+    return series.reindex(periods, fill_value=0)
+
+
+def month_labels(periods):
+    """Chart labels such as 'Jan 2024'"""
+    return [period.strftime('%b %Y') for period in periods]
@@ -0,0 +1,314 @@
+"""Incremental invoice changes applied to the live snapshot and kept in an append log.
+
+A change removes the invoice's old contribution from every aggregate cell it
+touched and adds the new one, so sums, counts and bucket totals are updated
+in O(1) per change instead of being rebuilt from the ledger. A cell left
+without invoices is dropped and cells keep the order of their first ledger
+row, so the aggregates equal a rebuild of the changed ledger. New invoices
+are buffered on the snapshot and merged into the frame, in one copy, the
+next time it is read. Each change is appended to a JSON-lines log tagged
+with the workbook version it applies to; when that workbook is loaded again
+the log is replayed onto the frame before the aggregates are built.
+Regenerating the workbook starts a fresh history.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from ar_aging import OVERDUE_SPLIT
+from ar_crosstab import CROSSTAB_DIMENSIONS
+from ar_cube import CUBE_AGING, CUBE_DIMENSIONS, DISPUTE_DIMENSIONS, build_ledger_aggregates
+from ar_partition import PARTITION_COLUMNS, build_partition_indexes
+from ar_records import RECORD_KEY, RecordIndex
+from ar_schema import INT_KINDS, LEDGER_SCHEMA, add_categories, apply_schema
+
+# Local append log of invoice changes; override with AR_UPDATE_LOG
+DEFAULT_UPDATE_LOG = os.environ.get('AR_UPDATE_LOG', 'ar_updates.jsonl')
+
+# Fields a PATCH may change; identity and assignment columns are fixed
+EDITABLE_FIELDS = ('Invoice Amount', 'Days overdue', 'Invoice Status', 'Outcome Status', 'Root cause dropdown',
+                   'Dispute code L1', 'Dispute code L2', 'Dispute code L3', 'Assigned Responsible', 'Comments')
+
+# Fields a new invoice must provide
+REQUIRED_FIELDS = (RECORD_KEY, 'Customer Name', 'Customer ID', 'Collector Name', 'Biller Name',
+                   'Invoice Amount', 'Days overdue', 'Invoice Status', 'Invoice month')
+
+SCHEMA_KINDS = dict(LEDGER_SCHEMA)
+
+# Ledger rows compared at a time when looking for the row that now starts a cube cell
+SCAN_BLOCK_ROWS = 4096
+
+
+def _present(value):
+    return value is not None and not pd.isnull(value)
+
+
+def _coerce(fields):
+    """Cast JSON field values to the ledger schema, rejecting unknown columns"""
+    unknown = [name for name in fields if name not in SCHEMA_KINDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    row = apply_schema(pd.DataFrame([fields]))
+    for name, value in fields.items():
+        if (value is not None or SCHEMA_KINDS[name] in INT_KINDS) and pd.isnull(row.at[0, name]):
+            raise ValueError(f"Invalid value for '{name}': {value!r}")
+    return {name: row.at[0, name] for name in fields}
+
+
+def _append_rows(df, records):
+    """Frame with new invoice records appended, keeping column dtypes wherever the new values allow"""
+    rows = apply_schema(pd.DataFrame(records, columns=df.columns))
+    # Both sides share the categories so that the concatenated columns stay categorical
+    categorical = [column for column, dtype in df.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)]
+    df = df.assign(**{column: add_categories(df[column], rows[column].cat.categories) for column in categorical})
+    # Integer columns the new rows leave empty fall back to float
+    dtypes = {column: dtype for column, dtype in df.dtypes.items()
+              if not (pd.api.types.is_integer_dtype(dtype) and rows[column].isnull().any())}
+    return pd.concat([df, rows.astype(dtypes)], ignore_index=True)
+
+
+def _add(frame, key, deltas):
+    """Add ``deltas`` to one row of a frame keyed by a single index, appending the row if it is new"""
+    try:
+        position = frame.index.get_loc(key)
+    except KeyError:
+        row = pd.DataFrame({column: [deltas.get(column, 0)] for column in frame.columns},
+                           index=pd.Index([key], name=frame.index.name))
+        return pd.concat([frame, row.astype(frame.dtypes.to_dict())])
+    for column, delta in deltas.items():
+        frame.iat[position, frame.columns.get_loc(column)] += delta
+    return frame
+
+
+def _partition_rows(aggregates, df, name, value):
+    """Ascending ledger rows whose partition column holds ``value``, or is missing if ``value`` is"""
+    if _present(value):
+        return aggregates.partitions[name].rows(value)
+    return np.flatnonzero(df[PARTITION_COLUMNS[name]].isna().to_numpy())
+
+
+def _next_row(df, rows, after, keys, bucket, month=None):
+    """First of the ascending ledger ``rows`` after ``after`` that falls in a cube cell, or None.
+
+    ``keys`` maps each key column to the cell's value and the value a missing
+    entry is keyed by (None: missing entries form their own cell); ``month``
+    is the cell's invoice month when the cube is keyed by one. Rows are
+    compared a block at a time, so the scan stops soon after the first match.
+    """
+    rows = rows[np.searchsorted(rows, after, side='right'):]
+    for start in range(0, len(rows), SCAN_BLOCK_ROWS):
+        block = rows[start:start + SCAN_BLOCK_ROWS]
+        mask = CUBE_AGING.assign(df['Days overdue'].iloc[block]) == bucket
+        for column, (value, fill) in keys.items():
+            values = df[column].iloc[block]
+            if pd.isnull(value):
+                mask &= values.isna().to_numpy()
+                continue
+            matches = (values == value).to_numpy(dtype=bool, na_value=False)
+            mask &= (matches | values.isna().to_numpy()) if value == fill else matches
+        if month is not None:
+            periods = df['Invoice month'].iloc[block].dt.to_period('M')
+            mask &= (periods.isna() if pd.isnull(month) else periods == month).to_numpy(dtype=bool)
+        if mask.any():
+            return int(block[np.argmax(mask)])
+    return None
+
+
+class InvoiceUpdater:
+    """Applies invoice changes to a snapshot's frame and aggregates, logging each one"""
+
+    def __init__(self, log_path=None):
+        self.log_path = log_path or DEFAULT_UPDATE_LOG
+        # Held while a change is applied and while payloads are built, so readers never see half a change
+        self.lock = threading.RLock()
+
+    # Contribution of one invoice row to the aggregates
+
+    def _first(self, cube, key, sign, position, next_row):
+        """The ``first`` row of cube cell ``key`` once the row at ``position`` enters (``sign`` +1) or leaves it"""
+        first = cube.first_row(key)
+        if sign > 0:
+            return position if first is None else min(first, position)
+        # Only when the cell's first row leaves does the next one have to be found
+        return next_row() if first == position else None
+
+    def _apply_row(self, aggregates, row, sign, position, df=None):
+        """Add or remove the contribution of the ledger row at ``position``; removing a row needs the frame"""
+        amount = row['Invoice Amount'] if _present(row['Invoice Amount']) else 0.0
+        days = row['Days overdue']
+        bucket = CUBE_AGING.assign([days])[0]
+
+        measures = {
+            'amount': sign * amount, 'count': sign,
+            'days': sign * (int(days) if _present(days) else 0), 'days_count': sign * int(_present(days)),
+        }
+        month = pd.Period(row['Invoice month'], freq='M') if _present(row['Invoice month']) else pd.NaT
+        key = tuple(row[column] for column in CUBE_DIMENSIONS.values()) + (bucket, month)
+        first = self._first(aggregates.cube, key, sign, position, lambda: _next_row(
+            df, _partition_rows(aggregates, df, 'collector', row['Collector Name']), position,
+            {column: (row[column], None) for column in CUBE_DIMENSIONS.values()}, bucket, month))
+        aggregates.cube.add(key, measures, first)
+
+        if row['Invoice Status'] == 'Disputed':
+            keys = {column: (row[column] if _present(row[column]) or fill is None else fill, fill)
+                    for column, fill in DISPUTE_DIMENSIONS.values()}
+            key = tuple(value for value, _ in keys.values()) + (bucket,)
+            keys['Invoice Status'] = ('Disputed', None)
+            first = self._first(aggregates.disputes, key, sign, position, lambda: _next_row(
+                df, _partition_rows(aggregates, df, 'biller', row['Biller Name']), position, keys, bucket))
+            aggregates.disputes.add(key, measures, first)
+
+        overdue = _present(days) and days > 0
+        if _present(row['Customer Name']):
+            aggregates.customers = _add(aggregates.customers, row['Customer Name'], {
+                'amount': sign * amount,
+                'overdue_amount': sign * amount if overdue else 0.0,
+                'overdue_count': sign * int(overdue),
+            })
+
+        split = OVERDUE_SPLIT.assign([days])[0]
+        for dimension, table in aggregates.crosstabs.items():
+            value = row[CROSSTAB_DIMENSIONS[dimension]]
+            if _present(value) and split >= 0:
+                aggregates.crosstabs[dimension] = _add(table, value, {OVERDUE_SPLIT.labels[split]: sign * amount})
+
+    # Changes
+
+    def _position(self, snapshot, invoice_number):
+        if snapshot.is_appended(invoice_number):
+            # Reading the frame merges the buffered rows, so the record index covers this one
+            snapshot.df
+        index = snapshot.derived('record_index', RecordIndex)
+        i = np.searchsorted(index.sorted_keys, invoice_number)
+        if i >= len(index.sorted_keys) or index.sorted_keys[i] != invoice_number:
+            raise KeyError(invoice_number)
+        return index.order[i]
+
+    def _update_fields(self, snapshot, invoice_number, fields, aggregates):
+        position = self._position(snapshot, invoice_number)
+        df = snapshot.df
+        if aggregates is not None:
+            self._apply_row(aggregates, df.iloc[position], -1, position, df)
+        for name, value in fields.items():
+            if isinstance(df[name].dtype, pd.CategoricalDtype) and _present(value):
+                df[name] = add_categories(df[name], [value])
+            df.iat[position, df.columns.get_loc(name)] = value
+        row = df.iloc[position]
+        if aggregates is not None:
+            self._apply_row(aggregates, row, +1, position)
+        return row
+
+    def _merge_created(self, snapshot, aggregates):
+        """``merge(df, records)`` for rows buffered by ``_create_row``: appends them and re-indexes the frame"""
+        def merge(df, records):
+            df = _append_rows(df, records)
+            aggregates.partitions = build_partition_indexes(df)
+            customers, codes = aggregates.customers, aggregates.customer_codes
+            if not customers.index.is_monotonic_increasing:
+                # New customers were added at the end; a rebuild lists them by name
+                aggregates.customers = customers.sort_index()
+                mapping = aggregates.customers.index.get_indexer(customers.index)
+                codes = np.where(codes >= 0, mapping[codes], -1)
+            aggregates.customer_codes = np.append(
+                codes, aggregates.customers.index.get_indexer(df['Customer Name'].iloc[len(codes):]))
+            snapshot.invalidate('record_index')
+            return df
+        return merge
+
+    def _create_row(self, snapshot, fields, aggregates):
+        key = int(fields[RECORD_KEY])
+        customer_ids = snapshot.derived('customer_ids', lambda df: set(df['Customer ID'].dropna().tolist()))
+        aggregates.total_accounts += int(fields['Customer ID'] not in customer_ids)
+        customer_ids.add(fields['Customer ID'])
+        # A frame cannot grow in place, so new rows are buffered and merged in one copy when the frame is next read
+        position = snapshot.size
+        snapshot.append(key, fields, self._merge_created(snapshot, aggregates))
+        row = pd.Series({name: fields.get(name, np.nan) for name, _ in LEDGER_SCHEMA}, name=position)
+        self._apply_row(aggregates, row, +1, position)
+        return row
+
+    def _commit(self, snapshot, change, values):
+        """Append a validated change to the log, then apply it to the live snapshot.
+
+        A change the log could not record is never applied, and one that was
+        applied, even in part, always moves the snapshot's version on.
+        """
+        aggregates = snapshot.derived('aggregates', build_ledger_aggregates)
+        entry = dict(change, version=snapshot.base_version, at=datetime.now().isoformat(timespec='seconds'))
+        with open(self.log_path, 'a', encoding='utf-8') as fh:
+            fh.write(json.dumps(entry) + '\n')
+            fh.flush()
+            os.fsync(fh.fileno())
+        # A read of ``df`` by a request outside ``self.lock`` may merge created rows, which re-indexes the aggregates
+        with snapshot.lock:
+            try:
+                if change['op'] == 'create':
+                    return self._create_row(snapshot, values, aggregates)
+                return self._update_fields(snapshot, change['invoice'], values, aggregates)
+            finally:
+                aggregates.cube.flush()
+                aggregates.disputes.flush()
+                snapshot.invalidate('memory_bytes')
+                snapshot.revision += 1
+
+    def create(self, snapshot, fields):
+        """Add a new invoice; returns its ledger row"""
+        missing = [name for name in REQUIRED_FIELDS if not _present(fields.get(name))]
+        if missing:
+            raise ValueError(f"Missing fields: {', '.join(missing)}")
+        values = _coerce(fields)
+        with self.lock:
+            try:
+                self._position(snapshot, int(values[RECORD_KEY]))
+            except KeyError:
+                pass
+            else:
+                raise ValueError(f"Invoice {values[RECORD_KEY]} already exists")
+            return self._commit(snapshot, {'op': 'create', 'invoice': int(values[RECORD_KEY]), 'fields': fields},
+                                values)
+
+    def update(self, snapshot, invoice_number, fields):
+        """Change editable fields of an invoice; returns its ledger row"""
+        fixed = [name for name in fields if name not in EDITABLE_FIELDS]
+        if fixed:
+            raise ValueError(f"Fields cannot be changed: {', '.join(fixed)}")
+        values = _coerce(fields)
+        with self.lock:
+            self._position(snapshot, invoice_number)
+            return self._commit(snapshot, {'op': 'update', 'invoice': invoice_number, 'fields': fields}, values)
+
+    def record_payment(self, snapshot, invoice_number, amount):
+        """Reduce an invoice's open amount by a payment; returns its ledger row"""
+        amount = float(amount)
+        with self.lock:
+            position = self._position(snapshot, invoice_number)
+            open_amount = float(snapshot.df['Invoice Amount'].iat[position])
+            if not 0 < amount <= open_amount:
+                raise ValueError(f"Payment must be positive and at most the open amount {open_amount}")
+            # Logged as the resulting amount so replay does not depend on float accumulation order
+            fields = {'Invoice Amount': open_amount - amount}
+            return self._commit(snapshot, {'op': 'payment', 'invoice': invoice_number, 'amount': amount,
+                                           'fields': fields}, fields)
+
+    def replay(self, snapshot):
+        """Re-apply the logged changes for this snapshot's workbook version; returns how many were applied"""
+        try:
+            with open(self.log_path, encoding='utf-8') as fh:
+                changes = [json.loads(line) for line in fh if line.strip()]
+        except FileNotFoundError:
+            return 0
+        changes = [change for change in changes if change.get('version') == snapshot.base_version]
+        creates = [change['fields'] for change in changes if change['op'] == 'create']
+        if creates:
+            # One append for all new invoices, before the changes that may refer to them
+            snapshot.df = _append_rows(snapshot.df, creates)
+            snapshot.invalidate('record_index')
+        for change in changes:
+            if change['op'] != 'create':
+                self._update_fields(snapshot, change['invoice'], _coerce(change['fields']), None)
+        snapshot.revision += len(changes)
+        return len(changes)
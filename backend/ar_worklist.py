@@ -0,0 +1,139 @@
+"""Top-k worklist selection with keyset pagination.
+
+Invoices are ordered by a list of sort keys (by default most days overdue,
+then largest amount) with 'Invoice number' as the final tie-breaker, so the
+order is total and a page can resume from the last row of the previous one.
+A page selects its rows with a partial partition instead of a full sort:
+O(n) to find the candidates plus O(k log k) to order them.
+"""
+import base64
+import json
+
+import numpy as np
+import pandas as pd
+
+from ar_records import RECORD_KEY
+
+# Sort key name -> (ledger column, direction)
+WORKLIST_SORT_KEYS = {
+    'days': ('Days overdue', 'desc'),
+    'amount': ('Invoice Amount', 'desc'),
+    # 'Due month' holds the full MM/DD/YYYY due date
+    'due': ('Due month', 'asc'),
+}
+DEFAULT_SORT = ('days', 'amount')
+
+COLLECTOR_WORKLIST_COLUMNS = ['Customer Name', 'Invoice number', 'Invoice Amount', 'Invoice due date',
+                              'Days overdue', 'Invoice Status']
+BILLER_WORKLIST_COLUMNS = COLLECTOR_WORKLIST_COLUMNS + ['Dispute code L1', 'Root cause dropdown', 'Outcome Status']
+
+
+def parse_sort(spec):
+    """Sort key names from a comma-separated spec such as 'days,amount'"""
+    if not spec:
+        return DEFAULT_SORT
+    names = tuple(name.strip() for name in spec.split(',') if name.strip())
+    unknown = [name for name in names if name not in WORKLIST_SORT_KEYS]
+    if unknown:
+        raise ValueError(f"Unknown sort keys: {', '.join(unknown)}. Choose from: {', '.join(WORKLIST_SORT_KEYS)}")
+    return names
+
+
+def _date_key(values):
+    """Days since epoch for MM/DD/YYYY text or datetimes, parsing each distinct value once"""
+    codes, uniques = pd.factorize(values)
+    dates = pd.Series(uniques)
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format='%m/%d/%Y', errors='coerce')
+    days = (dates - pd.Timestamp(0)).dt.days.to_numpy(dtype='float64')
+    return np.append(days, np.nan)[codes]
+
+
+def _ascending_keys(df, sort):
+    """One float array per sort key, transformed so that ascending order is the worklist order"""
+    keys = []
+    for name in sort:
+        column, direction = WORKLIST_SORT_KEYS[name]
+        values = _date_key(df[column]) if name == 'due' else df[column].to_numpy(dtype='float64')
+        if direction == 'desc':
+            values = -values
+        # Missing values go last
+        keys.append(np.where(np.isnan(values), np.inf, values))
+    keys.append(df[RECORD_KEY].to_numpy(dtype='float64'))
+    return keys
+
+
+def _after_cursor(keys, cursor):
+    """Mask of rows strictly after the cursor in lexicographic key order"""
+    after = np.zeros(len(keys[0]), dtype=bool)
+    equal = np.ones(len(keys[0]), dtype=bool)
+    for key, value in zip(keys, cursor):
+        after |= equal & (key > value)
+        equal &= key == value
+    return after
+
+
+def _top_k(keys, candidates, k):
+    """First k candidate positions in key order, without sorting all candidates"""
+    primary = keys[0][candidates]
+    if len(candidates) > k:
+        threshold = np.partition(primary, k - 1)[k - 1]
+        candidates = candidates[primary <= threshold]
+    order = np.lexsort([key[candidates] for key in reversed(keys)])
+    return candidates[order[:k]]
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        return [float(value) for value in json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))]
+    except (ValueError, TypeError):
+        raise ValueError("Invalid worklist cursor")
+
+
+def worklist_positions(df, limit, cursor=None, sort=DEFAULT_SORT):
+    """Row positions in ``df`` of one worklist page and the cursor of the next page (None at the end)"""
+    keys = _ascending_keys(df, sort)
+    candidates = np.arange(len(df))
+    if cursor is not None:
+        values = decode_cursor(cursor)
+        if len(values) != len(keys):
+            raise ValueError("Worklist cursor does not match the sort keys")
+        candidates = np.flatnonzero(_after_cursor(keys, values))
+
+    positions = _top_k(keys, candidates, limit) if limit > 0 else candidates[:0]
+    next_cursor = None
+    if len(positions) and len(positions) < len(candidates):
+        last = positions[-1]
+        next_cursor = encode_cursor([key[last].item() for key in keys])
+    return positions, next_cursor
+
+
+def worklist_page(df, limit, cursor=None, sort=DEFAULT_SORT):
+    """Rows of ``df`` for one worklist page and the cursor of the next page (None at the end)"""
+    positions, next_cursor = worklist_positions(df, limit, cursor, sort)
+    return df.iloc[positions], next_cursor
+
+
+def top_worklist(df, k, sort=DEFAULT_SORT, rows=None):
+    """First k rows of ``df``, or of its rows at positions ``rows``, in worklist order"""
+    if rows is None:
+        return worklist_page(df, k, sort=sort)[0]
+    # Rank on the sort key columns alone and take the full rows of the winners only
+    columns = [WORKLIST_SORT_KEYS[name][0] for name in sort] + [RECORD_KEY]
+    positions, _ = worklist_positions(df[columns].iloc[rows], k, sort=sort)
+    return df.iloc[rows[positions]]
+
+
+def top_worklists(df, groups, k, sort=DEFAULT_SORT):
+    """``top_worklist`` of every group in ``groups`` (name -> row positions), computing the sort keys once"""
+    keys = _ascending_keys(df, sort)
+    winners = [rows[_top_k([key[rows] for key in keys], np.arange(len(rows)), k)] if k > 0 else rows[:0]
+               for rows in groups.values()]
+    # One take of the full rows for all groups
+    taken = df.iloc[np.concatenate(winners)] if winners else df.iloc[:0]
+    bounds = np.cumsum([0] + [len(rows) for rows in winners])
+    return {name: taken.iloc[start:end] for name, start, end in zip(groups, bounds[:-1], bounds[1:])}
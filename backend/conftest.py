@@ -0,0 +1,51 @@
+"""Shared pytest setup: the API's history and update log go to a scratch directory, not the working tree."""
+import math
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Small workbook checked into the repo (150 invoices)
+SAMPLE_WORKBOOK = Path(__file__).with_name('AR_Model_Dummy_Data.xlsx')
+
+# Scratch directory of the session; the Arrow artifact is not tracked, so it is built here from the workbook
+SCRATCH = Path(tempfile.mkdtemp(prefix='ar-tests-'))
+SAMPLE_LEDGER = SCRATCH / 'AR_Model_Dummy_Data.arrow'
+
+# Dashboards rendered without a name
+ROLES = ('admin', 'manager', 'collectors', 'billers', 'collector', 'biller')
+
+
+def pytest_configure(config):
+    from ar_ingest import ingest_workbook
+
+    ingest_workbook(str(SAMPLE_WORKBOOK), str(SAMPLE_LEDGER))
+    # Before any test module imports ar_backend, which creates its stores from these
+    os.environ.setdefault('AR_DATA_PATH', str(SAMPLE_LEDGER))
+    os.environ.setdefault('AR_HISTORY_DIR', str(SCRATCH / 'history'))
+    os.environ.setdefault('AR_UPDATE_LOG', str(SCRATCH / 'updates.jsonl'))
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(SCRATCH, ignore_errors=True)
+
+
+@pytest.fixture
+def ledger():
+    """A fresh copy of the sample ledger, loaded as the API loads it"""
+    from ar_backend import load_ar_frame
+
+    return load_ar_frame(str(SAMPLE_LEDGER))
+
+
+def rounded(value):
+    """JSON value with floats rounded to 9 significant digits, for builds that add sums in a different order"""
+    if isinstance(value, dict):
+        return {key: rounded(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [rounded(item) for item in value]
+    if isinstance(value, float):
+        return None if math.isnan(value) else float(f'{value:.9g}')
+    return value
@@ -1,178 +1,291 @@
-import pandas as pd
+"""Generate a synthetic AR ledger with the columns the backend expects.
+
+Usage: python generate_ar_data.py [--rows N] [--output FILE] [--seed S] [--workers W] [--chunk-rows C]
+
+The output format follows the file extension: .xlsx (up to about 1M rows),
+.csv, .parquet or .arrow (Arrow IPC, loadable directly via AR_DATA_PATH).
+Rows are generated with NumPy in chunks; each chunk has its own seeded random
+stream, so the output depends only on the seed and not on the number of
+worker processes, and memory stays bounded by the chunk size.
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
 import numpy as np
-import random
-from faker import Faker
-from datetime import datetime, timedelta
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv
 
-# Initialize Faker to generate realistic fake data
-fake = Faker()
+from ar_ingest import ledger_schema
+from ar_schema import DATE_FORMATS
 
 # Configuration
-num_rows = 150
-output_filename = 'AR_Model_Dummy_Data.xlsx'
-start_date = datetime(2023, 1, 1)
-end_date = datetime.now()
+DEFAULT_ROWS = 150
+DEFAULT_OUTPUT = 'AR_Model_Dummy_Data.xlsx'
+DEFAULT_CHUNK_ROWS = 500_000
+XLSX_MAX_ROWS = 1_048_575
+START_DATE = date(2023, 1, 1)
+FIRST_CUSTOMER_ID = 11001
+FIRST_INVOICE_NUMBER = 170501275
 
 # Possible values for categorical columns
-customer_types = ['Commercial', 'Government', 'Small Business', 'Enterprise']
-customer_terms = ['NET 15', 'NET 30', 'NET 60', 'NET 90']
-collector_names = [fake.first_name_female() for _ in range(5)] # Example: 5 collectors
-biller_names = [fake.first_name_male() for _ in range(3)] # Example: 3 billers
-client_directors = [fake.name() for _ in range(2)] # Example: 2 directors
-statuses = ['Pending', 'Paid', 'Disputed', 'Overdue', 'Write-off']
-root_causes = ['Billing Error', 'Customer Dispute', 'Late Payment', 'Internal Delay', 'None']
-outcome_statuses = ['Resolved', 'Pending Investigation', 'Escalated', 'Closed']
-assigned_responsibles = ['Biller', 'Collector', 'Director', 'Manager']
-dispute_codes = ['DC01', 'DC02', 'DC03', 'DC04', 'NA']
-
-# --- Data Generation ---
-data = []
-current_customer_id = 11001
-current_invoice_number_base = 170501275
-
-for i in range(num_rows):
-    customer_name = fake.company()
-    customer_id = current_customer_id + i
-    invoice_number = current_invoice_number_base + i
-    collector_name = random.choice(collector_names)
-    biller_name = random.choice(biller_names)
-    client_director = random.choice(client_directors)
-
-    # Generate dates
-    invoice_date = fake.date_between(start_date=start_date, end_date=end_date)
-    term_str = random.choice(customer_terms)
-    term_days = int(term_str.split(' ')[1]) if 'NET' in term_str else 30 # Default if format unknown
-    due_date = invoice_date + timedelta(days=term_days)
-
-    invoice_amount = round(random.uniform(500, 50000), 2)
-    customer_type = random.choice(customer_types)
-
-    # --- Calculated/Derived Fields (Simplified Simulation) ---
-    calculated_terms = term_days # Simplified
-    weighted_calculated_terms = calculated_terms * invoice_amount # Simplified
-
-    today = datetime.now().date()
-    days_overdue = (today - due_date).days if today > due_date else 0
-
-    # Simplified overdue bucket logic (based on screenshot hints)
-    if days_overdue <= 0:
-        overdue_bucket = "Current"
-        weighted_overdue_amount = 0
-    elif days_overdue <= 30:
-        overdue_bucket = "0-30"
-        weighted_overdue_amount = invoice_amount # Simplified weight
-    elif days_overdue <= 60:
-        overdue_bucket = "31-60"
-        weighted_overdue_amount = invoice_amount * 1.1 # Example weighting
-    elif days_overdue <= 90:
-        overdue_bucket = "61-90"
-        weighted_overdue_amount = invoice_amount * 1.2
-    elif days_overdue <= 120:
-        overdue_bucket = "91-120"
-        weighted_overdue_amount = invoice_amount * 1.3
-    else:
-        overdue_bucket = "120+"
-        weighted_overdue_amount = invoice_amount * 1.4
-
-    weighted_avg_overdue_days = days_overdue # Simplification
-
-    # Determine Status based on overdue days
-    if days_overdue <= 0 and random.random() < 0.2: # Small chance current invoices are paid
-        invoice_status = "Paid"
-    elif days_overdue <= 0:
-        invoice_status = "Current"
-    elif random.random() < 0.05: # Small chance overdue are paid
-         invoice_status = "Paid"
-    elif random.random() < 0.1:
-         invoice_status = "Disputed"
-    else:
-        invoice_status = f"Overdue {overdue_bucket}"
-
-
-    dispute_code_l1 = random.choice(dispute_codes) if invoice_status == "Disputed" else "NA"
-    dispute_code_l2 = random.choice(dispute_codes) if invoice_status == "Disputed" and random.random() > 0.5 else "NA"
-    dispute_code_l3 = random.choice(dispute_codes) if invoice_status == "Disputed" and random.random() > 0.8 else "NA"
-
-    assigned_responsible = random.choice(assigned_responsibles)
-    root_cause = random.choice(root_causes) if invoice_status not in ["Paid", "Current"] else "None"
-    outcome_status = random.choice(outcome_statuses) if invoice_status not in ["Paid", "Current"] else "N/A"
-    comments = fake.sentence(nb_words=6) if random.random() > 0.7 else ""
-
-    # Date parts
-    invoice_day_of_month = invoice_date.day
-    invoice_day_of_week = invoice_date.strftime('%A')
-    invoice_month = invoice_date.strftime('%m/%d/%Y') # Assuming MM/DD/YYYY format like screenshot
-    due_day_of_month = due_date.day
-    due_day_of_week = due_date.strftime('%A')
-    due_month = due_date.strftime('%m/%d/%Y') # Assuming MM/DD/YYYY format
-
-
-    data.append({
-        'Customer Name': customer_name,
-        'Customer ID': customer_id,
-        'Invoice number': invoice_number,
-        'Collector Name': collector_name,
-        'Biller Name': biller_name,
-        'Client Director': client_director,
-        'Invoice date': invoice_date.strftime('%d-%b'), # Format like '10-Jan'
-        'Invoice due date': due_date.strftime('%d-%b'), # Format like '25-Jan'
+CUSTOMER_TYPES = ['Commercial', 'Government', 'Small Business', 'Enterprise']
+TERM_DAYS = [15, 30, 60, 90]
+COLLECTOR_NAMES = ['Vanessa', 'Suzanne', 'Theresa', 'Melissa', 'Angela']
+BILLER_NAMES = ['James', 'Phillip', 'Cameron']
+CLIENT_DIRECTORS = ['Laura Bennett', 'Michael Ortiz']
+ROOT_CAUSES = ['Billing Error', 'Customer Dispute', 'Late Payment', 'Internal Delay', 'None']
+OUTCOME_STATUSES = ['Resolved', 'Pending Investigation', 'Escalated', 'Closed']
+ASSIGNED_RESPONSIBLES = ['Biller', 'Collector', 'Director', 'Manager']
+DISPUTE_CODES = ['DC01', 'DC02', 'DC03', 'DC04', 'NA']
+
+# Overdue buckets: inclusive upper bounds on days overdue, labels and amount weights
+BUCKET_BOUNDS = [0, 30, 60, 90, 120]
+BUCKET_LABELS = ['Current', '0-30', '31-60', '61-90', '91-120', '120+']
+BUCKET_WEIGHTS = [0.0, 1.0, 1.1, 1.2, 1.3, 1.4]
+
+# Word pools for customer names and comments
+SURNAMES = ['Anderson', 'Baker', 'Chambers', 'Douglas', 'Ellis', 'Fischer', 'Garcia', 'Harper', 'Ingram', 'Jensen',
+            'King', 'Lopez', 'Morgan', 'Newman', 'Ortega', 'Parker', 'Quinn', 'Russell', 'Schmidt', 'Turner',
+            'Underwood', 'Vaughn', 'Walsh', 'Xu', 'Young', 'Zimmerman', 'Atkins', 'Howell', 'Day', 'Reed']
+COMPANY_SUFFIXES = ['Group', 'LLC', 'Inc', 'PLC', 'Industries', 'Holdings', 'Partners', 'Ltd']
+COMMENT_WORDS = ['customer', 'invoice', 'payment', 'promised', 'follow', 'up', 'next', 'week', 'credit', 'note',
+                 'requested', 'copy', 'approved', 'pending', 'review', 'remittance', 'sent', 'contact']
+
+
+def _take(pool, indices):
+    """Arrow string array of ``pool[indices]``"""
+    return pc.take(pa.array(pool, type=pa.string()), pa.array(indices))
+
+
+def _categorical(pool, indices):
+    """Dictionary-encoded ``pool[indices]``; the dictionary is the sorted distinct pool, the same in every chunk"""
+    uniques, inverse = np.unique(np.asarray(pool, dtype=object), return_inverse=True)
+    return pa.DictionaryArray.from_arrays(pa.array(inverse[indices].astype('int32')), pa.array(uniques, type=pa.string()))
+
+
+def customer_names(ids):
+    """Company name for each customer index, e.g. 'Baker, Quinn and Xu Group'; unique per index"""
+    n, m = len(SURNAMES), len(COMPANY_SUFFIXES)
+    period = n * n * n * m
+    # Scramble the index (7919 is coprime with the period) so neighbouring ids look unrelated
+    code = (ids * 7919 + 104729) % period
+    first, second, third = _take(SURNAMES, code % n), _take(SURNAMES, code // n % n), _take(SURNAMES, code // (n * n) % n)
+    suffix = _take(COMPANY_SUFFIXES, code // (n * n * n))
+    names = pc.if_else(pa.array(ids % 2 == 0),
+                       pc.binary_join_element_wise(first, ', ', second, ' and ', third, ' ', suffix, ''),
+                       pc.binary_join_element_wise(first, '-', second, ' ', third, ' ', suffix, ''))
+    if ids[-1] < period:
+        return names
+    # Number the repeats once every combination is used
+    repeat = pc.cast(pa.array(ids // period + 1), pa.string())
+    return pc.if_else(pa.array(ids >= period), pc.binary_join_element_wise(names, repeat, ' '), names)
+
+
+def comment_pool(rng, size=200):
+    """Precomputed six-word sentences to draw comments from"""
+    picks = rng.integers(len(COMMENT_WORDS), size=(size, 6))
+    return [' '.join(COMMENT_WORDS[i] for i in row).capitalize() + '.' for row in picks]
+
+
+def day_tables(start, days):
+    """Text renderings of every date in [start, start + days), indexed by day offset"""
+    dates = pd.date_range(start, periods=days, freq='D')
+    return {
+        'day_month': list(dates.strftime('%d-%b')),
+        'weekday': list(dates.strftime('%A')),
+        'day': dates.day.to_numpy(dtype='int64'),
+    }
+
+
+def generate_chunk(seed, chunk_index, start_row, rows, customers, as_of):
+    """One chunk of the ledger as an Arrow table with the ledger schema.
+
+    Category columns are dictionary encoded against their sorted pools, other
+    strings are gathered with ``take`` and dates are built as date32, so no
+    per-row Python objects are created.
+    """
+    rng = np.random.default_rng([seed, chunk_index])
+    span = (as_of - START_DATE).days + 1
+    tables = day_tables(START_DATE, span + max(TERM_DAYS))
+    row_ids = np.arange(start_row, start_row + rows)
+
+    # Customers: one per invoice unless a smaller pool is requested
+    customer_ids = row_ids if customers >= row_ids[-1] + 1 else rng.integers(customers, size=rows)
+
+    # Dates, as day offsets from START_DATE
+    invoice_offset = rng.integers(span, size=rows)
+    term_index = rng.integers(len(TERM_DAYS), size=rows)
+    term_days = np.array(TERM_DAYS)[term_index]
+    due_offset = invoice_offset + term_days
+    days_overdue = np.maximum(span - 1 - due_offset, 0)
+
+    invoice_amount = np.round(rng.uniform(500, 50000, size=rows), 2)
+
+    bucket = np.searchsorted(BUCKET_BOUNDS, days_overdue, side='left')
+    weighted_overdue_amount = invoice_amount * np.array(BUCKET_WEIGHTS)[bucket]
+
+    # Status: some current invoices are paid; overdue ones are paid, disputed or overdue by bucket
+    statuses = ['Paid', 'Current', 'Disputed'] + [f"Overdue {label}" for label in BUCKET_LABELS]
+    u_paid, u_disputed = rng.random(rows), rng.random(rows)
+    current = days_overdue <= 0
+    status = np.where(current, np.where(u_paid < 0.2, 0, 1),
+                      np.where(u_paid < 0.05, 0, np.where(u_disputed < 0.1, 2, 3 + bucket)))
+    disputed = status == 2
+    open_invoice = status >= 2
+
+    # 'NA', 'None' and 'N/A' are the last entries of their pools
+    na_code = DISPUTE_CODES.index('NA')
+    dispute_code_l1 = np.where(disputed, rng.integers(len(DISPUTE_CODES), size=rows), na_code)
+    dispute_code_l2 = np.where(disputed & (rng.random(rows) > 0.5), rng.integers(len(DISPUTE_CODES), size=rows), na_code)
+    dispute_code_l3 = np.where(disputed & (rng.random(rows) > 0.8), rng.integers(len(DISPUTE_CODES), size=rows), na_code)
+    root_cause = np.where(open_invoice, rng.integers(len(ROOT_CAUSES), size=rows), ROOT_CAUSES.index('None'))
+    outcome = np.where(open_invoice, rng.integers(len(OUTCOME_STATUSES), size=rows), len(OUTCOME_STATUSES))
+    comments = comment_pool(rng) + ['']
+    comment = np.where(rng.random(rows) > 0.7, rng.integers(len(comments) - 1, size=rows), len(comments) - 1)
+
+    def choice(values):
+        return _categorical(values, rng.integers(len(values), size=rows))
+
+    start_day = (START_DATE - date(1970, 1, 1)).days
+    invoice_days = pa.array((start_day + invoice_offset).astype('int32')).cast(pa.date32())
+    due_days = pa.array((start_day + due_offset).astype('int32')).cast(pa.date32())
+    columns = {
+        'Customer Name': customer_names(customer_ids),
+        'Customer ID': FIRST_CUSTOMER_ID + customer_ids,
+        'Invoice number': FIRST_INVOICE_NUMBER + row_ids,
+        'Collector Name': choice(COLLECTOR_NAMES),
+        'Biller Name': choice(BILLER_NAMES),
+        'Client Director': choice(CLIENT_DIRECTORS),
+        'Invoice date': _categorical(tables['day_month'], invoice_offset),
+        'Invoice due date': _categorical(tables['day_month'], due_offset),
         'Invoice Amount': invoice_amount,
-        'Customer terms': term_str,
-        'Customer type': customer_type,
-        'Calculated terms': calculated_terms,
-        'Weighted calculated terms': weighted_calculated_terms,
+        'Customer terms': _categorical([f"NET {days}" for days in TERM_DAYS], term_index),
+        'Customer type': choice(CUSTOMER_TYPES),
+        'Calculated terms': term_days,
+        'Weighted calculated terms': term_days * invoice_amount,
         'Days overdue': days_overdue,
-        'Weighted Overdue Amount': weighted_overdue_amount, # Assuming this maps to 'Weighted Overdue Bucket' value
-        'Weighted Overdue Bucket': overdue_bucket, # Adding the bucket description
-        'Weighted Average Overdue days (Customer)': weighted_avg_overdue_days, # Simplified - Placeholder
-        'Weighted Average Overdue days (Collector)': weighted_avg_overdue_days, # Simplified - Placeholder
-        'Weighted Average Overdue days (Biller)': weighted_avg_overdue_days, # Simplified - Placeholder
-        'Invoice Status': invoice_status, # Mapping to 'Status' column T?
-        'Dispute code L1': dispute_code_l1, # Mapping to col U
-        'Dispute code L2': dispute_code_l2, # Mapping to col V
-        'Dispute code L3': dispute_code_l3, # Mapping to col W
-        'Assigned Responsible': assigned_responsible, # Mapping to col X
-        'Root cause dropdown': root_cause, # Mapping to col Y
-        'Outcome Status': outcome_status, # Mapping to col Z
-        'Comments': comments, # Mapping to col AA
-        'Invoice day of month': invoice_day_of_month, # Mapping to col AB
-        'Invoice day of month Dup': invoice_day_of_month, # Duplicate? Assuming based on screenshot (AC)
-        'Due day of month': due_day_of_month, # Mapping to AD
-        'Invoice day of week': invoice_day_of_week, # Mapping to AE
-        'Due day of week': due_day_of_week, # Mapping to AF
-        'Invoice month': invoice_month, # Mapping to AG
-        'Due month': due_month # Mapping to AH
-        # Add other columns from screenshots if needed, generating appropriate dummy data
-    })
-
-# Create DataFrame
-df = pd.DataFrame(data)
-
-# Reorder columns to roughly match screenshots (adjust as needed)
-# This is based on visual inspection and might need refinement
-column_order = [
-    'Customer Name', 'Customer ID', 'Invoice number', 'Collector Name', 'Biller Name', 'Client Director', # A-F
-    'Invoice date', 'Invoice due date', 'Invoice Amount', 'Customer terms', 'Customer type', # G-K
-    'Calculated terms', 'Weighted calculated terms', # L-M
-    'Days overdue', 'Weighted Overdue Amount', 'Weighted Overdue Bucket', # N-P (Mapping Amount to O)
-    'Weighted Average Overdue days (Customer)', 'Weighted Average Overdue days (Collector)', 'Weighted Average Overdue days (Biller)', # Q-S (Using simplified days for now)
-    'Invoice Status', # T
-    'Dispute code L1', 'Dispute code L2', 'Dispute code L3', # U-W
-    'Assigned Responsible', 'Root cause dropdown', 'Outcome Status', 'Comments', # X-AA
-    'Invoice day of month', 'Invoice day of month Dup', 'Due day of month', # AB-AD
-    'Invoice day of week', 'Due day of week', 'Invoice month', 'Due month' # AE-AH
-]
-# Add any missing columns generated that aren't in the desired order yet
-# This ensures all generated data is included, even if the order isn't perfect
-existing_columns = df.columns.tolist()
-final_columns = column_order + [col for col in existing_columns if col not in column_order]
-df = df[final_columns]
-
-
-# --- Save to Excel ---
-try:
-    df.to_excel(output_filename, index=False, engine='openpyxl')
-    print(f"Successfully generated dummy data in '{output_filename}' with {len(df)} rows.")
-except Exception as e:
-    print(f"Error saving file: {e}")
-    print("Make sure the file is not open elsewhere and you have permissions to write here.") 
+        'Weighted Overdue Amount': weighted_overdue_amount,
+        'Weighted Overdue Bucket': _categorical(BUCKET_LABELS, bucket),
+        'Weighted Average Overdue days (Customer)': days_overdue,
+        'Weighted Average Overdue days (Collector)': days_overdue,
+        'Weighted Average Overdue days (Biller)': days_overdue,
+        'Invoice Status': _categorical(statuses, status),
+        'Dispute code L1': _categorical(DISPUTE_CODES, dispute_code_l1),
+        'Dispute code L2': _categorical(DISPUTE_CODES, dispute_code_l2),
+        'Dispute code L3': _categorical(DISPUTE_CODES, dispute_code_l3),
+        'Assigned Responsible': choice(ASSIGNED_RESPONSIBLES),
+        'Root cause dropdown': _categorical(ROOT_CAUSES, root_cause),
+        'Outcome Status': _categorical(OUTCOME_STATUSES + ['N/A'], outcome),
+        'Comments': _take(comments, comment),
+        'Invoice day of month': tables['day'][invoice_offset],
+        'Due day of month': tables['day'][due_offset],
+        'Invoice day of week': _categorical(tables['weekday'], invoice_offset),
+        'Due day of week': _categorical(tables['weekday'], due_offset),
+        'Invoice month': invoice_days,
+        'Due month': due_days,
+    }
+    schema = ledger_schema()
+    return pa.Table.from_arrays([pa.array(columns[field.name], type=field.type) if isinstance(columns[field.name], np.ndarray)
+                                 else columns[field.name] for field in schema], schema=schema)
+
+
+def as_workbook_text(table):
+    """The table with its date columns as MM/DD/YYYY text, as written to CSV and XLSX"""
+    for name, text_format in DATE_FORMATS.items():
+        index = table.schema.get_field_index(name)
+        table = table.set_column(index, name, pc.strftime(table.column(name), format=text_format))
+    return table
+
+
+def render_chunk(task):
+    """Generate one chunk and encode it for the output format (runs in a worker process)"""
+    fmt, seed, chunk_index, start_row, rows, customers, as_of = task
+    table = generate_chunk(seed, chunk_index, start_row, rows, customers, as_of)
+    if fmt == 'csv':
+        sink = pa.BufferOutputStream()
+        csv.write_csv(as_workbook_text(table), sink, csv.WriteOptions(include_header=chunk_index == 0))
+        return sink.getvalue()
+    if fmt == 'xlsx':
+        return as_workbook_text(table).to_pandas()
+    return table
+
+
+def iter_chunks(tasks, workers):
+    """Rendered chunks in order, with at most two chunks per worker in flight"""
+    if workers <= 1:
+        for task in tasks:
+            yield render_chunk(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for task in tasks:
+            pending.append(pool.submit(render_chunk, task))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def generate(output, rows=DEFAULT_ROWS, seed=42, customers=None, chunk_rows=DEFAULT_CHUNK_ROWS, workers=1,
+             as_of=None):
+    """Write a ledger of ``rows`` invoices to ``output``; the format follows its extension"""
+    fmt = os.path.splitext(output)[1].lstrip('.').lower()
+    if fmt not in ('xlsx', 'csv', 'parquet', 'arrow'):
+        raise ValueError(f"Unsupported output format '{fmt}'. Use .xlsx, .csv, .parquet or .arrow")
+    if fmt == 'xlsx':
+        if rows > XLSX_MAX_ROWS:
+            raise ValueError(f"XLSX holds at most {XLSX_MAX_ROWS} rows; use .csv, .parquet or .arrow")
+        # openpyxl writes a whole sheet at once
+        chunk_rows = rows
+    as_of = as_of or datetime.now().date()
+    customers = customers or rows
+    tasks = [(fmt, seed, i, start, min(chunk_rows, rows - start), customers, as_of)
+             for i, start in enumerate(range(0, rows, chunk_rows))]
+    chunks = iter_chunks(tasks, workers)
+
+    # Write next to the target and swap it in, keeping the extension for pandas' engine lookup
+    root, extension = os.path.splitext(output)
+    tmp_path = f"{root}.tmp{extension}"
+    if fmt == 'xlsx':
+        next(chunks).to_excel(tmp_path, index=False, engine='openpyxl')
+    elif fmt == 'csv':
+        with open(tmp_path, 'wb') as fh:
+            for body in chunks:
+                fh.write(body)
+    else:
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            if fmt == 'parquet':
+                import pyarrow.parquet as pq
+                writer = pq.ParquetWriter(sink, ledger_schema())
+            else:
+                writer = pa.ipc.new_file(sink, ledger_schema())
+            with writer:
+                for table in chunks:
+                    writer.write_table(table)
+    os.replace(tmp_path, output)
+    return output
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='.xlsx, .csv, .parquet or .arrow')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--customers', type=int, default=None, help='customer pool size (default: one per invoice)')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--as-of', type=date.fromisoformat, default=None, help='date days overdue are counted to')
+    args = parser.parse_args()
+
+    start = datetime.now()
+    try:
+        path = generate(args.output, args.rows, args.seed, args.customers, args.chunk_rows, args.workers, args.as_of)
+    except Exception as e:
+        print(f"Error generating data: {e}")
+        raise SystemExit(1)
+    elapsed = (datetime.now() - start).total_seconds()
+    print(f"Successfully generated dummy data in '{path}' with {args.rows} rows in {elapsed:.1f}s.")
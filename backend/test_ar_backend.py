@@ -0,0 +1,68 @@
+"""Dashboard payloads served from the snapshot, against those of the original per-request formatters."""
+import json
+from pathlib import Path
+
+import pytest
+
+import ar_backend
+from ar_dataset import DatasetCache
+from ar_timeseries import MAX_RANGE_MONTHS
+from conftest import SAMPLE_LEDGER, rounded
+
+# Every dashboard of the sample ledger as the original formatters rendered it, keyed by 'role' or 'role:name'
+BASELINE = json.loads(Path(__file__).with_name('testdata').joinpath('baseline_payloads.json').read_text())
+
+# Fields that changed on purpose since the baseline
+CHANGED = {
+    # Monthly rollups keep the same month of different years apart
+    ('admin', 'monthlyPerformance'),
+    # Worklist ties on days overdue are broken by amount, then invoice number
+    ('collector:', 'worklist'),
+    # Deltas and trends come from the recorded daily history instead of fixed numbers
+    ('manager', 'beforeDueChange'), ('manager', 'beforeDuePercentageChange'), ('manager', 'monthlyTrend'),
+    ('manager', 'overdueChange'), ('manager', 'overduePercentageChange'),
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(ar_backend, 'ar_data_cache', DatasetCache(str(SAMPLE_LEDGER), ar_backend.load_ar_source,
+                                                                  prepare=ar_backend.prepare_snapshot))
+    return ar_backend.app.test_client()
+
+
+def query(view):
+    role, _, name = view.partition(':')
+    return f'/api/ar-data?role={role}' + (f'&name={name}' if name else '')
+
+
+@pytest.mark.parametrize('view', sorted(BASELINE))
+def test_payload_matches_baseline(client, view):
+    payload = rounded(client.get(query(view)).get_json())
+    expected = rounded(BASELINE[view])
+    assert sorted(payload) == sorted(expected)
+    for field in expected:
+        if (view, field) not in CHANGED:
+            assert payload[field] == expected[field], field
+
+
+def test_conditional_get(client):
+    first = client.get('/api/ar-data?role=admin')
+    etag = first.headers['ETag']
+    assert client.get('/api/ar-data?role=admin', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/ar-data?role=biller&name=James', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_batch_matches_single_views(client):
+    views = [{'role': 'admin'}, {'role': 'collector', 'name': 'Vanessa'}, {'role': 'admin'}]
+    body = client.post('/api/ar-data/batch', json={'views': views}).get_json()
+    for view, item in zip(views, body['views']):
+        single = client.get(query(view['role'] + ':' + view.get('name', ''))).get_json()
+        assert item['data'] == single
+
+
+def test_monthly_range_is_bounded(client):
+    longest = client.get('/api/monthly?from=2000-01&to=2029-12')
+    assert longest.status_code == 200 and len(longest.get_json()['months']) == MAX_RANGE_MONTHS
+    assert client.get('/api/monthly?from=2000-01&to=2030-01').status_code == 400
+    assert client.get('/api/monthly?from=0001-01&to=9999-12').status_code == 400
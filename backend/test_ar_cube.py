@@ -0,0 +1,59 @@
+"""The cube's rollups equal direct groupbys over the ledger."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ar_aging import OVERDUE_SPLIT, STANDARD_AGING
+from ar_cube import CUBE_DIMENSIONS, build_ar_cube, build_customer_totals, build_dispute_cube
+
+
+@pytest.mark.parametrize('dim', list(CUBE_DIMENSIONS))
+@pytest.mark.parametrize('measure, column, how', [('amount', 'Invoice Amount', 'sum'),
+                                                  ('count', 'Invoice Amount', 'size'),
+                                                  ('days', 'Days overdue', 'sum')])
+def test_by_matches_groupby(ledger, dim, measure, column, how):
+    expected = ledger.groupby(CUBE_DIMENSIONS[dim], observed=True)[column].agg(how)
+    actual = build_ar_cube(ledger).by(dim, measure)
+    np.testing.assert_array_equal(actual.index.astype(object), expected.index.astype(object))
+    np.testing.assert_allclose(actual.to_numpy(dtype='float64'), expected.to_numpy(dtype='float64'))
+
+
+@pytest.mark.filterwarnings('error::FutureWarning')
+def test_unused_categories_have_no_rows(ledger):
+    # One collector's book keeps every collector as a category of the column
+    book = ledger[ledger['Collector Name'] == 'Vanessa']
+    assert len(book['Collector Name'].cat.categories) > 1
+    cube = build_ar_cube(book)
+    assert list(cube.by('collector').index) == ['Vanessa']
+    assert list(cube.per('collector')) == ['Vanessa']
+    assert (cube.by('status') != 0).all()
+    assert set(cube.by('status').index) == set(book['Invoice Status'].unique())
+
+
+def test_slices_and_buckets(ledger):
+    cube = build_ar_cube(ledger)
+    for collector, sub in cube.per('collector').items():
+        book = ledger[ledger['Collector Name'] == collector]
+        assert sub.total() == pytest.approx(book['Invoice Amount'].sum())
+        assert cube.slice(collector=collector).total('count') == len(book)
+        counts, amounts = sub.bucket_totals(STANDARD_AGING)
+        expected_counts, expected_amounts = STANDARD_AGING.totals(book['Days overdue'], book['Invoice Amount'])
+        np.testing.assert_array_equal(counts, expected_counts)
+        np.testing.assert_allclose(amounts, expected_amounts)
+    overdue = ledger.loc[ledger['Days overdue'] > 0, 'Invoice Amount'].sum()
+    assert cube.where_bucket(OVERDUE_SPLIT, 'overdue').total() == pytest.approx(overdue)
+
+
+def test_disputes_fill_missing_keys(ledger):
+    disputed = ledger[ledger['Invoice Status'] == 'Disputed']
+    by_outcome = build_dispute_cube(ledger).by('outcome', 'count')
+    expected = disputed['Outcome Status'].astype(object).fillna('Pending').value_counts()
+    assert by_outcome[by_outcome > 0].to_dict() == expected.to_dict()
+
+
+def test_customer_totals(ledger):
+    customers, codes = build_customer_totals(ledger)
+    expected = ledger.groupby('Customer Name')['Invoice Amount'].sum()
+    np.testing.assert_array_equal(customers.index, expected.index)
+    np.testing.assert_allclose(customers['amount'], expected)
+    np.testing.assert_array_equal(customers.index[codes], ledger['Customer Name'])
@@ -0,0 +1,64 @@
+"""The shared ledger snapshot: loaded once, reloaded only when the file's content changes."""
+import os
+
+import pandas as pd
+
+from ar_dataset import DatasetCache, DatasetSnapshot
+
+
+def write(path, text, mtime_ns):
+    path.write_text(text)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_reload_on_content_change(tmp_path):
+    path = tmp_path / 'ledger.csv'
+    write(path, 'a\n1\n', 10**18)
+    loads, prepared = [], []
+
+    def loader(p):
+        loads.append(p)
+        return pd.read_csv(p)
+
+    cache = DatasetCache(str(path), loader, stat_interval=3600, prepare=prepared.append)
+    first = cache.get()
+    assert cache.get() is first and len(loads) == 1 and prepared == [first]
+
+    # Touched but unchanged: same snapshot, no load
+    write(path, 'a\n1\n', 2 * 10**18)
+    assert cache.reload() is first and len(loads) == 1
+
+    write(path, 'a\n2\n', 3 * 10**18)
+    second = cache.reload()
+    assert second is not first and second.df['a'].tolist() == [2]
+    assert second.version != first.version and cache.reload_count == 2
+
+
+def test_failed_reload_keeps_snapshot(tmp_path):
+    path = tmp_path / 'ledger.csv'
+    write(path, 'a\n1\n', 10**18)
+    cache = DatasetCache(str(path), pd.read_csv, stat_interval=0)
+    first = cache.get()
+    write(path, '', 2 * 10**18)
+    cache._reload_lock.acquire()
+    cache._background_check()
+    assert cache.get() is first and cache.reload_errors == 1 and cache.last_error is not None
+
+
+def test_derived_built_once_and_appends_merged_on_read():
+    snapshot = DatasetSnapshot(pd.DataFrame({'a': [1, 2]}), 'v', '')
+    builds = []
+    assert snapshot.derived('total', lambda df: builds.append(1) or df['a'].sum()) == 3
+    assert snapshot.derived('total', lambda df: builds.append(1) or 0) == 3 and len(builds) == 1
+
+    merges = []
+
+    def merge(df, rows):
+        merges.append(len(rows))
+        return pd.concat([df, pd.DataFrame(rows)], ignore_index=True)
+
+    snapshot.append(3, {'a': 3}, merge)
+    snapshot.append(4, {'a': 4}, merge)
+    assert snapshot.is_appended(3) and snapshot.size == 4 and not merges
+    assert snapshot.df['a'].tolist() == [1, 2, 3, 4] and merges == [2]
+    assert not snapshot.is_appended(3)
@@ -0,0 +1,36 @@
+"""Daily history rows and the manager's history version."""
+from datetime import date
+
+import pytest
+
+import ar_backend
+from ar_cube import build_ar_cube
+from ar_dataset import DatasetSnapshot
+from ar_history import HistoryStore, history_rows
+
+
+@pytest.mark.filterwarnings('error::FutureWarning')
+def test_rows_cover_observed_values_only(ledger):
+    book = ledger[ledger['Collector Name'] == 'Vanessa']
+    rows = history_rows(build_ar_cube(book), date(2026, 1, 2))
+    assert set(rows.loc[rows['dimension'] == 'collector', 'value']) == {'Vanessa'}
+    assert (rows['count'] > 0).all()
+    assert rows.loc[rows['dimension'] == 'bucket', 'amount'].sum() == pytest.approx(book['Invoice Amount'].sum())
+
+
+def test_version_read_once_per_snapshot(ledger, tmp_path, monkeypatch):
+    store = HistoryStore(str(tmp_path))
+    store.record(build_ar_cube(ledger), date(2026, 1, 2))
+    monkeypatch.setattr(ar_backend, 'history_store', store)
+    reads = []
+    monkeypatch.setattr(store, 'files', lambda files=store.files: reads.append(1) or files())
+
+    snapshot = DatasetSnapshot(ledger, 'v1', '')
+    version = ar_backend.view_version(snapshot, 'manager')
+    assert version.startswith('v1') and version != 'v1'
+    assert ar_backend.view_version(snapshot, 'manager') == version
+    assert ar_backend.view_version(snapshot, 'admin') == 'v1'
+    assert len(reads) == 1
+    # A new snapshot picks up days recorded since
+    store.record(build_ar_cube(ledger), date(2026, 1, 3))
+    assert ar_backend.view_version(DatasetSnapshot(ledger, 'v1', ''), 'manager') != version
@@ -0,0 +1,52 @@
+"""The sharded build of the aggregates matches the single-process build."""
+import json
+
+import numpy as np
+import pytest
+
+import ar_parallel
+from ar_backend import build_ar_payload
+from ar_cube import build_ledger_aggregates
+from ar_dataset import DatasetSnapshot
+from ar_json import dumps
+from ar_parallel import _differences, build_ledger_aggregates_parallel, use_parallel
+from conftest import ROLES, rounded
+
+
+@pytest.fixture(scope='module', autouse=True)
+def pool():
+    yield
+    if ar_parallel._pool is not None:
+        ar_parallel._pool.shutdown()
+        ar_parallel._pool = None
+
+
+def test_small_ledgers_stay_in_process(ledger):
+    assert not use_parallel(ledger, workers=4)
+    assert not use_parallel(ledger, workers=1)
+
+
+@pytest.mark.parametrize('workers', [2, 3])
+def test_parallel_matches_single(ledger, workers):
+    expected = build_ledger_aggregates(ledger)
+    actual = build_ledger_aggregates_parallel(ledger, workers)
+    assert _differences(expected, actual) == []
+    for name, index in expected.partitions.items():
+        assert index.sizes() == actual.partitions[name].sizes()
+        for value in index.sizes():
+            np.testing.assert_array_equal(index.rows(value), actual.partitions[name].rows(value))
+
+    single, sharded = DatasetSnapshot(ledger, 'single', ''), DatasetSnapshot(ledger, 'sharded', '')
+    single.derived('aggregates', lambda df: expected)
+    sharded.derived('aggregates', lambda df: actual)
+    for role in ROLES:
+        assert (rounded(json.loads(dumps(build_ar_payload(sharded, role))))
+                == rounded(json.loads(dumps(build_ar_payload(single, role))))), role
+
+
+def test_build_uses_pool_when_configured(ledger, monkeypatch):
+    expected = build_ledger_aggregates(ledger)
+    monkeypatch.setattr(ar_parallel, 'AGGREGATE_WORKERS', 2)
+    monkeypatch.setattr(ar_parallel, 'PARALLEL_MIN_ROWS', 100)
+    assert use_parallel(ledger)
+    assert _differences(expected, build_ledger_aggregates(ledger)) == []
@@ -0,0 +1,10 @@
+"""The loader comparison runs both frames through every dashboard formatter."""
+from ar_schema import compare_loaders
+from conftest import SAMPLE_LEDGER
+
+
+def test_compare_loaders(capsys):
+    compare_loaders(str(SAMPLE_LEDGER))
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == '150 rows'
+    assert [line.split(' memory')[0].strip() for line in lines[1:]] == ['object (df.where)', 'compact (apply_schema)']
@@ -0,0 +1,157 @@
+"""Incremental invoice changes leave the aggregates and payloads equal to a rebuild of the changed ledger."""
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ar_backend import build_ar_payload
+from ar_cube import build_ledger_aggregates
+from ar_dataset import DatasetSnapshot
+from ar_json import dumps
+from ar_updates import InvoiceUpdater
+
+NEW_INVOICE = {
+    'Invoice number': 999999, 'Customer Name': 'New Co', 'Customer ID': 424242, 'Collector Name': 'Vanessa',
+    'Biller Name': 'James', 'Invoice Amount': 5000, 'Days overdue': 45, 'Invoice Status': 'Disputed',
+    'Invoice month': '09/01/2026', 'Customer type': 'Enterprise', 'Customer terms': 'NET 30',
+}
+
+
+@pytest.fixture
+def snapshot(ledger):
+    snapshot = DatasetSnapshot(ledger, 'test', '')
+    snapshot.derived('aggregates', build_ledger_aggregates)
+    return snapshot
+
+
+@pytest.fixture
+def updater(tmp_path):
+    return InvoiceUpdater(str(tmp_path / 'updates.jsonl'))
+
+
+def assert_same(actual, expected):
+    """Equal JSON values, with floats compared approximately"""
+    if isinstance(expected, dict):
+        assert list(actual) == list(expected)
+        for key in expected:
+            assert_same(actual[key], expected[key])
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected)
+        for a, e in zip(actual, expected):
+            assert_same(a, e)
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected)
+    else:
+        assert actual == expected
+
+
+def flat(frame):
+    """``frame`` with its keys as object columns; rows added by a change have plain, not categorical, keys"""
+    return frame.reset_index().astype({name: object for name in frame.index.names})
+
+
+def assert_matches_rebuild(snapshot):
+    live = snapshot.derived('aggregates', build_ledger_aggregates)
+    rebuilt = DatasetSnapshot(snapshot.df.copy(), 'rebuilt', '')
+    expected = rebuilt.derived('aggregates', build_ledger_aggregates)
+    for name in ('cube', 'disputes'):
+        pd.testing.assert_frame_equal(flat(getattr(live, name).cells), flat(getattr(expected, name).cells))
+    pd.testing.assert_frame_equal(live.customers, expected.customers)
+    np.testing.assert_array_equal(live.customer_codes, expected.customer_codes)
+    for dimension, table in expected.crosstabs.items():
+        pd.testing.assert_frame_equal(flat(live.crosstabs[dimension]), flat(table))
+    assert live.total_accounts == expected.total_accounts
+    for role, name in (('admin', None), ('collectors', None), ('billers', None), ('collector', 'Vanessa'),
+                       ('biller', 'James')):
+        assert_same(json.loads(dumps(build_ar_payload(snapshot, role, name))),
+                    json.loads(dumps(build_ar_payload(rebuilt, role, name))))
+
+
+def invoice(snapshot, i):
+    return int(snapshot.df['Invoice number'].iloc[i])
+
+
+def test_updates_match_rebuild(snapshot, updater):
+    df = snapshot.df
+    # Empty the cells of the first invoices of two statuses by moving each to a status of its own
+    for status in df['Invoice Status'].unique()[:2]:
+        for i in np.flatnonzero(df['Invoice Status'] == status):
+            updater.update(snapshot, invoice(snapshot, i), {'Invoice Status': 'Paid', 'Days overdue': -3})
+    updater.update(snapshot, invoice(snapshot, 3), {'Invoice Status': 'Disputed', 'Outcome Status': None})
+    updater.update(snapshot, invoice(snapshot, 5), {'Days overdue': 200, 'Root cause dropdown': 'Pricing'})
+    updater.record_payment(snapshot, invoice(snapshot, 7), 100.5)
+    assert_matches_rebuild(snapshot)
+
+
+def test_first_row_moves_to_next(snapshot, updater):
+    # Every change moves the cell's first row; the next row of the same cell must take its place
+    for i in range(20):
+        updater.update(snapshot, invoice(snapshot, i), {'Invoice Status': 'Paid', 'Days overdue': 500})
+        updater.update(snapshot, invoice(snapshot, i), {'Invoice Status': 'Current', 'Days overdue': 0})
+    assert_matches_rebuild(snapshot)
+
+
+def test_creates_are_merged_on_read(snapshot, updater):
+    size = len(snapshot.df)
+    updater.create(snapshot, NEW_INVOICE)
+    updater.create(snapshot, dict(NEW_INVOICE, **{'Invoice number': 1000000, 'Customer Name': 'Aardvark Ltd',
+                                                  'Customer ID': 1, 'Customer type': 'Startup'}))
+    # Buffered until the frame is read
+    assert snapshot.size == size + 2
+    assert len(snapshot._df) == size
+    with pytest.raises(ValueError):
+        updater.create(snapshot, NEW_INVOICE)
+    updater.update(snapshot, 1000000, {'Invoice Status': 'Current'})
+    assert len(snapshot._df) == size + 2
+    assert_matches_rebuild(snapshot)
+
+
+def test_replay_matches_live(snapshot, updater, ledger):
+    updater.create(snapshot, NEW_INVOICE)
+    updater.update(snapshot, invoice(snapshot, 3), {'Invoice Status': 'Disputed'})
+    updater.record_payment(snapshot, 999999, 1000)
+    replayed = DatasetSnapshot(ledger.copy(), 'test', '')
+    assert updater.replay(replayed) == 3
+    pd.testing.assert_frame_equal(replayed.df, snapshot.df)
+
+
+def test_unlogged_change_is_not_applied(snapshot, tmp_path):
+    # The log path is a directory, so appending to it fails
+    updater = InvoiceUpdater(str(tmp_path))
+    before, version = snapshot.df.copy(), snapshot.version
+    with pytest.raises(OSError):
+        updater.update(snapshot, invoice(snapshot, 0), {'Invoice Status': 'Paid'})
+    with pytest.raises(OSError):
+        updater.create(snapshot, NEW_INVOICE)
+    assert snapshot.version == version and snapshot.size == len(before)
+    pd.testing.assert_frame_equal(snapshot.df, before)
+    assert_matches_rebuild(snapshot)
+
+
+def test_reads_during_changes(snapshot, updater):
+    # Readers that do not take the updater's lock, as /api/monthly and the metrics collector do
+    aggregates = snapshot.derived('aggregates', build_ledger_aggregates)
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            snapshot.df
+            aggregates.cube.slice(status='Disputed')
+            len(aggregates.disputes)
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for thread in readers:
+        thread.start()
+    try:
+        for i in range(25):
+            updater.create(snapshot, dict(NEW_INVOICE, **{'Invoice number': 2000000 + i, 'Customer ID': 500 + i,
+                                                          'Customer Name': f'Customer {24 - i:02d}'}))
+            updater.update(snapshot, invoice(snapshot, i), {'Invoice Status': 'Paid', 'Days overdue': -1})
+    finally:
+        done.set()
+        for thread in readers:
+            thread.join()
+    assert snapshot.size == len(snapshot.df) == 175
+    assert_matches_rebuild(snapshot)
@@ -0,0 +1,62 @@
+"""Keyset pages of the worklist, followed to the end, give the same order as one full sort."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ar_records import RECORD_KEY
+from ar_worklist import WORKLIST_SORT_KEYS, parse_sort, top_worklist, top_worklists, worklist_page
+
+
+def full_sort(df, sort):
+    """``df`` in worklist order by a stable pandas sort, missing values last"""
+    columns = [WORKLIST_SORT_KEYS[name][0] for name in sort] + [RECORD_KEY]
+    ascending = [WORKLIST_SORT_KEYS[name][1] == 'asc' for name in sort] + [True]
+    return df.sort_values(columns, ascending=ascending, na_position='last', kind='stable')
+
+
+def all_pages(df, limit, sort):
+    pages, cursor = [], None
+    while True:
+        rows, cursor = worklist_page(df, limit, cursor, sort)
+        pages.append(rows)
+        if cursor is None:
+            return pd.concat(pages), len(pages)
+
+
+@pytest.fixture
+def ledger_with_gaps(ledger):
+    # Missing days and amounts, and ties on both, so that the later keys and the invoice number decide
+    df = ledger.copy()
+    df.loc[df.index[::7], 'Days overdue'] = np.nan
+    df.loc[df.index[::11], 'Invoice Amount'] = np.nan
+    df.loc[df.index[::5], 'Days overdue'] = 30
+    df.loc[df.index[::10], 'Invoice Amount'] = 1000.0
+    return df
+
+
+@pytest.mark.parametrize('sort', ['days,amount', 'amount', 'due,days', 'amount,days'])
+@pytest.mark.parametrize('limit', [1, 7, 50, 500])
+def test_pages_match_full_sort(ledger_with_gaps, sort, limit):
+    sort = parse_sort(sort)
+    paged, count = all_pages(ledger_with_gaps, limit, sort)
+    expected = full_sort(ledger_with_gaps, sort)
+    assert list(paged[RECORD_KEY]) == list(expected[RECORD_KEY])
+    assert count == max(1, -(-len(expected) // limit))
+
+
+def test_top_worklists_match_per_group(ledger):
+    groups = {name: np.flatnonzero((ledger['Collector Name'] == name).to_numpy())
+              for name in ledger['Collector Name'].unique()}
+    tops = top_worklists(ledger, groups, 10)
+    for name, rows in groups.items():
+        expected = full_sort(ledger.iloc[rows], parse_sort(None)).head(10)
+        assert list(tops[name][RECORD_KEY]) == list(expected[RECORD_KEY])
+        assert list(top_worklist(ledger, 10, rows=rows)[RECORD_KEY]) == list(expected[RECORD_KEY])
+
+
+def test_bad_cursor(ledger):
+    with pytest.raises(ValueError):
+        worklist_page(ledger, 10, 'not-a-cursor')
+    _, cursor = worklist_page(ledger, 10, sort=('days',))
+    with pytest.raises(ValueError):
+        worklist_page(ledger, 10, cursor, sort=('days', 'amount'))
@@ -60,7 +60,7 @@ export default function AdminDashboard() {
     const apiUrl = apiConfig.getUrl(apiConfig.endpoints.arData, { role: 'admin' });
     console.log("Fetching admin data from:", apiUrl);
     
-    fetch(apiUrl)
+    apiConfig.fetchArData({ role: 'admin' })
       .then(res => {
         if (!res.ok) {
           throw new Error(`API responded with status: ${res.status}`);
@@ -75,7 +75,7 @@ export default function BillerDashboard({ billerName }: BillerDashboardProps) {
     // Log the API request for debugging
     console.log("Fetching biller data from:", apiUrl);
       
-    fetch(apiUrl)
+    apiConfig.fetchArData(queryParams)
       .then(res => {
         if (!res.ok) {
           throw new Error(`API responded with status: ${res.status}`);
@@ -61,7 +61,7 @@ export default function ManagerDashboard() {
     const apiUrl = apiConfig.getUrl(apiConfig.endpoints.arData, { role: 'manager' });
     console.log("Fetching manager data from:", apiUrl);
     
-    fetch(apiUrl)
+    apiConfig.fetchArData({ role: 'manager' })
       .then(res => {
         if (!res.ok) {
           throw new Error(`API responded with status: ${res.status}`);
@@ -8,6 +8,9 @@ const isDevelopment = process.env.NODE_ENV === 'development';
 const devBaseUrl = 'http://127.0.0.1:5001/api';
 const prodBaseUrl = '/api'; // In production, we use relative URLs because our Firebase Functions are served from the same domain
 
+// Dashboard payloads prebuilt by backend/ar_static.py and exported with the site
+const staticDataUrl = '/ar-data';
+
 // Export the API configuration
 const apiConfig = {
   baseUrl: isDevelopment ? devBaseUrl : prodBaseUrl,
@@ -37,6 +40,32 @@ const apiConfig = {
     
     const queryString = params.toString();
     return queryString ? `${url}?${queryString}` : url;
+  },
+
+  // URL of the prebuilt payload for a role (and collector or biller name)
+  getStaticUrl: (role: string, name?: string): string | null => {
+    if (role === 'collector' || role === 'biller') {
+      // File names are percent-encoded, so the path segment is encoded twice
+      return name ? `${staticDataUrl}/${role}/${encodeURIComponent(encodeURIComponent(name))}.json` : null;
+    }
+    return role === 'admin' || role === 'manager' ? `${staticDataUrl}/${role}.json` : null;
+  },
+
+  // Fetch dashboard data from the prebuilt payload, falling back to the API when there is none
+  fetchArData: async (queryParams: Record<string, string>): Promise<Response> => {
+    const staticUrl = isDevelopment ? null : apiConfig.getStaticUrl(queryParams.role, queryParams.name);
+    if (staticUrl) {
+      try {
+        const res = await fetch(staticUrl);
+        // Hosting answers unknown paths with index.html, so check that JSON came back
+        if (res.ok && (res.headers.get('content-type') || '').includes('application/json')) {
+          return res;
+        }
+      } catch (error) {
+        console.warn("Prebuilt data unavailable, using the API:", error);
+      }
+    }
+    return fetch(apiConfig.getUrl(apiConfig.endpoints.arData, queryParams));
   }
 };
 
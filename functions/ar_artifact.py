@@ -0,0 +1,85 @@
+"""Compact column artifact of the AR workbook, built at deploy time and loaded on cold start.
+
+The workbook is parsed once, by ``python ar_artifact.py`` (run as the
+functions predeploy step), into an uncompressed ``.npz`` next to it: one
+NumPy array per column, with text columns dictionary encoded as integer
+codes plus their distinct values. Loading it needs only NumPy and pandas,
+never openpyxl, and no pickled objects. The artifact records the SHA-1 of
+the workbook it was built from, so a stale artifact is ignored.
+"""
+import hashlib
+import os
+
+ARTIFACT_SUFFIX = '.npz'
+
+
+def artifact_path(workbook_path):
+    """Path of the artifact built from a workbook"""
+    return os.path.splitext(workbook_path)[0] + ARTIFACT_SUFFIX
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Return the SHA-1 hex digest of a file's contents"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_artifact(df, path, source_digest=''):
+    """Write a frame as column arrays; text and mixed columns are stored as codes plus distinct values"""
+    import numpy as np
+    import pandas as pd
+
+    arrays = {
+        'columns': np.array([str(name) for name in df.columns]),
+        'source_digest': np.array(source_digest),
+    }
+    for i, name in enumerate(df.columns):
+        values = df[name]
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_datetime64_any_dtype(values):
+            arrays[f'c{i}'] = values.to_numpy()
+        else:
+            codes, uniques = pd.factorize(values)
+            arrays[f'c{i}_codes'] = codes.astype('int32')
+            arrays[f'c{i}_values'] = np.array([str(value) for value in uniques], dtype=str)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as fh:
+        np.savez(fh, **arrays)
+    os.replace(tmp_path, path)
+
+
+def read_artifact(path):
+    """Load an artifact back into a frame; text columns come back as categoricals.
+
+    Returns ``(frame, source digest)``.
+    """
+    import numpy as np
+    import pandas as pd
+
+    with np.load(path, allow_pickle=False) as data:
+        columns = {}
+        for i, name in enumerate(data['columns']):
+            if f'c{i}' in data:
+                columns[str(name)] = data[f'c{i}']
+            else:
+                columns[str(name)] = pd.Categorical.from_codes(data[f'c{i}_codes'], categories=data[f'c{i}_values'])
+        return pd.DataFrame(columns), str(data['source_digest'])
+
+
+def build_artifact(workbook_path):
+    """Parse the workbook and write its artifact; returns the artifact path"""
+    import pandas as pd
+
+    path = artifact_path(workbook_path)
+    write_artifact(pd.read_excel(workbook_path), path, file_digest(workbook_path))
+    return path
+
+
+if __name__ == '__main__':
+    import sys
+
+    workbook = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                 'AR_Model_Dummy_Data.xlsx')
+    print(f"Wrote {build_artifact(workbook)}")
@@ -0,0 +1,80 @@
+"""Measure the cold start of the api function in fresh interpreters.
+
+Usage:
+    python coldstart.py [--runs 5] [--query role=manager] [--importtime]
+
+Each run starts a new Python process, as a new function instance would, and
+times three steps: importing main.py, the first /api/ar-data request (which
+loads the dataset into the module-level snapshot) and a second, warm request.
+Medians over the runs are printed. Build the artifact first
+(``python ar_artifact.py``) to time the deployed path; without it the first
+request parses the workbook. ``--importtime`` prints the slowest imports of
+one more run from ``python -X importtime``.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+FUNCTIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Run in the child interpreter; prints the step timings as JSON
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+timings = {'import': imported - start}
+for step in ('first', 'warm'):
+    begin = time.perf_counter()
+    with main.app.test_request_context('/api/ar-data', query_string=sys.argv[1]):
+        from flask import request
+        response = main.app.make_response(main.api(request))
+    timings[step] = time.perf_counter() - begin
+timings['status'] = response.status_code
+print(json.dumps(timings))
+"""
+
+
+def run_once(query):
+    """Step timings of one fresh interpreter"""
+    output = subprocess.run([sys.executable, '-c', CHILD, query], cwd=FUNCTIONS_DIR, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(limit=15):
+    """(cumulative microseconds, module) of the slowest imports of main.py"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=FUNCTIONS_DIR,
+                            check=True, capture_output=True, text=True).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        imports.append((int(cumulative), module.strip()))
+    return sorted(imports, reverse=True)[:limit]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--query', default='role=admin', help='query string of the timed request')
+    parser.add_argument('--importtime', action='store_true', help='list the slowest imports')
+    args = parser.parse_args()
+
+    runs = [run_once(args.query) for _ in range(args.runs)]
+    statuses = sorted({run['status'] for run in runs})
+    print(f"{args.runs} cold starts of /api/ar-data?{args.query} (HTTP {', '.join(map(str, statuses))})")
+    for step in ('import', 'first', 'warm'):
+        times = [run[step] for run in runs]
+        print(f"  {step:<8} median {statistics.median(times) * 1000:9.1f} ms   min {min(times) * 1000:9.1f} ms")
+    cold = [run['import'] + run['first'] for run in runs]
+    print(f"  {'cold':<8} median {statistics.median(cold) * 1000:9.1f} ms")
+
+    if args.importtime:
+        print("Slowest imports (cumulative):")
+        for microseconds, module in slowest_imports():
+            print(f"  {microseconds / 1000:9.1f} ms  {module}")
@@ -1,23 +1,76 @@
-import firebase_functions
 from firebase_functions import https_fn, options
 from flask import Flask, jsonify, request
-import pandas as pd
-import numpy as np
 from datetime import datetime, timedelta
 import random
 import os
-from functools import wraps
-from firebase_admin import initialize_app
+import threading
+import time
 
-# Initialize Firebase app with specific database
-initialize_app(options={'databaseURL': 'https://ar-tracker-c226f.firebaseio.com', 'projectId': 'ar-tracker-c226f', 'databaseInstance': 'radiusdb'})
+from ar_artifact import artifact_path, file_digest, read_artifact
+
+# pandas and numpy are imported inside the functions that use them, so importing this module (the cold start) stays cheap
 
 app = Flask(__name__)
 
+AR_DATA_PATH = os.path.join(os.path.dirname(__file__), 'AR_Model_Dummy_Data.xlsx')
+# Column arrays prebuilt from the workbook at deploy time (python ar_artifact.py)
+AR_ARTIFACT_PATH = artifact_path(AR_DATA_PATH)
+# Seconds between stat checks of the workbook; the deployed file only changes on redeploy
+AR_DATA_STAT_INTERVAL = float(os.environ.get('AR_DATA_STAT_INTERVAL', '5'))
+
+# Module-level snapshot that survives warm invocations of this instance
+_ar_snapshot = {'df': None, 'stat_key': None, 'checked_at': 0.0}
+_ar_snapshot_lock = threading.Lock()
+
+def load_ar_frame():
+    """Load the ledger from the prebuilt artifact, falling back to the workbook if it is missing or stale"""
+    try:
+        df, source_digest = read_artifact(AR_ARTIFACT_PATH)
+        if source_digest == file_digest(AR_DATA_PATH):
+            return df
+        print(f"{AR_ARTIFACT_PATH} was built from another workbook. Reading the workbook directly.")
+    except FileNotFoundError:
+        pass
+    import pandas as pd
+    return pd.read_excel(AR_DATA_PATH)
+
+def get_ar_frame():
+    """Return the cached AR frame, reloading it only when the workbook's mtime or size changes"""
+    now = time.monotonic()
+    if _ar_snapshot['df'] is not None and now - _ar_snapshot['checked_at'] < AR_DATA_STAT_INTERVAL:
+        return _ar_snapshot['df']
+    
+    with _ar_snapshot_lock:
+        stat = os.stat(AR_DATA_PATH)
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        if _ar_snapshot['df'] is None or stat_key != _ar_snapshot['stat_key']:
+            # Keep native dtypes; the formatters only emit aggregates converted with float()/int()
+            _ar_snapshot['df'] = load_ar_frame()
+            _ar_snapshot['stat_key'] = stat_key
+        _ar_snapshot['checked_at'] = now
+        return _ar_snapshot['df']
+
+# Aging buckets by inclusive upper bound on days overdue (same engine as backend/ar_aging.py)
+AGING_UPPER_BOUNDS = [0, 30, 60, 90]
+AGING_LABELS = ["current", "1-30", "31-60", "61-90", "90+"]
+
+def aging_bucket_totals(days, amounts, upper_bounds):
+    """Invoice counts and amount sums per aging bucket from a single searchsorted/bincount pass"""
+    import numpy as np
+    days = np.asarray(days, dtype='float64')
+    bucket_ids = np.searchsorted(np.asarray(upper_bounds, dtype='float64'), days, side='left')
+    valid = ~np.isnan(days)
+    bucket_ids = bucket_ids[valid]
+    weights = np.nan_to_num(np.asarray(amounts, dtype='float64')[valid])
+    n_buckets = len(upper_bounds) + 1
+    return (np.bincount(bucket_ids, minlength=n_buckets),
+            np.bincount(bucket_ids, weights=weights, minlength=n_buckets))
+
 # CODE IMPORTED FROM AR_BACKEND.PY
 # Copying the actual code from your backend file
 
 def format_admin_dashboard_data(df):
+    import pandas as pd
     # Get overall metrics
     total_invoices = len(df)
     
@@ -39,40 +92,13 @@ def format_admin_dashboard_data(df):
     df['Days Overdue'] = (current_date - df['Due Date']).dt.days
     df.loc[df['Days Overdue'] < 0, 'Days Overdue'] = 0  # No negative days
     
-    # Define aging buckets
+    # Aging buckets in one vectorized pass: current (<=0), 1-30, 31-60, 61-90, 90+
+    counts, amounts = aging_bucket_totals(df['Days Overdue'], df['Balance'], AGING_UPPER_BOUNDS)
     aging_buckets = {
-        "current": {"count": 0, "amount": 0},
-        "1-30": {"count": 0, "amount": 0},
-        "31-60": {"count": 0, "amount": 0},
-        "61-90": {"count": 0, "amount": 0},
-        "90+": {"count": 0, "amount": 0}
+        label: {"count": int(count), "amount": float(amount)}
+        for label, count, amount in zip(AGING_LABELS, counts, amounts)
     }
     
-    # Current (not overdue)
-    current_mask = df['Days Overdue'] <= 0
-    aging_buckets["current"]["count"] = len(df[current_mask])
-    aging_buckets["current"]["amount"] = float(df.loc[current_mask, 'Balance'].sum())
-    
-    # 1-30 days
-    mask_1_30 = (df['Days Overdue'] > 0) & (df['Days Overdue'] <= 30)
-    aging_buckets["1-30"]["count"] = len(df[mask_1_30])
-    aging_buckets["1-30"]["amount"] = float(df.loc[mask_1_30, 'Balance'].sum())
-    
-    # 31-60 days
-    mask_31_60 = (df['Days Overdue'] > 30) & (df['Days Overdue'] <= 60)
-    aging_buckets["31-60"]["count"] = len(df[mask_31_60])
-    aging_buckets["31-60"]["amount"] = float(df.loc[mask_31_60, 'Balance'].sum())
-    
-    # 61-90 days
-    mask_61_90 = (df['Days Overdue'] > 60) & (df['Days Overdue'] <= 90)
-    aging_buckets["61-90"]["count"] = len(df[mask_61_90])
-    aging_buckets["61-90"]["amount"] = float(df.loc[mask_61_90, 'Balance'].sum())
-    
-    # 90+ days
-    mask_90_plus = df['Days Overdue'] > 90
-    aging_buckets["90+"]["count"] = len(df[mask_90_plus])
-    aging_buckets["90+"]["amount"] = float(df.loc[mask_90_plus, 'Balance'].sum())
-    
     return {
         "summary": {
             "totalInvoices": total_invoices,
@@ -130,16 +156,13 @@ def api(req: https_fn.Request) -> https_fn.Response:
         role = req.args.get('role', 'admin').lower()
         
         try:
-            # Try to read the Excel file from the functions directory
-            excel_path = os.path.join(os.path.dirname(__file__), 'AR_Model_Dummy_Data.xlsx')
-            
             try:
-                df = pd.read_excel(excel_path)
-                # Replace NaN with None for valid JSON
-                df_cleaned = df.where(pd.notnull(df), None)
+                # The formatters add helper columns, so work on a copy of the shared snapshot
+                df_cleaned = get_ar_frame().copy()
             except Exception as file_error:
                 # If there's an error reading the file, generate sample data
                 print(f"Error reading Excel file: {file_error}. Using sample data.")
+                import pandas as pd
                 # Create sample dataframe with basic structure
                 sample_data = {
                     'Invoice ID': [f"INV-{i}" for i in range(1000, 1050)],